@@ -32,6 +32,10 @@ class Settings(BaseSettings):
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+    # Real-time fan-out: "redis" across processes, "memory" for tests / a single process
+    REALTIME_BACKEND: str = "redis"
+    # Chat history and context cache: "redis" shared by all workers, "memory" for tests / a single process
+    CHAT_SESSION_BACKEND: str = "redis"
 
     # JWT
     JWT_SECRET_KEY: str = "jwt-secret-change-me"
@@ -67,6 +71,11 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
 
+    # Observability — /metrics needs this bearer token; unset, it is served only with DEBUG
+    METRICS_TOKEN: Optional[str] = None
+    # Per-rule Server-Timing header on responses (always on with DEBUG)
+    RULE_TIMING_HEADER: bool = False
+
     # Feature Flags
     ENABLE_EMAIL_SYNC: bool = True
     ENABLE_CALENDAR_SYNC: bool = True
@@ -33,6 +33,7 @@ from app.models.database import (
     Warehouse,
     Workspace,
 )
+from app.services import stock_service
 
 DEMO_DIR = Path(__file__).resolve().parent.parent / "demo"
 DEMO_USER_ID = "demo-user-001"
@@ -178,6 +179,8 @@ async def seed_demo_data(db: AsyncSession) -> None:
             created_by=DEMO_USER_ID,
         ))
     await db.flush()
+    await stock_service.rebuild_balances(db, DEMO_WORKSPACE_ID)
+    await stock_service.rebuild_daily_rollups(db, DEMO_WORKSPACE_ID)
     print(f"  [demo] Seeded {len(movements)} stock movements")
 
     # ---------------------------------------------------------- Sales Orders
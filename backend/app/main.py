@@ -1,19 +1,21 @@
 """LytheraHub AI — FastAPI application entry point."""
 
-import json
+import asyncio
+import contextlib
 import logging
 from contextlib import asynccontextmanager
-from typing import Dict, Set
-
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.auth.jwt_handler import verify_token
 from app.config import settings
+from app.services import metrics, realtime, rule_profiler
+from app.services.connections import ws_manager
 
 logger = logging.getLogger(__name__)
 
@@ -24,44 +26,6 @@ logger = logging.getLogger(__name__)
 limiter = Limiter(key_func=get_remote_address)
 
 
-# ---------------------------------------------------------------------------
-# WebSocket connection manager
-# ---------------------------------------------------------------------------
-
-
-class ConnectionManager:
-    """Manage WebSocket connections per user."""
-
-    def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = set()
-        self.active_connections[user_id].add(websocket)
-
-    def disconnect(self, websocket: WebSocket, user_id: str):
-        if user_id in self.active_connections:
-            self.active_connections[user_id].discard(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-
-    async def broadcast_to_user(self, user_id: str, message: dict):
-        if user_id in self.active_connections:
-            dead = []
-            for ws in self.active_connections[user_id]:
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    dead.append(ws)
-            for ws in dead:
-                self.active_connections[user_id].discard(ws)
-
-
-ws_manager = ConnectionManager()
-
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
@@ -71,20 +35,36 @@ async def lifespan(app: FastAPI):
     print(f"Demo mode: {settings.DEMO_MODE}")
 
     # Create database tables
-    from app.models.database import create_tables
+    from app.models.database import async_session, create_tables
     await create_tables()
 
+    # Upgrading onto materialized stock balances — derive them from the ledger once
+    from app.services.stock_service import backfill_missing_balances, backfill_missing_rollups
+    async with async_session() as db:
+        backfilled = await backfill_missing_balances(db)
+        rolled_up = await backfill_missing_rollups(db)
+        await db.commit()
+    if backfilled:
+        print(f"Backfilled stock balances for {len(backfilled)} workspace(s)")
+    if rolled_up:
+        print(f"Backfilled daily stock rollups for {len(rolled_up)} workspace(s)")
+
     # Seed demo data if in demo mode
     if settings.DEMO_MODE:
         from app.demo_seeder import seed_demo_data
-        from app.models.database import async_session
 
         async with async_session() as db:
             await seed_demo_data(db)
 
+    # One subscription per process delivers every published message to local sockets
+    listener = asyncio.create_task(realtime.backend.listen(ws_manager.broadcast_to_user))
+
     yield
 
     # Shutdown
+    listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await listener
     print("Shutting down LytheraHub AI...")
 
 
@@ -136,6 +116,21 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(SecurityHeadersMiddleware)
 
+
+class RuleTimingMiddleware(BaseHTTPMiddleware):
+    """Report the signal/alert rules a request ran in a ``Server-Timing`` header."""
+
+    async def dispatch(self, request, call_next):
+        runs = rule_profiler.start_request()
+        response = await call_next(request)
+        if runs:
+            response.headers["Server-Timing"] = rule_profiler.server_timing(runs)
+        return response
+
+
+if settings.DEBUG or settings.RULE_TIMING_HEADER:
+    app.add_middleware(RuleTimingMiddleware)
+
 # ---------------------------------------------------------------------------
 # Routers
 # ---------------------------------------------------------------------------
@@ -234,18 +229,33 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Prometheus metrics for this process (bearer METRICS_TOKEN, or open with DEBUG)."""
+    if settings.METRICS_TOKEN:
+        if request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+            return JSONResponse(status_code=401, content={"detail": "Invalid metrics token"})
+    elif not settings.DEBUG:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 # ---------------------------------------------------------------------------
 # WebSocket
 # ---------------------------------------------------------------------------
 
 
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    """WebSocket endpoint for real-time updates."""
-    await ws_manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: str, token: str = Query("")):
+    """WebSocket endpoint for real-time updates. Requires the user's access token."""
+    payload = verify_token(token)
+    if payload is None or payload.get("type") != "access" or payload.get("sub") != user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    connection = await ws_manager.connect(websocket, user_id)
     try:
-        while True:
-            data = await websocket.receive_text()
-            await websocket.send_json({"type": "pong", "data": json.loads(data)})
+        await connection.serve()
     except WebSocketDisconnect:
+        pass
+    finally:
         ws_manager.disconnect(websocket, user_id)
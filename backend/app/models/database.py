@@ -1,18 +1,25 @@
 """Database engine, session setup, and ORM models."""
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from sqlalchemy import (
     Boolean,
+    Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    UniqueConstraint,
+    delete,
     func,
+    inspect,
+    select,
+    text,
     JSON,
 )
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
@@ -32,10 +39,46 @@ class Base(DeclarativeBase):
     pass
 
 
+def _create_missing_indexes(sync_conn):
+    """create_all() only indexes tables it creates — add new indexes to existing ones."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _dedupe_signals(sync_conn):
+    """Drop duplicate signal identities left by the old delete-and-recreate refresh.
+
+    Runs only until the unique identity index exists. Keeps a dismissed copy if
+    there is one (so the user's dismissal sticks), else the newest.
+    """
+    inspector = inspect(sync_conn)
+    if "signals" not in inspector.get_table_names():
+        return
+    if any(ix["name"] == "uq_signals_identity" for ix in inspector.get_indexes("signals")):
+        return
+
+    signals = Signal.__table__
+    ranked = select(
+        signals.c.id,
+        func.row_number()
+        .over(
+            partition_by=(signals.c.workspace_id, signals.c.signal_type, signals.c.entity_type, signals.c.entity_id),
+            order_by=(signals.c.is_dismissed.desc(), signals.c.created_at.desc(), signals.c.id.desc()),
+        )
+        .label("rank"),
+    ).subquery()
+    sync_conn.execute(
+        delete(signals).where(signals.c.id.in_(select(ranked.c.id).where(ranked.c.rank > 1)))
+    )
+
+
 async def create_tables():
-    """Create all database tables."""
+    """Create all database tables and any indexes added since they were created."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_dedupe_signals)
+        await conn.run_sync(_create_missing_indexes)
 
 
 async def get_db() -> AsyncSession:
@@ -53,6 +96,15 @@ def generate_uuid() -> str:
     return str(uuid.uuid4())
 
 
+def dialect_insert(db: AsyncSession):
+    """Return the dialect-specific ``insert`` that supports ON CONFLICT."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
 # ---------------------------------------------------------------------------
 # Workspace & Membership
 # ---------------------------------------------------------------------------
@@ -227,6 +279,10 @@ Client = Company
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Workspace-scoped scans reach invoices through their company
+        Index("ix_invoices_company_due", "company_id", "due_date"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     user_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id"), nullable=False, index=True)
@@ -278,6 +334,28 @@ class Task(Base):
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        # Scanner dedupe: a user's unread alerts of one type, by entity
+        Index(
+            "ix_alerts_unread_entity",
+            "user_id",
+            "type",
+            "related_entity_id",
+            postgresql_where=text("NOT is_read"),
+            sqlite_where=text("is_read = 0"),
+        ),
+        # Unread counts and lists stay proportional to unread alerts, not history
+        Index(
+            "ix_alerts_unread_user",
+            "user_id",
+            "severity",
+            "created_at",
+            postgresql_where=text("NOT is_read"),
+            sqlite_where=text("is_read = 0"),
+        ),
+        # Retention walks read alerts oldest first
+        Index("ix_alerts_created", "created_at"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     user_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id"), nullable=False, index=True)
@@ -293,6 +371,25 @@ class Alert(Base):
     user: Mapped["User"] = relationship(back_populates="alerts")
 
 
+class AlertArchive(Base):
+    """Read alerts past retention, moved out of ``alerts`` by the archive job."""
+
+    __tablename__ = "alerts_archive"
+    __table_args__ = (Index("ix_alerts_archive_user_created", "user_id", "created_at"),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id"), nullable=False)
+    type: Mapped[str] = mapped_column(String(30))
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    message: Mapped[str] = mapped_column(Text, nullable=False)
+    severity: Mapped[str] = mapped_column(String(10))
+    is_read: Mapped[bool] = mapped_column(Boolean, default=True)
+    related_entity_type: Mapped[Optional[str]] = mapped_column(String(30))
+    related_entity_id: Mapped[Optional[str]] = mapped_column(String(36))
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
 # ---------------------------------------------------------------------------
 # Automation
 # ---------------------------------------------------------------------------
@@ -409,6 +506,12 @@ class Warehouse(Base):
 
 class StockMovement(Base):
     __tablename__ = "stock_movements"
+    __table_args__ = (
+        # point-in-time queries scan the ledger tail after a checkpoint
+        Index("ix_stock_movements_workspace_created", "workspace_id", "created_at"),
+        # keyset pages of one product's history, newest first
+        Index("ix_stock_movements_product_created", "product_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
@@ -426,6 +529,130 @@ class StockMovement(Base):
     warehouse: Mapped["Warehouse"] = relationship(back_populates="stock_movements")
 
 
+# ---------------------------------------------------------------------------
+# Stock Balance  (materialized on-hand per product/warehouse — derived from ledger)
+# ---------------------------------------------------------------------------
+
+
+class StockBalance(Base):
+    __tablename__ = "stock_balances"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "product_id", "warehouse_id", name="uq_stock_balance_key"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey("products.id"), nullable=False, index=True)
+    warehouse_id: Mapped[str] = mapped_column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    on_hand: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+# ---------------------------------------------------------------------------
+# Stock Daily Rollup  (units sold/received per product/warehouse/day — derived from ledger)
+# ---------------------------------------------------------------------------
+
+
+class StockDailyRollup(Base):
+    __tablename__ = "stock_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "product_id", "warehouse_id", "day", name="uq_stock_daily_rollup_key"),
+        Index("ix_stock_daily_rollups_workspace_day", "workspace_id", "day"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[str] = mapped_column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)  # UTC
+    units_sold: Mapped[float] = mapped_column(Float, default=0.0)
+    units_received: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+# ---------------------------------------------------------------------------
+# Demand Forecast  (per-product forecast and suggested reorder level — derived)
+# ---------------------------------------------------------------------------
+
+
+class DemandForecast(Base):
+    __tablename__ = "demand_forecasts"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "product_id", name="uq_demand_forecast_product"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey("products.id"), nullable=False)
+    daily_demand: Mapped[float] = mapped_column(Float, default=0.0)  # smoothed units/day
+    demand_std: Mapped[float] = mapped_column(Float, default=0.0)  # units/day
+    lead_time_days: Mapped[float] = mapped_column(Float, nullable=False)
+    safety_stock: Mapped[float] = mapped_column(Float, default=0.0)
+    reorder_point: Mapped[float] = mapped_column(Float, default=0.0)  # suggested reorder level
+    history_days: Mapped[int] = mapped_column(Integer, default=0)  # days of history since first sale
+    computed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+# ---------------------------------------------------------------------------
+# Stock Checkpoint  (periodic snapshot of balances for point-in-time queries)
+# ---------------------------------------------------------------------------
+
+
+class StockCheckpoint(Base):
+    __tablename__ = "stock_checkpoints"
+    __table_args__ = (
+        Index("ix_stock_checkpoints_workspace_taken", "workspace_id", "taken_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False)
+    taken_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # covers movements created_at <= taken_at
+    line_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+    lines: Mapped[list["StockCheckpointLine"]] = relationship(back_populates="checkpoint", cascade="all, delete-orphan")
+
+
+class StockCheckpointLine(Base):
+    __tablename__ = "stock_checkpoint_lines"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    checkpoint_id: Mapped[str] = mapped_column(String(36), ForeignKey("stock_checkpoints.id"), nullable=False, index=True)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[str] = mapped_column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    on_hand: Mapped[float] = mapped_column(Float, nullable=False)
+
+    checkpoint: Mapped["StockCheckpoint"] = relationship(back_populates="lines")
+
+
+# ---------------------------------------------------------------------------
+# Inventory Valuation  (cost layers derived incrementally from the ledger)
+# ---------------------------------------------------------------------------
+
+
+class InventoryCostLayer(Base):
+    __tablename__ = "inventory_cost_layers"
+    __table_args__ = (
+        Index("ix_inventory_cost_layers_key", "workspace_id", "product_id", "warehouse_id"),
+    )
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id: Mapped[str] = mapped_column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    method: Mapped[str] = mapped_column(String(10), nullable=False)  # fifo/average
+    sequence: Mapped[int] = mapped_column(Integer, default=0)  # FIFO consumption order
+    quantity: Mapped[float] = mapped_column(Float, nullable=False)
+    unit_cost: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class InventoryValuationCursor(Base):
+    __tablename__ = "inventory_valuation_cursors"
+
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), primary_key=True)
+    processed_until: Mapped[Optional[datetime]] = mapped_column(DateTime)  # movements created_at <= this are applied
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
 # ---------------------------------------------------------------------------
 # Sales Order
 # ---------------------------------------------------------------------------
@@ -520,6 +747,12 @@ class PurchaseOrderItem(Base):
 
 class Signal(Base):
     __tablename__ = "signals"
+    __table_args__ = (
+        # One signal per rule and entity — refreshes update it in place
+        Index("uq_signals_identity", "workspace_id", "signal_type", "entity_type", "entity_id", unique=True),
+        # Covers the summary badge aggregate without touching the table
+        Index("ix_signals_summary", "workspace_id", "is_dismissed", "severity", "is_read"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
@@ -535,6 +768,25 @@ class Signal(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
 
+# ---------------------------------------------------------------------------
+# Signal Dirty Mark  (rule + entity to re-evaluate, written by domain events)
+# ---------------------------------------------------------------------------
+
+
+class SignalDirtyMark(Base):
+    __tablename__ = "signal_dirty_marks"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "signal_type", "entity_id", name="uq_signal_dirty_mark"),
+    )
+
+    # Re-marking replaces the id, so a worker only clears the marks it has read
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    workspace_id: Mapped[str] = mapped_column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
+    signal_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    entity_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    marked_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
 # ---------------------------------------------------------------------------
 # Contact  (people within companies)
 # ---------------------------------------------------------------------------
@@ -1,6 +1,6 @@
 """Pydantic request/response schemas for all entities."""
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any, Optional
 
 from pydantic import BaseModel, Field, model_validator
@@ -655,6 +655,44 @@ class StockAdjustmentRequest(BaseModel):
     notes: Optional[str] = Field(None, max_length=500)
 
 
+class BulkAdjustmentRequest(BaseModel):
+    rows: list[StockAdjustmentRequest] = Field(..., max_length=10000)
+
+
+class BulkAdjustmentError(BaseModel):
+    row: int
+    detail: str
+
+
+class BulkAdjustmentResponse(BaseModel):
+    created: int = 0
+    failed: int = 0
+    # index-aligned with the input rows, None = rejected; null when the stream was too long to list
+    movement_ids: Optional[list[Optional[str]]] = None
+    errors: list[BulkAdjustmentError] = []  # first BULK_MAX_REPORTED_ERRORS only; see ``failed``
+
+
+class WarehouseValuation(BaseModel):
+    warehouse_id: str
+    warehouse_name: Optional[str] = None
+    quantity: float
+    value: float
+
+
+class CategoryValuation(BaseModel):
+    category: Optional[str] = None
+    quantity: float
+    value: float
+
+
+class InventoryValuationResponse(BaseModel):
+    method: str  # fifo/average
+    as_of: datetime
+    total_value: float
+    by_warehouse: list[WarehouseValuation] = []
+    by_category: list[CategoryValuation] = []
+
+
 class StockMovementResponse(BaseModel):
     id: str
     workspace_id: str
@@ -673,6 +711,48 @@ class StockMovementResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class StockMovementPage(BaseModel):
+    items: list[StockMovementResponse] = []
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next (older) page
+
+
+class StockMovementBucket(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    bucket_start: date
+    movement_count: int
+    quantity_in: float
+    quantity_out: float
+    net_change: float
+
+
+class DailyUnitsSeries(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    sku: Optional[str] = None
+    # index-aligned with DailyUnitsResponse.days
+    units_sold: list[float] = []
+    units_received: list[float] = []
+
+
+class DailyUnitsResponse(BaseModel):
+    days: list[date] = []
+    series: list[DailyUnitsSeries] = []
+
+
+class DemandForecastResponse(BaseModel):
+    product_id: str
+    daily_demand: float
+    demand_std: float
+    lead_time_days: float
+    safety_stock: float
+    reorder_point: float
+    history_days: int
+    computed_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
 class StockLevelResponse(BaseModel):
     product_id: str
     product_name: str
@@ -686,6 +766,30 @@ class StockLevelResponse(BaseModel):
     is_low_stock: bool
 
 
+class StockLevelMatrixResponse(BaseModel):
+    # compact form of StockLevelResponse — parallel arrays, one index per product/warehouse pair
+    product_ids: list[str] = []
+    warehouse_ids: list[str] = []
+    on_hand: list[float] = []
+    reserved: list[float] = []
+    available: list[float] = []
+
+
+class StockAsOfLine(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    sku: Optional[str] = None
+    warehouse_id: str
+    warehouse_name: Optional[str] = None
+    on_hand: float
+
+
+class StockAsOfResponse(BaseModel):
+    as_of: datetime
+    checkpoint_at: Optional[datetime] = None  # base snapshot the answer was built from
+    levels: list[StockAsOfLine] = []
+
+
 # ---------------------------------------------------------------------------
 # Sales Order
 # ---------------------------------------------------------------------------
@@ -815,6 +919,31 @@ class ReceiveItemsRequest(BaseModel):
     items: list[dict]  # [{item_id, quantity_received}]
 
 
+class ReplenishmentLine(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    product_sku: Optional[str] = None
+    on_hand: float
+    reserved: float
+    on_order: float
+    net_position: float
+    reorder_level: float
+    quantity: float
+    unit_cost: float
+
+
+class ReplenishmentGroup(BaseModel):
+    supplier_id: str
+    supplier_name: Optional[str] = None
+    lines: list[ReplenishmentLine] = []
+
+
+class ReplenishmentPlanResponse(BaseModel):
+    suppliers: list[ReplenishmentGroup] = []
+    unassigned: list[ReplenishmentLine] = []  # short, but never bought from a supplier
+    order_ids: list[str] = []  # draft purchase orders created, if any
+
+
 # ---------------------------------------------------------------------------
 # Signal
 # ---------------------------------------------------------------------------
@@ -836,6 +965,12 @@ class SignalResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class SignalDelta(BaseModel):
+    added: list[SignalResponse] = []
+    changed: list[SignalResponse] = []
+    removed: list[str] = []  # signal ids
+
+
 class SignalSummary(BaseModel):
     total: int
     critical: int
@@ -1,12 +1,13 @@
 """Alerts router — list, read, dismiss alerts."""
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select, update
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import get_current_user
 from app.models.database import Alert, User, get_db
 from app.models.schemas import AlertCountResponse, AlertResponse
+from app.services import alert_service
 
 router = APIRouter(prefix="/api/alerts", tags=["alerts"])
 
@@ -17,30 +18,7 @@ async def get_alert_counts(
     db: AsyncSession = Depends(get_db),
 ):
     """Get unread alert counts by severity."""
-    uid = user.id
-    base = select(Alert).where(Alert.user_id == uid, Alert.is_read == False)  # noqa: E712
-
-    unread = (await db.execute(
-        select(func.count()).select_from(base.subquery())
-    )).scalar() or 0
-
-    critical = (await db.execute(
-        select(func.count()).select_from(base.where(Alert.severity == "critical").subquery())
-    )).scalar() or 0
-
-    warning = (await db.execute(
-        select(func.count()).select_from(
-            select(Alert).where(Alert.user_id == uid, Alert.is_read == False, Alert.severity == "warning").subquery()  # noqa: E712
-        )
-    )).scalar() or 0
-
-    info = (await db.execute(
-        select(func.count()).select_from(
-            select(Alert).where(Alert.user_id == uid, Alert.is_read == False, Alert.severity == "info").subquery()  # noqa: E712
-        )
-    )).scalar() or 0
-
-    return AlertCountResponse(unread=unread, critical=critical, warning=warning, info=info)
+    return AlertCountResponse(**await alert_service.get_unread_counts(db, user.id))
 
 
 @router.get("", response_model=list[AlertResponse])
@@ -73,13 +51,9 @@ async def mark_alert_read(
     db: AsyncSession = Depends(get_db),
 ):
     """Mark a single alert as read."""
-    result = await db.execute(
-        select(Alert).where(Alert.id == alert_id, Alert.user_id == user.id)
-    )
-    alert = result.scalar_one_or_none()
+    alert = await alert_service.mark_read(db, alert_id, user.id)
     if not alert:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert not found")
-    alert.is_read = True
     return {"message": "Alert marked as read"}
 
 
@@ -89,9 +63,7 @@ async def mark_all_read(
     db: AsyncSession = Depends(get_db),
 ):
     """Mark all alerts as read."""
-    await db.execute(
-        update(Alert).where(Alert.user_id == user.id, Alert.is_read == False).values(is_read=True)  # noqa: E712
-    )
+    await alert_service.mark_all_read(db, user.id)
     return {"message": "All alerts marked as read"}
 
 
@@ -102,11 +74,6 @@ async def dismiss_alert(
     db: AsyncSession = Depends(get_db),
 ):
     """Dismiss (delete) an alert."""
-    result = await db.execute(
-        select(Alert).where(Alert.id == alert_id, Alert.user_id == user.id)
-    )
-    alert = result.scalar_one_or_none()
-    if not alert:
+    if not await alert_service.dismiss_alert(db, alert_id, user.id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert not found")
-    await db.delete(alert)
     return {"message": "Alert dismissed"}
@@ -1,19 +1,35 @@
-"""Chat router — conversational AI assistant endpoint."""
+"""Chat router — conversational AI assistant endpoint.
 
+Replies come whole (``POST /api/chat``) or streamed as they are generated:
+over Server-Sent Events (``POST /api/chat/stream``) or over the user's open
+WebSocket by sending ``{"type": "chat", "message": ..., "session_id": ...,
+"id": ...}`` and receiving ``chat.start``, ``chat.delta``… and ``chat.done``
+frames carrying that ``id``.
+"""
+
+import json
 import uuid
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from fastapi import APIRouter, Depends, Request
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import MovingWindowRateLimiter
+from pydantic import BaseModel, Field, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import get_current_user
 from app.main import limiter
-from app.models.database import User, get_db
-from app.services import chat_service
+from app.models.database import User, async_session, get_db
+from app.services import chat_service, connections
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# WebSocket frames bypass slowapi; hold them to the same budget as the HTTP endpoints
+WS_CHAT_LIMIT = parse("30/minute")
+_ws_limiter = MovingWindowRateLimiter(MemoryStorage())
+
 
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=2000)
@@ -53,3 +69,80 @@ async def send_chat_message(
         actions=result.get("actions"),
         chart_data=result.get("chart_data"),
     )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+@limiter.limit("30/minute")
+async def stream_chat_message(
+    request: Request,
+    body: ChatRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream the reply as Server-Sent Events: ``start``, ``delta``… then ``done``."""
+    session_id = body.session_id or str(uuid.uuid4())
+    chunks = await chat_service.chat_stream(
+        user=user,
+        db=db,
+        message=body.message,
+        session_id=session_id,
+        page_context=body.page_context,
+    )
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("start", {"session_id": session_id})
+        parts = []
+        async for text in chunks:
+            parts.append(text)
+            yield _sse("delta", {"text": text})
+        yield _sse("done", {"session_id": session_id, "reply": "".join(parts)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No proxy buffering — the first token should reach the browser at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def ws_chat(connection: connections.Connection, frame: dict) -> None:
+    """Stream a chat reply over the user's WebSocket."""
+    request_id = frame.get("id")
+    try:
+        body = ChatRequest.model_validate(frame)
+    except ValidationError as exc:
+        await connection.send({"type": "error", "data": {"id": request_id, "detail": exc.errors(include_url=False)}})
+        return
+    if not _ws_limiter.hit(WS_CHAT_LIMIT, "chat", connection.user_id):
+        await connection.send({"type": "error", "data": {"id": request_id, "detail": "Rate limit exceeded"}})
+        return
+
+    session_id = body.session_id or str(uuid.uuid4())
+    async with async_session() as db:
+        user = await db.get(User, connection.user_id)
+        if user is None:
+            return
+        chunks = await chat_service.chat_stream(
+            user=user,
+            db=db,
+            message=body.message,
+            session_id=session_id,
+            page_context=body.page_context,
+        )
+
+    ids = {"id": request_id, "session_id": session_id}
+    await connection.send({"type": "chat.start", "data": ids})
+    parts = []
+    async for text in chunks:
+        parts.append(text)
+        if not await connection.send({"type": "chat.delta", "data": {**ids, "text": text}}):
+            await chunks.aclose()
+            return
+    await connection.send({"type": "chat.done", "data": {**ids, "reply": "".join(parts)}})
+
+
+connections.register_handler("chat", ws_chat)
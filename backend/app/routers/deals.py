@@ -15,6 +15,7 @@ from app.models.schemas import (
     DealStageUpdate,
     DealUpdate,
 )
+from app.services import domain_events
 
 router = APIRouter(prefix="/api/deals", tags=["deals"])
 
@@ -124,7 +125,9 @@ async def create_deal(
         title=f"Deal created: {deal.title}",
     )
     db.add(activity)
-    return await _enrich(deal, db)
+    response = await _enrich(deal, db)
+    await domain_events.emit(db, workspace.id, "deal.changed", [deal.id], "created")
+    return response
 
 
 @router.put("/{deal_id}", response_model=DealResponse)
@@ -142,7 +145,10 @@ async def update_deal(
         raise HTTPException(status_code=404, detail="Deal not found")
     for field, value in body.model_dump(exclude_unset=True).items():
         setattr(deal, field, value)
-    return await _enrich(deal, db)
+    response = await _enrich(deal, db)
+    # After serializing: the event's autoflush expires the server-side updated_at
+    await domain_events.emit(db, workspace.id, "deal.changed", [deal.id])
+    return response
 
 
 @router.put("/{deal_id}/stage", response_model=DealResponse)
@@ -173,7 +179,9 @@ async def move_deal_stage(
         title=f"Stage changed: {old_stage} → {body.stage}",
     )
     db.add(activity)
-    return await _enrich(deal, db)
+    response = await _enrich(deal, db)
+    await domain_events.emit(db, workspace.id, "deal.changed", [deal.id])
+    return response
 
 
 @router.delete("/{deal_id}", status_code=204)
@@ -189,3 +197,4 @@ async def delete_deal(
     if not deal:
         raise HTTPException(status_code=404, detail="Deal not found")
     await db.delete(deal)
+    await domain_events.emit(db, workspace.id, "deal.changed", [deal.id], "deleted")
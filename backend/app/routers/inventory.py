@@ -2,15 +2,19 @@
 
 import logging
 import math
-from typing import Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import get_current_user, get_current_workspace
 from app.models.database import (
     Product,
+    StockDailyRollup,
     StockMovement,
     User,
     Warehouse,
@@ -18,146 +22,315 @@ from app.models.database import (
     get_db,
 )
 from app.models.schemas import (
+    BulkAdjustmentError,
+    BulkAdjustmentRequest,
+    BulkAdjustmentResponse,
+    CategoryValuation,
+    DailyUnitsResponse,
+    DailyUnitsSeries,
+    DemandForecastResponse,
+    InventoryValuationResponse,
     PaginatedResponse,
     StockAdjustmentRequest,
+    StockAsOfLine,
+    StockAsOfResponse,
+    StockLevelMatrixResponse,
     StockLevelResponse,
+    StockMovementBucket,
+    StockMovementPage,
     StockMovementResponse,
+    WarehouseValuation,
 )
+from app.services import forecast_service, ledger_service, stock_service, valuation_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/inventory", tags=["inventory"])
 
+# Bulk adjustments are validated, inserted and committed this many rows at a time
+BULK_CHUNK_SIZE = 1000
+# Daily units time series: at most this many products and days per request
+DAILY_MAX_PRODUCTS = 500
+DAILY_MAX_DAYS = 366
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+# Longer NDJSON lines are rejected as a row error instead of being buffered
+NDJSON_MAX_LINE_BYTES = 64 * 1024
+# Response size stays bounded however long the stream: movement ids are only
+# returned up to this many rows, and only the first errors are listed
+BULK_MAX_RETURNED_IDS = 10000
+BULK_MAX_REPORTED_ERRORS = 1000
 
-@router.get("", response_model=list[StockLevelResponse])
+
+@router.get("", response_model=Union[list[StockLevelResponse], StockLevelMatrixResponse])
 async def get_stock_levels(
     warehouse_id: Optional[str] = Query(None),
+    product_ids: Optional[str] = Query(None, description="Comma-separated product IDs (default: all)"),
+    compact: bool = Query(False, description="Return parallel arrays instead of one object per row"),
     workspace: Workspace = Depends(get_current_workspace),
     db: AsyncSession = Depends(get_db),
 ):
     """Current stock levels for all tracked products per warehouse."""
-    products_result = await db.execute(
-        select(Product).where(
-            Product.workspace_id == workspace.id,
-            Product.is_active == True,
-            Product.track_inventory == True,
-        )
+    return await stock_service.get_stock_levels(
+        db,
+        workspace.id,
+        warehouse_id=warehouse_id,
+        product_ids=[p for p in product_ids.split(",") if p] if product_ids else None,
+        compact=compact,
     )
-    products = products_result.scalars().all()
 
-    wh_query = select(Warehouse).where(Warehouse.workspace_id == workspace.id)
-    if warehouse_id:
-        wh_query = wh_query.where(Warehouse.id == warehouse_id)
-    wh_result = await db.execute(wh_query)
-    warehouses = wh_result.scalars().all()
 
-    from app.models.database import SalesOrder, SalesOrderItem
+@router.get("/as-of", response_model=StockAsOfResponse)
+async def get_stock_as_of(
+    at: datetime = Query(..., description="Point in time (ISO 8601); naive values are UTC"),
+    product_id: Optional[str] = Query(None),
+    warehouse_id: Optional[str] = Query(None),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stock on hand at a past point in time (e.g. month-end closing).
+
+    Answered from the nearest earlier checkpoint plus the movements after it.
+    """
+    checkpoint_at, quantities = await stock_service.get_stock_as_of(
+        db, workspace.id, at, product_id=product_id, warehouse_id=warehouse_id
+    )
+
+    # Names only for the keys actually returned
+    product_ids = {p_id for p_id, _ in quantities}
+    warehouse_ids = {wh_id for _, wh_id in quantities}
+    products, warehouse_names = {}, {}
+    if quantities:
+        products_result = await db.execute(
+            select(Product.id, Product.name, Product.sku).where(
+                Product.workspace_id == workspace.id, Product.id.in_(product_ids)
+            )
+        )
+        products = {row.id: row for row in products_result.all()}
+        wh_result = await db.execute(
+            select(Warehouse.id, Warehouse.name).where(
+                Warehouse.workspace_id == workspace.id, Warehouse.id.in_(warehouse_ids)
+            )
+        )
+        warehouse_names = dict(wh_result.all())
 
     levels = []
-    for product in products:
-        for wh in warehouses:
-            on_hand_res = await db.execute(
-                select(func.coalesce(func.sum(StockMovement.quantity_delta), 0)).where(
-                    StockMovement.product_id == product.id,
-                    StockMovement.warehouse_id == wh.id,
-                )
+    for (p_id, wh_id), on_hand in sorted(quantities.items()):
+        product = products.get(p_id)
+        levels.append(
+            StockAsOfLine(
+                product_id=p_id,
+                product_name=product.name if product else None,
+                sku=product.sku if product else None,
+                warehouse_id=wh_id,
+                warehouse_name=warehouse_names.get(wh_id),
+                on_hand=on_hand,
             )
-            on_hand = float(on_hand_res.scalar() or 0)
-
-            reserved_res = await db.execute(
-                select(func.coalesce(func.sum(SalesOrderItem.quantity - SalesOrderItem.fulfilled_quantity), 0))
-                .join(SalesOrder, SalesOrderItem.order_id == SalesOrder.id)
-                .where(
-                    SalesOrderItem.product_id == product.id,
-                    SalesOrder.workspace_id == workspace.id,
-                    SalesOrder.status.in_(["confirmed", "partially_fulfilled"]),
-                )
+        )
+
+    return StockAsOfResponse(as_of=at, checkpoint_at=checkpoint_at, levels=levels)
+
+
+@router.get("/daily", response_model=DailyUnitsResponse)
+async def get_daily_units(
+    product_ids: Optional[str] = Query(None, description="Comma-separated product IDs (default: all with activity)"),
+    date_from: Optional[date] = Query(None, description="First day (default: 29 days before date_to)"),
+    date_to: Optional[date] = Query(None, description="Last day, inclusive (default: today UTC)"),
+    warehouse_id: Optional[str] = Query(None),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Units sold and received per day for many products, from the daily rollup.
+
+    Series are dense: one value per day in the range, zeros on quiet days.
+    """
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days + 1 > DAILY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {DAILY_MAX_DAYS} days per request")
+
+    if product_ids:
+        ids = list(dict.fromkeys(p for p in product_ids.split(",") if p))
+    else:
+        active = await db.execute(
+            select(StockDailyRollup.product_id).distinct().where(
+                StockDailyRollup.workspace_id == workspace.id,
+                StockDailyRollup.day >= date_from,
+                StockDailyRollup.day <= date_to,
             )
-            reserved = max(0.0, float(reserved_res.scalar() or 0))
-            available = max(0.0, on_hand - reserved)
-
-            levels.append(
-                StockLevelResponse(
-                    product_id=product.id,
-                    product_name=product.name,
-                    sku=product.sku,
-                    warehouse_id=wh.id,
-                    warehouse_name=wh.name,
-                    on_hand=on_hand,
-                    reserved=reserved,
-                    available=available,
-                    reorder_level=product.reorder_level,
-                    is_low_stock=on_hand <= product.reorder_level,
-                )
+        )
+        ids = list(active.scalars().all())
+    if len(ids) > DAILY_MAX_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"At most {DAILY_MAX_PRODUCTS} products per request")
+
+    products_result = await db.execute(
+        select(Product.id, Product.name, Product.sku).where(
+            Product.workspace_id == workspace.id, Product.id.in_(ids)
+        )
+    )
+    products = {row.id: row for row in products_result.all()}
+    series = await stock_service.get_daily_series(db, workspace.id, products, date_from, date_to, warehouse_id)
+
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    response = DailyUnitsResponse(days=days)
+    for product_id in ids:
+        product = products.get(product_id)
+        if product is None:
+            continue
+        by_day = series.get(product_id, {})
+        response.series.append(
+            DailyUnitsSeries(
+                product_id=product_id,
+                product_name=product.name,
+                sku=product.sku,
+                units_sold=[by_day.get(d, (0.0, 0.0))[0] for d in days],
+                units_received=[by_day.get(d, (0.0, 0.0))[1] for d in days],
             )
+        )
+    return response
+
+
+@router.get("/forecasts", response_model=list[DemandForecastResponse])
+async def list_forecasts(
+    product_id: Optional[str] = Query(None),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stored demand forecasts and suggested reorder levels (refreshed nightly)."""
+    return await forecast_service.list_forecasts(db, workspace.id, [product_id] if product_id else None)
 
-    return levels
 
+@router.get("/valuation", response_model=InventoryValuationResponse)
+async def get_inventory_valuation(
+    method: str = Query("fifo", pattern="^(fifo|average)$"),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Inventory value per warehouse and per product category.
 
-@router.get("/movements", response_model=PaginatedResponse)
-async def list_movements(
+    Cost layers are maintained incrementally, so this only processes the
+    movements recorded since the previous valuation.
+    """
+    valuation = await valuation_service.get_valuation(db, workspace.id, method)
+
+    wh_result = await db.execute(
+        select(Warehouse.id, Warehouse.name).where(Warehouse.workspace_id == workspace.id)
+    )
+    warehouse_names = dict(wh_result.all())
+
+    by_warehouse = [
+        WarehouseValuation(
+            warehouse_id=wh_id,
+            warehouse_name=warehouse_names.get(wh_id),
+            quantity=qty,
+            value=round(value, 2),
+        )
+        for wh_id, (qty, value) in sorted(valuation["by_warehouse"].items())
+    ]
+    by_category = [
+        CategoryValuation(category=category, quantity=qty, value=round(value, 2))
+        for category, (qty, value) in sorted(
+            valuation["by_category"].items(), key=lambda item: item[0] or ""
+        )
+    ]
+
+    return InventoryValuationResponse(
+        method=method,
+        as_of=valuation["as_of"],
+        total_value=round(sum(v for _, v in valuation["by_warehouse"].values()), 2),
+        by_warehouse=by_warehouse,
+        by_category=by_category,
+    )
+
+
+def _ledger_filters(
     product_id: Optional[str] = Query(None),
     warehouse_id: Optional[str] = Query(None),
     movement_type: Optional[str] = Query(None),
+    reference_type: Optional[str] = Query(None),
+    reference_id: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="Inclusive lower bound on created_at"),
+    date_to: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
+) -> dict:
+    return {
+        "product_id": product_id,
+        "warehouse_id": warehouse_id,
+        "movement_type": movement_type,
+        "reference_type": reference_type,
+        "reference_id": reference_id,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+
+@router.get("/movements", response_model=PaginatedResponse)
+async def list_movements(
+    filters: dict = Depends(_ledger_filters),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
     workspace: Workspace = Depends(get_current_workspace),
     db: AsyncSession = Depends(get_db),
 ):
-    """Full stock movement ledger with optional filters."""
-    query = select(StockMovement).where(StockMovement.workspace_id == workspace.id)
-
-    if product_id:
-        query = query.where(StockMovement.product_id == product_id)
-    if warehouse_id:
-        query = query.where(StockMovement.warehouse_id == warehouse_id)
-    if movement_type:
-        query = query.where(StockMovement.type == movement_type)
-
-    count_result = await db.execute(select(func.count()).select_from(query.subquery()))
-    total = count_result.scalar() or 0
-
-    query = query.order_by(StockMovement.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    movements = result.scalars().all()
-
-    # Enrich with product/warehouse names
-    items = []
-    for m in movements:
-        r = StockMovementResponse.model_validate(m)
-        p_res = await db.execute(select(Product.name).where(Product.id == m.product_id))
-        r.product_name = p_res.scalar_one_or_none()
-        wh_res = await db.execute(select(Warehouse.name).where(Warehouse.id == m.warehouse_id))
-        r.warehouse_name = wh_res.scalar_one_or_none()
-        items.append(r)
+    """Stock movement ledger with page numbers and a total count.
+
+    Prefer ``/ledger`` for deep browsing — offsets get slower the further in.
+    """
+    count_query = ledger_service.filter_movements(select(func.count(StockMovement.id)), workspace.id, **filters)
+    total = (await db.execute(count_query)).scalar() or 0
+
+    query = ledger_service.filter_movements(ledger_service.movements_with_names(db), workspace.id, **filters)
+    result = await db.execute(query.offset((page - 1) * page_size).limit(page_size))
 
     return PaginatedResponse(
-        items=items, total=total, page=page, page_size=page_size,
+        items=ledger_service.to_responses(result.all()), total=total, page=page, page_size=page_size,
         pages=max(1, math.ceil(total / page_size)),
     )
 
 
+@router.get("/ledger", response_model=StockMovementPage)
+async def browse_ledger(
+    filters: dict = Depends(_ledger_filters),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stock movement ledger, newest first, with keyset (cursor) pagination."""
+    try:
+        items, next_cursor = await ledger_service.list_movements_page(
+            db, workspace.id, cursor=cursor, limit=limit, **filters
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return StockMovementPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/ledger/buckets", response_model=list[StockMovementBucket])
+async def get_ledger_buckets(
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    filters: dict = Depends(_ledger_filters),
+    limit: int = Query(500, ge=1, le=5000),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Movements summed per product into daily or weekly buckets, newest first."""
+    buckets = await ledger_service.bucket_movements(db, workspace.id, bucket, limit=limit, **filters)
+    return [StockMovementBucket(**b) for b in buckets]
+
+
 @router.get("/movements/{product_id}", response_model=list[StockMovementResponse])
 async def get_product_movements(
     product_id: str,
+    limit: int = Query(100, ge=1, le=500),
     workspace: Workspace = Depends(get_current_workspace),
     db: AsyncSession = Depends(get_db),
 ):
-    """All movements for a specific product."""
-    result = await db.execute(
-        select(StockMovement)
-        .where(StockMovement.product_id == product_id, StockMovement.workspace_id == workspace.id)
-        .order_by(StockMovement.created_at.desc())
-    )
-    movements = result.scalars().all()
-    items = []
-    for m in movements:
-        r = StockMovementResponse.model_validate(m)
-        p_res = await db.execute(select(Product.name).where(Product.id == m.product_id))
-        r.product_name = p_res.scalar_one_or_none()
-        wh_res = await db.execute(select(Warehouse.name).where(Warehouse.id == m.warehouse_id))
-        r.warehouse_name = wh_res.scalar_one_or_none()
-        items.append(r)
+    """Most recent movements for a specific product.
+
+    Bounded by ``limit`` — page further back with ``/ledger?product_id=``.
+    """
+    items, _ = await ledger_service.list_movements_page(db, workspace.id, limit=limit, product_id=product_id)
     return items
 
 
@@ -173,13 +346,15 @@ async def create_adjustment(
     p_result = await db.execute(
         select(Product).where(Product.id == payload.product_id, Product.workspace_id == workspace.id)
     )
-    if p_result.scalar_one_or_none() is None:
+    product = p_result.scalar_one_or_none()
+    if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
     wh_result = await db.execute(
         select(Warehouse).where(Warehouse.id == payload.warehouse_id, Warehouse.workspace_id == workspace.id)
     )
-    if wh_result.scalar_one_or_none() is None:
+    warehouse = wh_result.scalar_one_or_none()
+    if warehouse is None:
         raise HTTPException(status_code=404, detail="Warehouse not found")
 
     movement = StockMovement(
@@ -192,12 +367,137 @@ async def create_adjustment(
         notes=payload.notes,
         created_by=user.id,
     )
-    db.add(movement)
-    await db.flush()
+    await stock_service.record_movement(db, movement)
 
     r = StockMovementResponse.model_validate(movement)
-    p_name = await db.execute(select(Product.name).where(Product.id == payload.product_id))
-    r.product_name = p_name.scalar_one_or_none()
-    wh_name = await db.execute(select(Warehouse.name).where(Warehouse.id == payload.warehouse_id))
-    r.warehouse_name = wh_name.scalar_one_or_none()
+    r.product_name = product.name
+    r.warehouse_name = warehouse.name
     return r
+
+
+async def _ndjson_chunks(request: Request) -> AsyncIterator[list]:
+    """Yield parsed NDJSON rows from the request stream, BULK_CHUNK_SIZE at a time.
+
+    Each item is a StockAdjustmentRequest, or an error string for a line that
+    failed to parse or exceeded NDJSON_MAX_LINE_BYTES. Blank lines are ignored.
+    """
+    buffer = b""
+    skipping = False  # inside an oversized line, dropping bytes until its newline
+    chunk: list = []
+
+    def parse(line: bytes):
+        try:
+            return StockAdjustmentRequest.model_validate_json(line)
+        except ValidationError as e:
+            return f"Invalid row: {e.errors()[0]['msg']}"
+
+    async for data in request.stream():
+        if skipping:
+            newline = data.find(b"\n")
+            if newline < 0:
+                continue
+            data, skipping = data[newline + 1:], False
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if len(line) > NDJSON_MAX_LINE_BYTES:
+                chunk.append("Line too long")
+            elif line.strip():
+                chunk.append(parse(line))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if len(buffer) > NDJSON_MAX_LINE_BYTES:
+            chunk.append("Line too long")
+            buffer, skipping = b"", True
+    if buffer.strip():
+        chunk.append(parse(buffer))
+    if chunk:
+        yield chunk
+
+
+async def _list_chunks(rows: list[StockAdjustmentRequest]) -> AsyncIterator[list]:
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        yield rows[start:start + BULK_CHUNK_SIZE]
+
+
+def _bulk_request_body() -> dict:
+    """OpenAPI request body for the bulk endpoint, which parses its body by hand."""
+    schema = BulkAdjustmentRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schema},
+                "application/x-ndjson": {
+                    "schema": {"$ref": "#/components/schemas/StockAdjustmentRequest"},
+                    "description": "One StockAdjustmentRequest object per line",
+                },
+            },
+        }
+    }
+
+
+@router.post(
+    "/adjustments/bulk",
+    response_model=BulkAdjustmentResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=_bulk_request_body(),
+)
+async def create_bulk_adjustments(
+    request: Request,
+    workspace: Workspace = Depends(get_current_workspace),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Record many stock adjustments at once (e.g. a stocktake).
+
+    Accepts either a JSON body ``{"rows": [StockAdjustmentRequest, ...]}`` (up to
+    10,000 rows) or, with ``Content-Type: application/x-ndjson``, one adjustment
+    object per line, read from the stream in constant memory. Rows are processed
+    in chunks: two ``IN`` queries validate the ids, one executemany inserts the
+    movements, and each chunk is committed on its own so a long stocktake never
+    holds balance row locks (or an old transaction timestamp) for its duration.
+    Invalid rows are skipped and reported by index; valid rows are recorded.
+
+    ``movement_ids`` is index-aligned with the input for up to
+    BULK_MAX_RETURNED_IDS rows and null for longer streams.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        chunks = _ndjson_chunks(request)
+    else:
+        try:
+            payload = BulkAdjustmentRequest.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        chunks = _list_chunks(payload.rows)
+
+    response = BulkAdjustmentResponse(movement_ids=[])
+    offset = 0
+    async for chunk in chunks:
+        valid = [(i, row) for i, row in enumerate(chunk) if isinstance(row, StockAdjustmentRequest)]
+        ids, errors = await stock_service.bulk_adjust(db, workspace.id, user.id, [row for _, row in valid])
+        await db.commit()
+
+        chunk_ids: list[Optional[str]] = [None] * len(chunk)
+        for (i, _), movement_id in zip(valid, ids):
+            chunk_ids[i] = movement_id
+        chunk_errors = [(i, row) for i, row in enumerate(chunk) if isinstance(row, str)]
+        chunk_errors += [(valid[e["row"]][0], e["detail"]) for e in errors]
+
+        if response.movement_ids is not None:
+            if offset + len(chunk) <= BULK_MAX_RETURNED_IDS:
+                response.movement_ids.extend(chunk_ids)
+            else:
+                response.movement_ids = None
+        room = BULK_MAX_REPORTED_ERRORS - len(response.errors)
+        response.errors.extend(
+            BulkAdjustmentError(row=offset + i, detail=detail) for i, detail in sorted(chunk_errors)[:room]
+        )
+        response.failed += len(chunk_errors)
+        offset += len(chunk)
+
+    response.created = offset - response.failed
+    return response
@@ -22,7 +22,7 @@ from app.models.schemas import (
     InvoiceUpdate,
     PaginatedResponse,
 )
-from app.services import ai_agent
+from app.services import ai_agent, domain_events
 
 logger = logging.getLogger(__name__)
 
@@ -258,6 +258,7 @@ async def create_invoice(
     )
     db.add(invoice)
     await db.flush()
+    await domain_events.emit_invoice_changed(db, invoice.id, invoice.company_id, "created")
     return invoice
 
 
@@ -301,6 +302,7 @@ async def update_invoice(
     for field, value in update_data.items():
         setattr(invoice, field, value)
 
+    await domain_events.emit_invoice_changed(db, invoice.id, invoice.company_id)
     return invoice
 
 
@@ -325,6 +327,7 @@ async def delete_invoice(
         )
 
     await db.delete(invoice)
+    await domain_events.emit_invoice_changed(db, invoice.id, invoice.company_id, "deleted")
 
 
 # ---------------------------------------------------------------------------
@@ -372,6 +375,7 @@ async def send_reminder(
     invoice.reminder_count = reminder_number
     if invoice.status == "sent" and days_overdue > 0:
         invoice.status = "overdue"
+        await domain_events.emit_invoice_changed(db, invoice.id, invoice.company_id)
 
     return {
         "id": invoice.id,
@@ -9,13 +9,14 @@ from sqlalchemy import func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import get_current_workspace
-from app.models.database import Product, StockMovement, Warehouse, Workspace, get_db
+from app.models.database import Product, Warehouse, Workspace, get_db
 from app.models.schemas import (
     PaginatedResponse,
     ProductCreate,
     ProductResponse,
     ProductUpdate,
 )
+from app.services import forecast_service, stock_service
 
 logger = logging.getLogger(__name__)
 
@@ -32,30 +33,16 @@ async def _get_product_or_404(product_id: str, workspace_id: str, db: AsyncSessi
     return product
 
 
-async def _get_stock(product_id: str, workspace_id: str, db: AsyncSession) -> tuple[float, float]:
-    """Return (on_hand, reserved) for a product across all warehouses."""
-    on_hand_result = await db.execute(
-        select(func.coalesce(func.sum(StockMovement.quantity_delta), 0)).where(
-            StockMovement.product_id == product_id,
-            StockMovement.workspace_id == workspace_id,
-        )
-    )
-    on_hand = float(on_hand_result.scalar() or 0)
-
-    # Reserved = sum of confirmed/partially_fulfilled sales order items
-    # (imported inline to avoid circular imports)
-    from app.models.database import SalesOrder, SalesOrderItem
-    reserved_result = await db.execute(
-        select(func.coalesce(func.sum(SalesOrderItem.quantity - SalesOrderItem.fulfilled_quantity), 0))
-        .join(SalesOrder, SalesOrderItem.order_id == SalesOrder.id)
-        .where(
-            SalesOrderItem.product_id == product_id,
-            SalesOrder.workspace_id == workspace_id,
-            SalesOrder.status.in_(["confirmed", "partially_fulfilled"]),
-        )
-    )
-    reserved = max(0.0, float(reserved_result.scalar() or 0))
-    return on_hand, reserved
+_NO_STOCK = {"on_hand": 0.0, "reserved": 0.0, "available": 0.0}
+
+
+def _to_response(product: Product, totals: dict[str, dict]) -> ProductResponse:
+    """Serialize a product with stock figures taken from a batch stock lookup."""
+    stock = totals.get(product.id, _NO_STOCK)
+    resp = ProductResponse.model_validate(product)
+    resp.stock_on_hand = stock["on_hand"]
+    resp.stock_available = stock["available"]
+    return resp
 
 
 @router.get("/low-stock", response_model=list[ProductResponse])
@@ -63,7 +50,11 @@ async def get_low_stock(
     workspace: Workspace = Depends(get_current_workspace),
     db: AsyncSession = Depends(get_db),
 ):
-    """Return active products that are at or below their reorder level."""
+    """Return active products at or below their reorder level.
+
+    The level is the demand forecast's suggested reorder point where one
+    exists, otherwise the product's static ``reorder_level``.
+    """
     result = await db.execute(
         select(Product).where(
             Product.workspace_id == workspace.id,
@@ -73,15 +64,13 @@ async def get_low_stock(
     )
     products = result.scalars().all()
 
-    low_stock = []
-    for p in products:
-        on_hand, reserved = await _get_stock(p.id, workspace.id, db)
-        if on_hand <= p.reorder_level:
-            resp = ProductResponse.model_validate(p)
-            resp.stock_on_hand = on_hand
-            resp.stock_available = max(0.0, on_hand - reserved)
-            low_stock.append(resp)
-    return low_stock
+    totals = await stock_service.get_stock_totals(db, workspace.id)
+    levels = await forecast_service.get_reorder_levels(db, workspace.id, {p.id: p.reorder_level for p in products})
+    return [
+        _to_response(p, totals)
+        for p in products
+        if totals.get(p.id, _NO_STOCK)["on_hand"] <= levels[p.id]
+    ]
 
 
 @router.get("/{product_id}/stock", response_model=dict)
@@ -99,23 +88,18 @@ async def get_product_stock(
     )
     warehouses = warehouses_result.scalars().all()
 
-    breakdown = []
-    for wh in warehouses:
-        wh_on_hand_result = await db.execute(
-            select(func.coalesce(func.sum(StockMovement.quantity_delta), 0)).where(
-                StockMovement.product_id == product_id,
-                StockMovement.warehouse_id == wh.id,
-            )
-        )
-        wh_on_hand = float(wh_on_hand_result.scalar() or 0)
-        breakdown.append({"warehouse_id": wh.id, "warehouse_name": wh.name, "on_hand": wh_on_hand})
+    by_warehouse = await stock_service.get_on_hand_by_warehouse(db, workspace.id, product_id)
+    breakdown = [
+        {"warehouse_id": wh.id, "warehouse_name": wh.name, "on_hand": by_warehouse.get(wh.id, 0.0)}
+        for wh in warehouses
+    ]
 
-    on_hand, reserved = await _get_stock(product_id, workspace.id, db)
+    stock = (await stock_service.get_stock_totals(db, workspace.id, [product_id]))[product_id]
     return {
         "product_id": product_id,
-        "on_hand": on_hand,
-        "reserved": reserved,
-        "available": max(0.0, on_hand - reserved),
+        "on_hand": stock["on_hand"],
+        "reserved": stock["reserved"],
+        "available": stock["available"],
         "by_warehouse": breakdown,
     }
 
@@ -149,13 +133,8 @@ async def list_products(
     result = await db.execute(query)
     products = result.scalars().all()
 
-    items = []
-    for p in products:
-        on_hand, reserved = await _get_stock(p.id, workspace.id, db)
-        resp = ProductResponse.model_validate(p)
-        resp.stock_on_hand = on_hand
-        resp.stock_available = max(0.0, on_hand - reserved)
-        items.append(resp)
+    totals = await stock_service.get_stock_totals(db, workspace.id, [p.id for p in products])
+    items = [_to_response(p, totals) for p in products]
 
     return PaginatedResponse(
         items=items,
@@ -188,11 +167,8 @@ async def get_product(
     db: AsyncSession = Depends(get_db),
 ):
     product = await _get_product_or_404(product_id, workspace.id, db)
-    on_hand, reserved = await _get_stock(product_id, workspace.id, db)
-    resp = ProductResponse.model_validate(product)
-    resp.stock_on_hand = on_hand
-    resp.stock_available = max(0.0, on_hand - reserved)
-    return resp
+    totals = await stock_service.get_stock_totals(db, workspace.id, [product_id])
+    return _to_response(product, totals)
 
 
 @router.put("/{product_id}", response_model=ProductResponse)
@@ -205,11 +181,11 @@ async def update_product(
     product = await _get_product_or_404(product_id, workspace.id, db)
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(product, field, value)
-    on_hand, reserved = await _get_stock(product_id, workspace.id, db)
-    resp = ProductResponse.model_validate(product)
-    resp.stock_on_hand = on_hand
-    resp.stock_available = max(0.0, on_hand - reserved)
-    return resp
+    # Flush and reload so the server-side updated_at is loaded before serializing
+    await db.flush()
+    await db.refresh(product)
+    totals = await stock_service.get_stock_totals(db, workspace.id, [product_id])
+    return _to_response(product, totals)
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
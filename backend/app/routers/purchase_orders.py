@@ -27,7 +27,9 @@ from app.models.schemas import (
     PurchaseOrderResponse,
     PurchaseOrderUpdate,
     ReceiveItemsRequest,
+    ReplenishmentPlanResponse,
 )
+from app.services import domain_events, replenishment_service, stock_service
 
 logger = logging.getLogger(__name__)
 
@@ -53,10 +55,12 @@ async def _next_order_number(workspace_id: str, db: AsyncSession) -> str:
 
 
 async def _build_response(order: PurchaseOrder, db: AsyncSession) -> PurchaseOrderResponse:
-    items_result = await db.execute(
-        select(PurchaseOrderItem).where(PurchaseOrderItem.order_id == order.id)
-    )
-    items = items_result.scalars().all()
+    # Reload server-generated timestamps and the items collection up front so
+    # serializing the ORM object never triggers a lazy load (not allowed under asyncio).
+    await db.flush()
+    await db.refresh(order)
+    await db.refresh(order, ["items"])
+    items = order.items
 
     item_responses = []
     for item in items:
@@ -167,9 +171,78 @@ async def create_purchase_order(
 
     order.total_amount = round(total, 2)
     await db.flush()
+    await domain_events.emit(db, workspace.id, "purchase_order.changed", [order.id], "created")
     return await _build_response(order, db)
 
 
+async def _plan_response(plan: dict, workspace_id: str, db: AsyncSession) -> ReplenishmentPlanResponse:
+    """Attach product and supplier names to a replenishment plan with one IN query each."""
+    lines = plan["unassigned"] + [line for group in plan["suppliers"] for line in group["lines"]]
+    names = {}
+    if lines:
+        p_res = await db.execute(
+            select(Product.id, Product.name, Product.sku).where(
+                Product.workspace_id == workspace_id,
+                Product.id.in_({line["product_id"] for line in lines}),
+            )
+        )
+        names = {pid: (name, sku) for pid, name, sku in p_res.all()}
+    supplier_names = {}
+    if plan["suppliers"]:
+        s_res = await db.execute(
+            select(Company.id, Company.company_name).where(
+                Company.id.in_({group["supplier_id"] for group in plan["suppliers"]})
+            )
+        )
+        supplier_names = dict(s_res.all())
+
+    def _line(line: dict) -> dict:
+        name, sku = names.get(line["product_id"], (None, None))
+        return {**line, "product_name": name, "product_sku": sku}
+
+    return ReplenishmentPlanResponse(
+        suppliers=[
+            {
+                "supplier_id": group["supplier_id"],
+                "supplier_name": supplier_names.get(group["supplier_id"]),
+                "lines": [_line(line) for line in group["lines"]],
+            }
+            for group in plan["suppliers"]
+        ],
+        unassigned=[_line(line) for line in plan["unassigned"]],
+    )
+
+
+@router.get("/replenishment", response_model=ReplenishmentPlanResponse)
+async def preview_replenishment(
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Products whose net position (on hand − reserved + on order) is below their
+    reorder level, grouped by preferred supplier. Creates nothing."""
+    plan = await replenishment_service.plan_replenishment(db, workspace.id)
+    return await _plan_response(plan, workspace.id, db)
+
+
+@router.post("/replenishment", response_model=ReplenishmentPlanResponse, status_code=status.HTTP_201_CREATED)
+async def run_replenishment(
+    currency: str = Query("EUR", max_length=3),
+    workspace: Workspace = Depends(get_current_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Draft one purchase order per supplier covering every current shortfall.
+
+    Unassigned products (no supplier history) are returned but not ordered.
+    """
+    plan = await replenishment_service.plan_replenishment(db, workspace.id)
+    order_ids = await replenishment_service.create_draft_orders(
+        db, workspace.id, plan, currency=currency, notes="Drafted by the replenishment planner",
+    )
+    response = await _plan_response(plan, workspace.id, db)
+    response.order_ids = order_ids
+    return response
+
+
 @router.get("/{order_id}", response_model=PurchaseOrderResponse)
 async def get_purchase_order(
     order_id: str,
@@ -192,6 +265,7 @@ async def update_purchase_order(
         raise HTTPException(status_code=400, detail="Only draft orders can be edited")
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(order, field, value)
+    await domain_events.emit(db, workspace.id, "purchase_order.changed", [order.id])
     return await _build_response(order, db)
 
 
@@ -205,6 +279,7 @@ async def delete_purchase_order(
     if order.status not in ("draft",):
         raise HTTPException(status_code=400, detail="Only draft orders can be deleted")
     await db.delete(order)
+    await domain_events.emit(db, workspace.id, "purchase_order.changed", [order.id], "deleted")
 
 
 @router.post("/{order_id}/send", response_model=PurchaseOrderResponse)
@@ -217,6 +292,7 @@ async def send_purchase_order(
     if order.status != "draft":
         raise HTTPException(status_code=400, detail="Only draft orders can be sent")
     order.status = "sent"
+    await domain_events.emit(db, workspace.id, "purchase_order.changed", [order.id])
     return await _build_response(order, db)
 
 
@@ -244,6 +320,7 @@ async def receive_items(
     )
     items = {item.id: item for item in items_result.scalars().all()}
 
+    movements: list[StockMovement] = []
     all_received = True
     for entry in payload.items:
         item = items.get(entry["item_id"])
@@ -263,12 +340,14 @@ async def receive_items(
                 reference_id=order.id,
                 created_by=user.id,
             )
-            db.add(movement)
+            movements.append(movement)
             item.quantity_received += qty
 
         if item.quantity_received < item.quantity_ordered:
             all_received = False
 
+    await stock_service.record_movements(db, movements)
     order.status = "received" if all_received else "partially_received"
     await db.flush()
+    await domain_events.emit(db, workspace.id, "purchase_order.changed", [order.id])
     return await _build_response(order, db)
@@ -28,6 +28,7 @@ from app.models.schemas import (
     SalesOrderResponse,
     SalesOrderUpdate,
 )
+from app.services import domain_events, stock_service
 
 logger = logging.getLogger(__name__)
 
@@ -55,10 +56,12 @@ async def _next_order_number(workspace_id: str, db: AsyncSession) -> str:
 
 
 async def _build_response(order: SalesOrder, db: AsyncSession) -> SalesOrderResponse:
-    items_result = await db.execute(
-        select(SalesOrderItem).where(SalesOrderItem.order_id == order.id)
-    )
-    items = items_result.scalars().all()
+    # Reload server-generated timestamps and the items collection up front so
+    # serializing the ORM object never triggers a lazy load (not allowed under asyncio).
+    await db.flush()
+    await db.refresh(order)
+    await db.refresh(order, ["items"])
+    items = order.items
 
     item_responses = []
     for item in items:
@@ -164,6 +167,7 @@ async def create_sales_order(
 
     order.total_amount = round(total, 2)
     await db.flush()
+    await domain_events.emit(db, workspace.id, "sales_order.changed", [order.id], "created")
     return await _build_response(order, db)
 
 
@@ -189,6 +193,7 @@ async def update_sales_order(
         raise HTTPException(status_code=400, detail="Only draft orders can be edited")
     for field, value in payload.model_dump(exclude_unset=True).items():
         setattr(order, field, value)
+    await domain_events.emit(db, workspace.id, "sales_order.changed", [order.id])
     return await _build_response(order, db)
 
 
@@ -202,6 +207,7 @@ async def cancel_sales_order(
     if order.status == "fulfilled":
         raise HTTPException(status_code=400, detail="Cannot cancel a fulfilled order")
     order.status = "cancelled"
+    await domain_events.emit(db, workspace.id, "sales_order.changed", [order.id])
 
 
 @router.post("/{order_id}/confirm", response_model=SalesOrderResponse)
@@ -214,6 +220,7 @@ async def confirm_sales_order(
     if order.status != "draft":
         raise HTTPException(status_code=400, detail="Only draft orders can be confirmed")
     order.status = "confirmed"
+    await domain_events.emit(db, workspace.id, "sales_order.changed", [order.id])
     return await _build_response(order, db)
 
 
@@ -248,6 +255,7 @@ async def fulfill_sales_order(
         for entry in payload.items:
             qty_map[entry["item_id"]] = float(entry["quantity"])
 
+    movements: list[StockMovement] = []
     all_fulfilled = True
     for item in items:
         qty_to_fulfill = qty_map.get(item.id, item.quantity - item.fulfilled_quantity) if qty_map else (item.quantity - item.fulfilled_quantity)
@@ -264,12 +272,14 @@ async def fulfill_sales_order(
                 reference_id=order.id,
                 created_by=user.id,
             )
-            db.add(movement)
+            movements.append(movement)
             item.fulfilled_quantity += qty_to_fulfill
 
         if item.fulfilled_quantity < item.quantity:
             all_fulfilled = False
 
+    await stock_service.record_movements(db, movements)
     order.status = "fulfilled" if all_fulfilled else "partially_fulfilled"
     await db.flush()
+    await domain_events.emit(db, workspace.id, "sales_order.changed", [order.id])
     return await _build_response(order, db)
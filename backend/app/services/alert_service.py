@@ -2,25 +2,40 @@
 
 Scans invoices, emails, calendar events, and client activity to generate
 actionable alerts. Uses SQLAlchemy async sessions for all database access.
+
+Each scanner costs a fixed number of statements regardless of how many items
+it finds: the candidate query, one lookup of the entities that already have an
+unread alert of that type (the dedupe set), and one multi-row insert.
+
+Every write pushes the new alerts and the user's unread counts over the
+WebSocket once the session commits (see ``realtime``).
 """
 
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy import and_, delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.database import (
     Alert,
+    AlertArchive,
     CalendarEvent,
     Client,
     Email,
     Invoice,
+    Workspace,
 )
+from app.models.schemas import AlertResponse
+from app.services import realtime, rule_profiler
 
 logger = logging.getLogger(__name__)
 
+# Most alerts sent in one ``alerts.created`` frame; clients refetch when
+# ``total`` says there were more.
+PUSH_LIMIT = 50
+
 
 # ---------------------------------------------------------------------------
 # CRUD operations
@@ -64,6 +79,7 @@ async def create_alert(
     )
     db.add(alert)
     await db.flush()
+    await _push_created(db, user_id, [alert])
     return alert
 
 
@@ -123,6 +139,7 @@ async def mark_read(db: AsyncSession, alert_id: str, user_id: str) -> Optional[A
     if alert:
         alert.is_read = True
         await db.flush()
+        await push_counts(db, user_id)
     return alert
 
 
@@ -135,6 +152,8 @@ async def mark_all_read(db: AsyncSession, user_id: str) -> int:
     )
     result = await db.execute(stmt)
     await db.flush()
+    if result.rowcount:
+        await push_counts(db, user_id)
     return result.rowcount
 
 
@@ -143,6 +162,8 @@ async def dismiss_alert(db: AsyncSession, alert_id: str, user_id: str) -> bool:
     stmt = delete(Alert).where(and_(Alert.id == alert_id, Alert.user_id == user_id))
     result = await db.execute(stmt)
     await db.flush()
+    if result.rowcount:
+        await push_counts(db, user_id)
     return result.rowcount > 0
 
 
@@ -162,11 +183,63 @@ async def get_unread_counts(db: AsyncSession, user_id: str) -> dict:
     }
 
 
+# ---------------------------------------------------------------------------
+# Real-time push (see realtime) — sent when the session commits
+# ---------------------------------------------------------------------------
+
+
+async def push_counts(db: AsyncSession, user_id: str) -> None:
+    """Queue the user's current unread counts as an ``alerts.counts`` frame."""
+    realtime.notify(db, user_id, {"type": "alerts.counts", "data": await get_unread_counts(db, user_id)})
+
+
+async def _push_created(db: AsyncSession, user_id: str, alerts: list[Alert]) -> None:
+    if not alerts:
+        return
+    realtime.notify(db, user_id, {
+        "type": "alerts.created",
+        "data": {
+            "alerts": [AlertResponse.model_validate(a).model_dump(mode="json") for a in alerts[:PUSH_LIMIT]],
+            "total": len(alerts),
+        },
+    })
+    await push_counts(db, user_id)
+
+
 # ---------------------------------------------------------------------------
 # Alert generation — scan business data for actionable items
 # ---------------------------------------------------------------------------
 
 
+async def _unread_entity_ids(db: AsyncSession, user_id: str, alert_type: str) -> set[str]:
+    """Entities that already have an unread alert of ``alert_type`` — one query per scan."""
+    result = await db.execute(
+        select(Alert.related_entity_id).where(
+            and_(
+                Alert.user_id == user_id,
+                Alert.type == alert_type,
+                Alert.is_read == False,  # noqa: E712
+                Alert.related_entity_id.is_not(None),
+            )
+        )
+    )
+    return set(result.scalars().all())
+
+
+async def _insert_alerts(db: AsyncSession, user_id: str, rows: list[dict]) -> list[Alert]:
+    """Insert a scan's new alerts in one multi-row INSERT ... RETURNING."""
+    if not rows:
+        return []
+    result = await db.scalars(
+        insert(Alert).returning(Alert),
+        [{"user_id": user_id, "is_read": False, **row} for row in rows],
+    )
+    alerts = list(result.all())
+    await _push_created(db, user_id, alerts)
+    return alerts
+
+
+@rule_profiler.rule("alert.overdue_invoices", "alert")
 async def scan_overdue_invoices(db: AsyncSession, user_id: str) -> list[Alert]:
     """Generate alerts for invoices that are past due."""
     now = datetime.now(timezone.utc)
@@ -180,11 +253,14 @@ async def scan_overdue_invoices(db: AsyncSession, user_id: str) -> list[Alert]:
         )
     )
     invoices = result.scalars().all()
-    created: list[Alert] = []
+    rule_profiler.examined(len(invoices))
+    # Avoid duplicating existing unread alerts for same invoice
+    alerted = await _unread_entity_ids(db, user_id, "overdue_invoice")
+    rows: list[dict] = []
 
     for inv in invoices:
         days_overdue = (now - inv.due_date.replace(tzinfo=timezone.utc)).days
-        if days_overdue <= 0:
+        if days_overdue <= 0 or inv.id in alerted:
             continue
 
         if days_overdue > 14:
@@ -194,38 +270,22 @@ async def scan_overdue_invoices(db: AsyncSession, user_id: str) -> list[Alert]:
         else:
             severity = "info"
 
-        # Avoid duplicating existing unread alerts for same invoice
-        existing = await db.execute(
-            select(Alert).where(
-                and_(
-                    Alert.user_id == user_id,
-                    Alert.type == "overdue_invoice",
-                    Alert.related_entity_id == inv.id,
-                    Alert.is_read == False,  # noqa: E712
-                )
-            )
-        )
-        if existing.scalar_one_or_none():
-            continue
-
-        alert = await create_alert(
-            db,
-            user_id,
-            alert_type="overdue_invoice",
-            title=f"Invoice {inv.invoice_number} is {days_overdue} days overdue",
-            message=(
+        rows.append({
+            "type": "overdue_invoice",
+            "title": f"Invoice {inv.invoice_number} is {days_overdue} days overdue",
+            "message": (
                 f"Invoice {inv.invoice_number} for EUR {inv.amount:,.2f} was due on "
                 f"{inv.due_date.strftime('%d %b %Y')}. Consider sending a reminder."
             ),
-            severity=severity,
-            related_entity_type="invoice",
-            related_entity_id=inv.id,
-        )
-        created.append(alert)
+            "severity": severity,
+            "related_entity_type": "invoice",
+            "related_entity_id": inv.id,
+        })
 
-    return created
+    return await _insert_alerts(db, user_id, rows)
 
 
+@rule_profiler.rule("alert.unanswered_emails", "alert")
 async def scan_unanswered_emails(db: AsyncSession, user_id: str, hours: int = 48) -> list[Alert]:
     """Generate alerts for emails that need a reply but haven't been answered."""
     cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
@@ -240,67 +300,47 @@ async def scan_unanswered_emails(db: AsyncSession, user_id: str, hours: int = 48
         )
     )
     emails = result.scalars().all()
-    created: list[Alert] = []
-
-    for em in emails:
-        existing = await db.execute(
-            select(Alert).where(
-                and_(
-                    Alert.user_id == user_id,
-                    Alert.type == "no_reply",
-                    Alert.related_entity_id == em.id,
-                    Alert.is_read == False,  # noqa: E712
-                )
-            )
-        )
-        if existing.scalar_one_or_none():
-            continue
-
-        alert = await create_alert(
-            db,
-            user_id,
-            alert_type="no_reply",
-            title=f"No reply sent to: {em.subject[:60]}",
-            message=(
+    rule_profiler.examined(len(emails))
+    alerted = await _unread_entity_ids(db, user_id, "no_reply")
+
+    rows = [
+        {
+            "type": "no_reply",
+            "title": f"No reply sent to: {em.subject[:60]}",
+            "message": (
                 f"Email from {em.from_addr} received on "
                 f"{em.received_at.strftime('%d %b %Y %H:%M')} still needs a reply."
             ),
-            severity="warning",
-            related_entity_type="email",
-            related_entity_id=em.id,
-        )
-        created.append(alert)
-
-    return created
+            "severity": "warning",
+            "related_entity_type": "email",
+            "related_entity_id": em.id,
+        }
+        for em in emails
+        if em.id not in alerted
+    ]
+    return await _insert_alerts(db, user_id, rows)
 
 
+@rule_profiler.rule("alert.stale_leads", "alert")
 async def scan_stale_leads(db: AsyncSession, user_id: str, days: int = 14) -> list[Alert]:
     """Generate alerts for pipeline leads that haven't been contacted recently."""
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     result = await db.execute(
         select(Client).where(
             and_(
-                Client.user_id == user_id,
+                Client.workspace_id.in_(select(Workspace.id).where(Workspace.owner_id == user_id)),
                 Client.pipeline_stage.in_(["lead", "contacted", "proposal"]),
                 (Client.last_contacted < cutoff) | Client.last_contacted.is_(None),
             )
         )
     )
     clients = result.scalars().all()
-    created: list[Alert] = []
+    rule_profiler.examined(len(clients))
+    alerted = await _unread_entity_ids(db, user_id, "reminder")
+    rows: list[dict] = []
 
     for client in clients:
-        existing = await db.execute(
-            select(Alert).where(
-                and_(
-                    Alert.user_id == user_id,
-                    Alert.type == "reminder",
-                    Alert.related_entity_id == client.id,
-                    Alert.is_read == False,  # noqa: E712
-                )
-            )
-        )
-        if existing.scalar_one_or_none():
+        if client.id in alerted:
             continue
 
         last = (
@@ -308,24 +348,22 @@ async def scan_stale_leads(db: AsyncSession, user_id: str, days: int = 14) -> li
             if client.last_contacted
             else "never"
         )
-        alert = await create_alert(
-            db,
-            user_id,
-            alert_type="reminder",
-            title=f"Follow up with {client.company_name}",
-            message=(
+        rows.append({
+            "type": "reminder",
+            "title": f"Follow up with {client.company_name}",
+            "message": (
                 f"{client.company_name} ({client.pipeline_stage}) was last contacted {last}. "
                 f"Consider reaching out to keep the deal moving."
             ),
-            severity="info",
-            related_entity_type="client",
-            related_entity_id=client.id,
-        )
-        created.append(alert)
+            "severity": "info",
+            "related_entity_type": "client",
+            "related_entity_id": client.id,
+        })
 
-    return created
+    return await _insert_alerts(db, user_id, rows)
 
 
+@rule_profiler.rule("alert.upcoming_meetings", "alert")
 async def scan_upcoming_meetings(db: AsyncSession, user_id: str, hours: int = 2) -> list[Alert]:
     """Generate alerts for meetings happening within the next N hours."""
     now = datetime.now(timezone.utc)
@@ -341,52 +379,85 @@ async def scan_upcoming_meetings(db: AsyncSession, user_id: str, hours: int = 2)
         )
     )
     events = result.scalars().all()
-    created: list[Alert] = []
+    rule_profiler.examined(len(events))
+    alerted = await _unread_entity_ids(db, user_id, "reminder")
+    rows: list[dict] = []
 
     for event in events:
-        existing = await db.execute(
-            select(Alert).where(
-                and_(
-                    Alert.user_id == user_id,
-                    Alert.type == "reminder",
-                    Alert.related_entity_id == event.id,
-                    Alert.is_read == False,  # noqa: E712
-                )
-            )
-        )
-        if existing.scalar_one_or_none():
+        if event.id in alerted:
             continue
 
         minutes_until = int((event.start_time.replace(tzinfo=timezone.utc) - now).total_seconds() / 60)
-        alert = await create_alert(
-            db,
-            user_id,
-            alert_type="reminder",
-            title=f"Meeting in {minutes_until} min: {event.title[:50]}",
-            message=(
+        rows.append({
+            "type": "reminder",
+            "title": f"Meeting in {minutes_until} min: {event.title[:50]}",
+            "message": (
                 f"'{event.title}' starts at {event.start_time.strftime('%H:%M')}."
                 + (f" Location: {event.location}" if event.location else "")
             ),
-            severity="info",
-            related_entity_type="event",
-            related_entity_id=event.id,
-        )
-        created.append(alert)
+            "severity": "info",
+            "related_entity_type": "event",
+            "related_entity_id": event.id,
+        })
+
+    return await _insert_alerts(db, user_id, rows)
 
-    return created
+
+# Summary key -> scanner, in the order run_full_scan runs them.
+SCANNERS = {
+    "overdue_invoices": scan_overdue_invoices,
+    "unanswered_emails": scan_unanswered_emails,
+    "stale_leads": scan_stale_leads,
+    "upcoming_meetings": scan_upcoming_meetings,
+}
 
 
 async def run_full_scan(db: AsyncSession, user_id: str) -> dict:
     """Run all alert scanners and return a summary of alerts generated."""
-    overdue = await scan_overdue_invoices(db, user_id)
-    unanswered = await scan_unanswered_emails(db, user_id)
-    stale = await scan_stale_leads(db, user_id)
-    meetings = await scan_upcoming_meetings(db, user_id)
+    summary = {}
+    for name, scanner in SCANNERS.items():
+        summary[name] = len(await scanner(db, user_id))
+    summary["total_new_alerts"] = sum(summary.values())
+    return summary
 
-    return {
-        "overdue_invoices": len(overdue),
-        "unanswered_emails": len(unanswered),
-        "stale_leads": len(stale),
-        "upcoming_meetings": len(meetings),
-        "total_new_alerts": len(overdue) + len(unanswered) + len(stale) + len(meetings),
-    }
+
+# ---------------------------------------------------------------------------
+# Retention — move old read alerts out of the live table
+# ---------------------------------------------------------------------------
+
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+
+_ARCHIVE_COLUMNS = (
+    "id", "user_id", "type", "title", "message", "severity", "is_read",
+    "related_entity_type", "related_entity_id", "created_at",
+)
+
+
+async def archive_read_alerts(
+    db: AsyncSession, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> int:
+    """Move one batch of read alerts created before ``cutoff`` to alerts_archive.
+
+    Oldest first. Returns how many were moved — 0 once nothing is left.
+    Nothing is committed here; commit between batches to keep locks short.
+    """
+    result = await db.execute(
+        select(Alert.id)
+        .where(Alert.is_read == True, Alert.created_at < cutoff)  # noqa: E712
+        .order_by(Alert.created_at)
+        .limit(batch_size)
+    )
+    ids = list(result.scalars().all())
+    if not ids:
+        return 0
+
+    live = Alert.__table__.c
+    await db.execute(
+        insert(AlertArchive).from_select(
+            list(_ARCHIVE_COLUMNS),
+            select(*(live[name] for name in _ARCHIVE_COLUMNS)).where(live.id.in_(ids)),
+        )
+    )
+    await db.execute(delete(Alert).where(Alert.id.in_(ids)))
+    return len(ids)
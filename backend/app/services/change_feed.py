@@ -0,0 +1,45 @@
+"""Change feed — compact "this row changed" events for open list views.
+
+Fed by :func:`domain_events.emit`, so every write path that emits a domain
+event also reaches clients. Each event is ``{entity, id, op, version}``:
+
+* ``op`` — ``created``, ``updated`` or ``deleted``
+* ``version`` — milliseconds since the epoch when the change was made; a
+  client ignores an event older than what it already holds
+
+Events go to the workspace's users under a topic (:data:`ENTITY_TOPICS`).
+Each socket receives only the topics it subscribed to, and
+:class:`connections.Connection` coalesces events arriving close together
+into one ``changes`` frame. Clients re-fetch just the rows named, not the
+whole list.
+"""
+
+import time
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import realtime
+
+# entity -> topic clients subscribe to
+ENTITY_TOPICS = {
+    "deal": "deals",
+    "invoice": "invoices",
+    "purchase_order": "purchase_orders",
+    "sales_order": "sales_orders",
+    "stock": "inventory",
+}
+TOPICS = frozenset(ENTITY_TOPICS.values())
+OPS = ("created", "updated", "deleted")
+
+
+async def publish(db: AsyncSession, workspace_id: str, entity: str, entity_ids: Iterable[str], op: str) -> None:
+    """Queue change events for ``entity_ids`` until ``db`` commits."""
+    if op not in OPS:
+        raise ValueError(f"Unknown change op: {op}")
+    version = time.time_ns() // 1_000_000
+    events = [{"entity": entity, "id": entity_id, "op": op, "version": version} for entity_id in set(entity_ids)]
+    if not events:
+        return
+    user_ids = await realtime.workspace_user_ids(db, workspace_id)
+    realtime.notify(db, user_ids, {"type": "changes", "topic": ENTITY_TOPICS[entity], "data": events})
@@ -0,0 +1,188 @@
+"""Chat context cache — the assembled business context, per user.
+
+:func:`chat_service._gather_context` looks here first and stores what it
+builds for :data:`CONTEXT_TTL` seconds. Entries are dropped as soon as the
+data behind them changes: a flush listener notes which users' emails,
+calendar events, invoices, tasks, clients (via the owning workspace) or
+profile changed, and their entries are deleted once the transaction commits.
+Rolled-back changes invalidate nothing. Bulk ``update()``/``delete()``
+statements bypass the listener and are covered by the TTL.
+
+Shares ``CHAT_SESSION_BACKEND`` with the session store: ``redis`` keeps one
+copy for every worker (so an invalidation reaches all of them), ``memory``
+keeps an LRU-bounded copy per process.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.database import CalendarEvent, Company, Email, Invoice, Task, User, Workspace
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TTL = 60
+MEMORY_MAX_ENTRIES = 10_000
+REDIS_KEY_PREFIX = "lytherahub:chat-context:"
+
+# Rows whose user_id names the user whose context they feed
+_USER_OWNED = (Email, CalendarEvent, Invoice, Task)
+
+metrics.describe("lytherahub_chat_context_total", "counter", "Chat context lookups by cache result")
+metrics.describe("lytherahub_chat_context_invalidations_total", "counter", "Chat context entries invalidated")
+
+
+class MemoryContextCache:
+    """TTL entries within this process, least recently used evicted first."""
+
+    def __init__(self, ttl: float = CONTEXT_TTL, max_entries: int = MEMORY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def get(self, user_id: str) -> Optional[str]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1]
+
+    async def set(self, user_id: str, context: str) -> None:
+        self._entries.pop(user_id, None)
+        self._entries[user_id] = (time.monotonic() + self.ttl, context)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, user_ids: list[str]) -> None:
+        self.delete_sync(user_ids)
+
+    def delete_sync(self, user_ids: list[str]) -> None:
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+
+class RedisContextCache:
+    """One expiring Redis key per user."""
+
+    def __init__(self, url: str, ttl: int = CONTEXT_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._client = None
+        self._loop = None
+        self._sync_client = None
+
+    def _client_for_loop(self):
+        # Connections belong to the loop that opened them; Celery runs a new loop per task
+        import redis.asyncio as aioredis
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = aioredis.Redis.from_url(self.url, socket_connect_timeout=2, socket_timeout=2)
+            self._loop = loop
+        return self._client
+
+    async def get(self, user_id: str) -> Optional[str]:
+        from redis.exceptions import RedisError
+
+        try:
+            data = await self._client_for_loop().get(REDIS_KEY_PREFIX + user_id)
+        except RedisError as exc:
+            logger.warning(f"Could not read chat context cache: {exc}")
+            return None
+        return data.decode() if data is not None else None
+
+    async def set(self, user_id: str, context: str) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            await self._client_for_loop().set(REDIS_KEY_PREFIX + user_id, context, ex=self.ttl)
+        except RedisError as exc:
+            logger.warning(f"Could not write chat context cache: {exc}")
+
+    async def delete(self, user_ids: list[str]) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            await self._client_for_loop().delete(*(REDIS_KEY_PREFIX + user_id for user_id in user_ids))
+        except RedisError as exc:
+            logger.warning(f"Could not invalidate chat context for {len(user_ids)} users: {exc}")
+
+    def delete_sync(self, user_ids: list[str]) -> None:
+        import redis
+
+        try:
+            if self._sync_client is None:
+                self._sync_client = redis.Redis.from_url(self.url, socket_connect_timeout=2, socket_timeout=2)
+            self._sync_client.delete(*(REDIS_KEY_PREFIX + user_id for user_id in user_ids))
+        except redis.RedisError as exc:
+            logger.warning(f"Could not invalidate chat context for {len(user_ids)} users: {exc}")
+
+
+def _make_cache():
+    if settings.CHAT_SESSION_BACKEND == "memory":
+        return MemoryContextCache()
+    return RedisContextCache(settings.REDIS_URL)
+
+
+cache = _make_cache()
+
+_STALE = "chat_context_stale"
+_invalidating: set[asyncio.Task] = set()
+
+
+def invalidate(user_ids: Iterable[str]) -> None:
+    """Drop cached context for ``user_ids`` without waiting on the backend."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    metrics.inc("lytherahub_chat_context_invalidations_total", len(user_ids))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        cache.delete_sync(user_ids)
+        return
+    task = loop.create_task(cache.delete(user_ids))
+    _invalidating.add(task)
+    task.add_done_callback(_invalidating.discard)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale(session, flush_context):
+    user_ids = set()
+    workspace_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, _USER_OWNED):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, Company):
+            workspace_ids.add(obj.workspace_id)
+        elif isinstance(obj, User):
+            user_ids.add(obj.id)
+    if workspace_ids:
+        owners = session.execute(select(Workspace.owner_id).where(Workspace.id.in_(workspace_ids)))
+        user_ids.update(owners.scalars())
+    user_ids.discard(None)
+    if user_ids:
+        session.info.setdefault(_STALE, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale(session):
+    stale = session.info.pop(_STALE, None)
+    if stale:
+        invalidate(stale)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale(session):
+    session.info.pop(_STALE, None)
@@ -1,13 +1,14 @@
 """Chat service — conversational AI assistant with full business context.
 
-Maintains per-session conversation history and routes queries to
-appropriate data sources (emails, clients, invoices, calendar).
+Keeps per-session conversation history in :mod:`chat_sessions` and routes
+queries to appropriate data sources (emails, clients, invoices, calendar).
 """
 
 import json
 import logging
+import re
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,46 +21,51 @@ from app.models.database import (
     Invoice,
     Task,
     User,
+    Workspace,
 )
+from app.services import chat_context, chat_sessions, metrics
 
 logger = logging.getLogger(__name__)
 
-# In-memory session store — maps session_id -> message list
-_sessions: dict[str, list[dict]] = {}
 
-MAX_HISTORY = 20  # Keep last N messages per session
-
-
-def _get_session(session_id: str) -> list[dict]:
-    if session_id not in _sessions:
-        _sessions[session_id] = []
-    return _sessions[session_id]
-
-
-def _trim_session(session_id: str):
-    if session_id in _sessions and len(_sessions[session_id]) > MAX_HISTORY:
-        _sessions[session_id] = _sessions[session_id][-MAX_HISTORY:]
+async def _gather_context(user: User, db: AsyncSession) -> str:
+    """Build a business context summary for the AI from the user's data.
 
+    Served from :mod:`chat_context` while fresh; a miss costs three queries.
+    """
+    cached = await chat_context.cache.get(user.id)
+    if cached is not None:
+        metrics.inc("lytherahub_chat_context_total", result="hit")
+        return cached
+    metrics.inc("lytherahub_chat_context_total", result="miss")
 
-async def _gather_context(user: User, db: AsyncSession) -> str:
-    """Build a business context summary for the AI from the user's data."""
     uid = user.id
+    # Clients belong to workspaces, not users
+    owned_workspaces = select(Workspace.id).where(Workspace.owner_id == uid)
     now = datetime.now(timezone.utc)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     today_end = today_start + timedelta(days=1)
 
-    # Email stats
-    unread = (await db.execute(
-        select(func.count()).select_from(
-            select(Email).where(Email.user_id == uid, Email.is_read == False).subquery()  # noqa: E712
-        )
-    )).scalar() or 0
+    def count(model, *where):
+        return select(func.count()).select_from(model).where(*where).scalar_subquery()
 
-    urgent = (await db.execute(
-        select(func.count()).select_from(
-            select(Email).where(Email.user_id == uid, Email.category == "urgent").subquery()
-        )
-    )).scalar() or 0
+    # Every counter in one round trip
+    counters = (await db.execute(select(
+        count(Email, Email.user_id == uid, Email.is_read == False).label("unread"),  # noqa: E712
+        count(Email, Email.user_id == uid, Email.category == "urgent").label("urgent"),
+        select(func.coalesce(func.sum(Invoice.amount), 0))
+        .where(Invoice.user_id == uid, Invoice.status.in_(["sent", "overdue"]))
+        .scalar_subquery().label("outstanding"),
+        count(Invoice, Invoice.user_id == uid, Invoice.status == "overdue").label("overdue_count"),
+        count(Client, Client.workspace_id.in_(owned_workspaces)).label("total_clients"),
+        count(Task, Task.user_id == uid, Task.status != "done").label("pending_tasks"),
+    ))).one()
+    unread = counters.unread or 0
+    urgent = counters.urgent or 0
+    outstanding = counters.outstanding or 0
+    overdue_count = counters.overdue_count or 0
+    total_clients = counters.total_clients or 0
+    pending_tasks = counters.pending_tasks or 0
 
     # Today's meetings
     meetings_result = await db.execute(
@@ -74,37 +80,11 @@ async def _gather_context(user: User, db: AsyncSession) -> str:
     )
     meetings = meetings_result.scalars().all()
 
-    # Invoice stats
-    outstanding = (await db.execute(
-        select(func.coalesce(func.sum(Invoice.amount), 0))
-        .where(Invoice.user_id == uid, Invoice.status.in_(["sent", "overdue"]))
-    )).scalar() or 0
-
-    overdue_count = (await db.execute(
-        select(func.count()).select_from(
-            select(Invoice).where(Invoice.user_id == uid, Invoice.status == "overdue").subquery()
-        )
-    )).scalar() or 0
-
-    # Client stats
-    total_clients = (await db.execute(
-        select(func.count()).select_from(
-            select(Client).where(Client.user_id == uid).subquery()
-        )
-    )).scalar() or 0
-
-    # Pending tasks
-    pending_tasks = (await db.execute(
-        select(func.count()).select_from(
-            select(Task).where(Task.user_id == uid, Task.status != "done").subquery()
-        )
-    )).scalar() or 0
-
     # Top clients
     top_clients_result = await db.execute(
         select(Client)
-        .where(Client.user_id == uid, Client.pipeline_stage.notin_(["lost"]))
-        .order_by(Client.deal_value.desc())
+        .where(Client.workspace_id.in_(owned_workspaces), Client.pipeline_stage.notin_(["lost"]))
+        .order_by(Client.deal_value.desc().nulls_last())
         .limit(5)
     )
     top_clients = top_clients_result.scalars().all()
@@ -115,11 +95,11 @@ async def _gather_context(user: User, db: AsyncSession) -> str:
     ) or "  No meetings today."
 
     client_lines = "\n".join(
-        f"  - {c.company_name} ({c.pipeline_stage}, EUR {c.deal_value:,.0f})"
+        f"  - {c.company_name} ({c.pipeline_stage}, EUR {c.deal_value or 0:,.0f})"
         for c in top_clients
     ) or "  No clients."
 
-    return (
+    context = (
         f"Date: {now.strftime('%A, %B %d, %Y')}\n"
         f"User: {user.name} ({user.email})\n\n"
         f"EMAILS: {unread} unread ({urgent} urgent)\n"
@@ -129,6 +109,8 @@ async def _gather_context(user: User, db: AsyncSession) -> str:
         f"Top clients:\n{client_lines}\n"
         f"TASKS: {pending_tasks} pending"
     )
+    await chat_context.cache.set(uid, context)
+    return context
 
 
 SYSTEM_PROMPT = """\
@@ -166,7 +148,25 @@ async def chat(
     Returns:
         dict with "reply", optional "actions", optional "chart_data".
     """
-    history = _get_session(session_id)
+    chunks = await chat_stream(user, db, message, session_id, page_context)
+    return {"reply": "".join([text async for text in chunks])}
+
+
+async def chat_stream(
+    user: User,
+    db: AsyncSession,
+    message: str,
+    session_id: str,
+    page_context: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Prepare a reply and return an iterator over its text as it is generated.
+
+    Everything that needs ``db`` happens before this returns, so the iterator
+    can outlive the request's session. Once the iterator is exhausted, the
+    exchange is saved to the session history.
+    """
+    key = chat_sessions.session_key(user.id, session_id)
+    history = await chat_sessions.store.load(key)
     history.append({"role": "user", "content": message})
 
     # Build context
@@ -176,31 +176,48 @@ async def chat(
         context_block += f"\n<current_page>{page_context}</current_page>"
 
     system = f"{SYSTEM_PROMPT}\n\n{context_block}"
+    return _stream_reply(key, history, system, message, biz_context)
+
+
+async def _stream_reply(
+    key: str, history: list[dict], system: str, message: str, biz_context: str
+) -> AsyncIterator[str]:
+    parts: list[str] = []
 
     # Try Claude API
     if not settings.DEMO_MODE and settings.ANTHROPIC_API_KEY:
         try:
             import anthropic
 
-            client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-            response = client.messages.create(
+            client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+            async with client.messages.stream(
                 model=settings.AI_MODEL,
                 max_tokens=1024,
                 system=system,
-                messages=history[-MAX_HISTORY:],
-            )
-            reply_text = response.content[0].text
-            history.append({"role": "assistant", "content": reply_text})
-            _trim_session(session_id)
-            return {"reply": reply_text}
+                # Already capped by the store, and starts with a user turn
+                messages=history,
+            ) as stream:
+                async for text in stream.text_stream:
+                    parts.append(text)
+                    yield text
         except Exception as e:
+            # Before the first token fall back to demo; after it, keep the partial reply
             logger.error(f"Chat Claude API error: {e}")
 
     # Demo fallback
-    reply = _demo_reply(message, biz_context)
-    history.append({"role": "assistant", "content": reply})
-    _trim_session(session_id)
-    return {"reply": reply}
+    if not parts:
+        for text in _chunk_reply(_demo_reply(message, biz_context)):
+            parts.append(text)
+            yield text
+
+    history.append({"role": "assistant", "content": "".join(parts)})
+    await chat_sessions.store.save(key, history)
+
+
+def _chunk_reply(reply: str, words: int = 4) -> list[str]:
+    """Split a canned reply into a few words per chunk, whitespace kept."""
+    tokens = re.findall(r"\s*\S+\s*", reply)
+    return ["".join(tokens[i:i + words]) for i in range(0, len(tokens), words)]
 
 
 def _demo_reply(message: str, context: str) -> str:
@@ -0,0 +1,200 @@
+"""Chat session store — conversation history shared by every worker.
+
+History is stored compactly: one JSON array of ``[role, content]`` pairs
+(``u``/``a``), at most :data:`MAX_MESSAGES` messages and
+:data:`MAX_SESSION_BYTES` encoded, each message cut at
+:data:`MAX_MESSAGE_CHARS`. The oldest messages go first, and a history never
+starts with an assistant turn (the model API rejects that).
+
+Sessions idle for :data:`SESSION_TTL` expire. Backends, chosen by
+``CHAT_SESSION_BACKEND``:
+
+* ``redis`` — one key per session with the TTL, visible to every uvicorn
+  worker. If Redis is down, chats go on without history.
+* ``memory`` — this process only, LRU-evicted past :data:`MEMORY_MAX_SESSIONS`
+  sessions or :data:`MEMORY_MAX_BYTES` in total. For tests and single-process
+  development.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGES = 20
+MAX_MESSAGE_CHARS = 4000
+MAX_SESSION_BYTES = 32 * 1024
+SESSION_TTL = 24 * 3600
+
+MEMORY_MAX_SESSIONS = 10_000
+MEMORY_MAX_BYTES = 64 * 1024 * 1024
+
+REDIS_KEY_PREFIX = "lytherahub:chat:"
+
+_ROLES = {"user": "u", "assistant": "a"}
+_ROLE_NAMES = {code: role for role, code in _ROLES.items()}
+
+metrics.describe("lytherahub_chat_sessions", "gauge", "Chat sessions held in this process")
+metrics.describe("lytherahub_chat_session_bytes", "gauge", "Encoded chat history held in this process")
+metrics.describe("lytherahub_chat_sessions_evicted_total", "counter", "Chat sessions dropped from memory")
+metrics.describe("lytherahub_chat_session_errors_total", "counter", "Chat session store failures")
+
+
+def session_key(user_id: str, session_id: str) -> str:
+    """Sessions belong to a user — another user's session id finds nothing."""
+    return f"{user_id}:{session_id}"
+
+
+def encode(history: list[dict]) -> bytes:
+    """Compact, capped encoding of a message list."""
+    pairs = [
+        [_ROLES[m["role"]], m["content"][:MAX_MESSAGE_CHARS]]
+        for m in history[-MAX_MESSAGES:]
+        if m["role"] in _ROLES
+    ]
+    while True:
+        while pairs and pairs[0][0] != "u":
+            pairs.pop(0)
+        data = json.dumps(pairs, separators=(",", ":"), ensure_ascii=False).encode()
+        if len(data) <= MAX_SESSION_BYTES or not pairs:
+            return data
+        pairs.pop(0)
+
+
+def decode(data: Optional[bytes]) -> list[dict]:
+    if not data:
+        return []
+    return [{"role": _ROLE_NAMES[role], "content": content} for role, content in json.loads(data)]
+
+
+class MemorySessionStore:
+    """LRU + TTL store within this process."""
+
+    def __init__(self, max_sessions: int = MEMORY_MAX_SESSIONS, max_bytes: int = MEMORY_MAX_BYTES,
+                 ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.total_bytes = 0
+
+    def _drop(self, key: str, reason: str) -> None:
+        _, data = self._entries.pop(key)
+        self.total_bytes -= len(data)
+        metrics.inc("lytherahub_chat_sessions_evicted_total", reason=reason)
+
+    def _expire(self) -> None:
+        # Least recently used first, so expired entries are all at the front
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            self._drop(key, "ttl")
+
+    async def load(self, key: str) -> list[dict]:
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is None:
+            return []
+        self._entries[key] = (time.monotonic() + self.ttl, entry[1])
+        self._entries.move_to_end(key)
+        return decode(entry[1])
+
+    async def save(self, key: str, history: list[dict]) -> None:
+        data = encode(history)
+        if key in self._entries:
+            self.total_bytes -= len(self._entries.pop(key)[1])
+        self._entries[key] = (time.monotonic() + self.ttl, data)
+        self.total_bytes += len(data)
+        self._expire()
+        while len(self._entries) > self.max_sessions:
+            self._drop(next(iter(self._entries)), "lru")
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)), "memory")
+
+    async def delete(self, key: str) -> None:
+        if key in self._entries:
+            self.total_bytes -= len(self._entries.pop(key)[1])
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._entries), "bytes": self.total_bytes}
+
+
+class RedisSessionStore:
+    """One Redis key per session, expiring after the TTL."""
+
+    def __init__(self, url: str, ttl: int = SESSION_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._client = None
+        self._loop = None
+
+    def _client_for_loop(self):
+        # Connections belong to the loop that opened them; Celery runs a new loop per task
+        import redis.asyncio as aioredis
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = aioredis.Redis.from_url(self.url, socket_connect_timeout=2, socket_timeout=2)
+            self._loop = loop
+        return self._client
+
+    async def load(self, key: str) -> list[dict]:
+        from redis.exceptions import RedisError
+
+        try:
+            client = self._client_for_loop()
+            data = await client.getex(REDIS_KEY_PREFIX + key, ex=self.ttl)
+        except RedisError as exc:
+            metrics.inc("lytherahub_chat_session_errors_total", op="load")
+            logger.warning(f"Could not load chat session: {exc}")
+            return []
+        return decode(data)
+
+    async def save(self, key: str, history: list[dict]) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            await self._client_for_loop().set(REDIS_KEY_PREFIX + key, encode(history), ex=self.ttl)
+        except RedisError as exc:
+            metrics.inc("lytherahub_chat_session_errors_total", op="save")
+            logger.warning(f"Could not save chat session: {exc}")
+
+    async def delete(self, key: str) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            await self._client_for_loop().delete(REDIS_KEY_PREFIX + key)
+        except RedisError as exc:
+            metrics.inc("lytherahub_chat_session_errors_total", op="delete")
+            logger.warning(f"Could not delete chat session: {exc}")
+
+    def stats(self) -> Optional[dict]:
+        # Sessions live in Redis, not here — see Redis' own memory stats
+        return None
+
+
+def _make_store():
+    if settings.CHAT_SESSION_BACKEND == "memory":
+        return MemorySessionStore()
+    return RedisSessionStore(settings.REDIS_URL)
+
+
+store = _make_store()
+
+
+def _stat(name: str) -> dict:
+    stats = store.stats()
+    return {(): stats[name]} if stats is not None else {}
+
+
+metrics.register_callback("lytherahub_chat_sessions", lambda: _stat("sessions"))
+metrics.register_callback("lytherahub_chat_session_bytes", lambda: _stat("bytes"))
@@ -0,0 +1,335 @@
+"""WebSocket connections of this process — per-connection send queues with backpressure.
+
+Every socket gets a bounded outbound queue drained by its own sender task.
+Broadcasting only enqueues, so a slow client never delays the user's other
+tabs or the publisher.
+
+Overflow policy: a client :data:`SEND_QUEUE_SIZE` frames behind, or one whose
+send stalls past :data:`SEND_TIMEOUT`, is closed with 1013 (try again later)
+instead of silently losing frames — a gap would leave its state wrong. The
+client reconnects and reloads what it shows.
+
+Liveness: :meth:`Connection.serve` reads the socket with a timeout. After
+:data:`HEARTBEAT_INTERVAL` of silence the server queues a ``{"type": "ping"}``
+frame, which clients answer with the bare text ``pong``; a socket silent for
+:data:`IDLE_TIMEOUT` is half-open or abandoned and is closed with 1001.
+Clients may also send the bare text ``ping`` and get ``pong`` back — neither
+is parsed as JSON.
+
+A user keeps at most :data:`MAX_CONNECTIONS_PER_USER` sockets; a new one
+closes the oldest with 1008.
+
+Change feed: a client sends ``{"type": "subscribe", "topics": [...]}`` (or
+``unsubscribe``) and is answered with ``subscribed`` and its current topics.
+Messages carrying a ``topic`` (see :mod:`change_feed`) reach only subscribed
+sockets, and events arriving within :data:`COALESCE_WINDOW` of each other go
+out as one ``changes`` frame, keeping the latest event per row.
+
+Requests: other JSON frames whose ``type`` has a handler registered with
+:func:`register_handler` (e.g. ``chat``) run as tasks beside the read loop,
+at most :data:`MAX_PENDING_REQUESTS` per socket. Handlers reply through
+:meth:`Connection.send`, which waits for queue room instead of closing the
+socket — a long reply slows to the client's pace.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Union
+
+from fastapi import WebSocket
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = 256
+SEND_TIMEOUT = 10.0
+SLOW_CONSUMER_CLOSE = 1013
+
+HEARTBEAT_INTERVAL = 25.0
+IDLE_TIMEOUT = 60.0
+IDLE_CLOSE = 1001
+MAX_CONNECTIONS_PER_USER = 10
+LIMIT_CLOSE = 1008
+
+COALESCE_WINDOW = 0.2
+MAX_TOPICS = 32
+
+MAX_PENDING_REQUESTS = 2
+
+PING_FRAME = json.dumps({"type": "ping"})
+
+metrics.describe("lytherahub_ws_connections", "gauge", "Open WebSocket connections")
+metrics.describe("lytherahub_ws_users", "gauge", "Users with at least one open WebSocket")
+metrics.describe("lytherahub_ws_connections_opened_total", "counter", "WebSocket connections accepted")
+metrics.describe("lytherahub_ws_connections_closed_total", "counter", "WebSocket connections closed")
+metrics.describe("lytherahub_ws_queue_depth", "gauge", "Frames waiting in all send queues")
+metrics.describe("lytherahub_ws_queue_depth_max", "gauge", "Frames waiting in the fullest send queue")
+metrics.describe("lytherahub_ws_messages_sent_total", "counter", "Frames written to sockets")
+metrics.describe("lytherahub_ws_messages_dropped_total", "counter", "Frames discarded before sending")
+metrics.describe("lytherahub_ws_slow_consumers_closed_total", "counter", "Connections closed for falling behind")
+metrics.describe("lytherahub_ws_change_events_total", "counter", "Change feed events queued for sockets")
+metrics.describe("lytherahub_ws_change_frames_total", "counter", "Coalesced change feed frames sent")
+
+
+Handler = Callable[["Connection", dict], Awaitable[None]]
+_handlers: dict[str, Handler] = {}
+
+
+def register_handler(message_type: str, handler: Handler) -> None:
+    """Run ``handler(connection, frame)`` for client frames of ``message_type``."""
+    _handlers[message_type] = handler
+
+
+def _merge_change(previous: Optional[dict], event: dict) -> dict:
+    """Keep the later of two events for one row; a row created in the window stays ``created``."""
+    if previous is None:
+        return event
+    older, newer = (previous, event) if event["version"] >= previous["version"] else (event, previous)
+    if newer["op"] == "updated" and older["op"] == "created":
+        return {**newer, "op": "created"}
+    return newer
+
+
+class Connection:
+    """One socket and the task that drains its outbound queue."""
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.topics: set[str] = set()
+        self._changes: dict[str, dict[tuple[str, str], dict]] = {}
+        self._flush: Optional[asyncio.TimerHandle] = None
+        self._requests: set[asyncio.Task] = set()
+        self._sender: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def offer(self, message: Union[dict, str]) -> bool:
+        """Queue a frame (a dict, or text already encoded) without waiting. False if it was dropped."""
+        if self.closed:
+            metrics.inc("lytherahub_ws_messages_dropped_total", reason="closed")
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            metrics.inc("lytherahub_ws_messages_dropped_total", reason="overflow")
+            logger.warning(f"Closing slow WebSocket for user {self.user_id}: send queue full")
+            self.close(SLOW_CONSUMER_CLOSE, reason="overflow")
+            return False
+
+    async def send(self, message: Union[dict, str]) -> bool:
+        """Queue a frame, waiting for room. False if the socket is (or gets) closed."""
+        if self.closed:
+            return False
+        try:
+            await asyncio.wait_for(self.queue.put(message), SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Closing slow WebSocket for user {self.user_id}: send queue stayed full")
+            self.close(SLOW_CONSUMER_CLOSE, reason="timeout")
+            return False
+        return not self.closed
+
+    def offer_changes(self, topic: str, events: list[dict]) -> bool:
+        """Hold change events for the coalescing window. False if not subscribed to ``topic``."""
+        if self.closed or topic not in self.topics:
+            return False
+        pending = self._changes.setdefault(topic, {})
+        for event in events:
+            key = (event["entity"], event["id"])
+            pending[key] = _merge_change(pending.get(key), event)
+        metrics.inc("lytherahub_ws_change_events_total", len(events))
+        if self._flush is None:
+            self._flush = asyncio.get_running_loop().call_later(COALESCE_WINDOW, self._flush_changes)
+        return True
+
+    def _flush_changes(self) -> None:
+        self._flush = None
+        changes, self._changes = self._changes, {}
+        if changes:
+            metrics.inc("lytherahub_ws_change_frames_total")
+            self.offer({"type": "changes", "data": {topic: list(events.values()) for topic, events in changes.items()}})
+
+    def _update_topics(self, request: dict) -> None:
+        topics = request.get("topics")
+        if isinstance(topics, str):
+            topics = [topics]
+        if not isinstance(topics, list):
+            topics = []
+        topics = {topic for topic in topics if isinstance(topic, str)}
+        if request["type"] == "subscribe":
+            self.topics |= set(sorted(topics - self.topics)[:max(0, MAX_TOPICS - len(self.topics))])
+        else:
+            self.topics -= topics
+            for topic in topics:
+                self._changes.pop(topic, None)
+        self.offer({"type": "subscribed", "data": {"topics": sorted(self.topics)}})
+
+    def _start_request(self, handler: Handler, request: dict) -> None:
+        if len(self._requests) >= MAX_PENDING_REQUESTS:
+            self.offer({"type": "error", "data": {"id": request.get("id"), "detail": "Too many requests in flight"}})
+            return
+        task = asyncio.create_task(handler(self, request))
+        self._requests.add(task)
+        task.add_done_callback(self._request_done)
+
+    def _request_done(self, task: asyncio.Task) -> None:
+        self._requests.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"WebSocket request failed for user {self.user_id}", exc_info=task.exception())
+
+    async def _send_loop(self) -> None:
+        while True:
+            message = await self.queue.get()
+            if not isinstance(message, str):
+                message = encode(message)
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Closing slow WebSocket for user {self.user_id}: send timed out")
+                self.close(SLOW_CONSUMER_CLOSE, reason="timeout")
+                return
+            except Exception:
+                self.close()  # the client went away
+                return
+            metrics.inc("lytherahub_ws_messages_sent_total")
+
+    async def serve(self) -> None:
+        """Read from the client until it leaves, heartbeating while it is quiet."""
+        while not self.closed:
+            try:
+                message = await asyncio.wait_for(self.websocket.receive(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if time.monotonic() - self.last_seen >= IDLE_TIMEOUT:
+                    logger.info(f"Closing idle WebSocket for user {self.user_id}")
+                    self.close(IDLE_CLOSE, reason="idle")
+                    return
+                self.offer(PING_FRAME)
+                continue
+            if message["type"] == "websocket.disconnect":
+                return
+            self.last_seen = time.monotonic()
+
+            text = message.get("text")
+            if text is None or text == "pong":
+                continue
+            if text == "ping":
+                self.offer("pong")
+                continue
+            try:
+                data = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and data.get("type") in ("subscribe", "unsubscribe"):
+                self._update_topics(data)
+                continue
+            if isinstance(data, dict) and data.get("type") in _handlers:
+                self._start_request(_handlers[data["type"]], data)
+                continue
+            self.offer({"type": "pong", "data": data})
+
+    def close(self, code: Optional[int] = None, reason: Optional[str] = None) -> None:
+        """Stop sending. With ``code``, also close the socket (in the background)."""
+        if self.closed:
+            return
+        self.closed = True
+        metrics.inc("lytherahub_ws_connections_closed_total", reason=reason or "client")
+        if self._flush is not None:
+            self._flush.cancel()
+        for task in list(self._requests):
+            if task is not asyncio.current_task():
+                task.cancel()
+        if self.queue.qsize():
+            metrics.inc("lytherahub_ws_messages_dropped_total", self.queue.qsize(), reason="closed")
+        if reason in ("overflow", "timeout"):
+            metrics.inc("lytherahub_ws_slow_consumers_closed_total", reason=reason)
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+        if code is not None:
+            self._closer = asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int) -> None:
+        with contextlib.suppress(Exception):
+            await self.websocket.close(code=code)
+
+
+class ConnectionManager:
+    """Manage WebSocket connections per user."""
+
+    def __init__(self):
+        self.active_connections: dict[str, dict[WebSocket, Connection]] = {}
+
+    async def connect(self, websocket: WebSocket, user_id: str) -> Connection:
+        await websocket.accept()
+        connection = Connection(websocket, user_id)
+        connection.start()
+        connections = self.active_connections.setdefault(user_id, {})
+        # Dicts keep insertion order, so the first entries are the oldest sockets
+        while len(connections) >= MAX_CONNECTIONS_PER_USER:
+            oldest = connections.pop(next(iter(connections)))
+            oldest.close(LIMIT_CLOSE, reason="limit")
+        connections[websocket] = connection
+        metrics.inc("lytherahub_ws_connections_opened_total")
+        return connection
+
+    def disconnect(self, websocket: WebSocket, user_id: str) -> None:
+        connections = self.active_connections.get(user_id)
+        if connections is None:
+            return
+        connection = connections.pop(websocket, None)
+        if connection is not None:
+            connection.close()
+        if not connections:
+            del self.active_connections[user_id]
+
+    async def broadcast_to_user(self, user_id: str, message: dict) -> int:
+        """Queue ``message`` on each of the user's sockets. Never waits on a send.
+
+        Returns how many sockets accepted it.
+        """
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return 0
+        topic = message.get("topic")
+        if topic is not None:
+            return sum(connection.offer_changes(topic, message["data"]) for connection in connections.values())
+        text = encode(message)  # once, however many sockets the user has
+        accepted = 0
+        for websocket, connection in list(connections.items()):
+            if connection.offer(text):
+                accepted += 1
+            if connection.closed:
+                connections.pop(websocket, None)
+        if not connections:
+            self.active_connections.pop(user_id, None)
+        return accepted
+
+    def user_count(self) -> int:
+        return len(self.active_connections)
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.active_connections.values())
+
+    def queue_depths(self) -> list[int]:
+        return [c.queue.qsize() for cs in self.active_connections.values() for c in cs.values()]
+
+
+def encode(message: dict) -> str:
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+ws_manager = ConnectionManager()
+
+metrics.register_callback("lytherahub_ws_connections", lambda: {(): ws_manager.connection_count()})
+metrics.register_callback("lytherahub_ws_users", lambda: {(): ws_manager.user_count()})
+metrics.register_callback("lytherahub_ws_queue_depth", lambda: {(): sum(ws_manager.queue_depths())})
+metrics.register_callback("lytherahub_ws_queue_depth_max", lambda: {(): max(ws_manager.queue_depths(), default=0)})
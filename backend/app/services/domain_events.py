@@ -0,0 +1,76 @@
+"""Domain events — a lightweight hook fired from write paths.
+
+Write paths call :func:`emit` with what changed, in the same transaction as
+the change. Two consumers:
+
+* signal invalidation — each event maps to the signal rule it can affect, and
+  :func:`signal_service.mark_dirty` records the (rule, entity) pairs for the
+  background worker to re-evaluate
+* the :mod:`change_feed` — connected clients hear which rows changed, once
+  the transaction commits
+
+Events:
+
+* ``invoice.changed`` — invoice created, edited, deleted or its status moved
+* ``stock.moved`` — stock movements inserted for the given products
+* ``deal.changed`` — deal created, edited, moved to another stage or deleted
+* ``purchase_order.changed`` — PO created, edited, deleted or its status moved
+* ``sales_order.changed`` — SO created, edited, cancelled or its status moved
+"""
+
+import logging
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Company
+from app.services import change_feed, signal_service
+
+logger = logging.getLogger(__name__)
+
+# event -> signal rule it invalidates (None: no rule watches it)
+EVENT_RULES = {
+    "invoice.changed": "overdue_invoice",
+    "stock.moved": "low_stock",
+    "deal.changed": "stale_deal",
+    "purchase_order.changed": "late_delivery",
+    "sales_order.changed": None,
+}
+
+# event -> change feed entity
+EVENT_ENTITIES = {
+    "invoice.changed": "invoice",
+    "stock.moved": "stock",
+    "deal.changed": "deal",
+    "purchase_order.changed": "purchase_order",
+    "sales_order.changed": "sales_order",
+}
+
+
+async def emit(
+    db: AsyncSession, workspace_id: str, event: str, entity_ids: Iterable[str], op: str = "updated"
+) -> None:
+    """Record that ``entity_ids`` changed in ``workspace_id``. Nothing is committed here.
+
+    ``op`` is ``created``, ``updated`` or ``deleted``, passed on to the change feed.
+    """
+    if event not in EVENT_RULES:
+        raise ValueError(f"Unknown domain event: {event}")
+    entity_ids = set(entity_ids)
+    rule = EVENT_RULES[event]
+    if rule is not None:
+        await signal_service.mark_dirty(db, workspace_id, rule, entity_ids)
+    await change_feed.publish(db, workspace_id, EVENT_ENTITIES[event], entity_ids, op)
+
+
+async def emit_invoice_changed(
+    db: AsyncSession, invoice_id: str, company_id: Optional[str], op: str = "updated"
+) -> None:
+    """Invoices are user-owned; their workspace is their company's (none without one)."""
+    if not company_id:
+        return
+    result = await db.execute(select(Company.workspace_id).where(Company.id == company_id))
+    workspace_id = result.scalar_one_or_none()
+    if workspace_id:
+        await emit(db, workspace_id, "invoice.changed", [invoice_id], op)
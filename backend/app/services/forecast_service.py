@@ -0,0 +1,258 @@
+"""Forecast service — vectorized demand forecasts and suggested reorder levels.
+
+Daily units sold come from ``stock_daily_rollups`` as one products × days
+matrix. Every statistic is computed column-wise over the whole catalog at once:
+
+* demand is the exponentially smoothed daily units sold (simple exponential
+  smoothing, i.e. an EWMA with ``adjust=False``) from the first sale onwards;
+* safety stock is ``z · σ_daily · √lead_time`` for the target service level;
+* the suggested reorder level is ``demand · lead_time + safety_stock``.
+
+Lead time per product is the average days from PO creation to first receipt
+over the last year, or :data:`DEFAULT_LEAD_TIME_DAYS` without history.
+Results are stored in ``demand_forecasts``; :func:`get_reorder_levels` is what
+low-stock checks use in place of the static ``Product.reorder_level``.
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import (
+    DemandForecast,
+    Product,
+    PurchaseOrder,
+    StockDailyRollup,
+    StockMovement,
+    dialect_insert,
+    generate_uuid,
+)
+from app.services.stock_service import UPSERT_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Days of sales history fed to the model
+HISTORY_DAYS = 90
+
+# Smoothing factor — higher reacts faster to recent days
+SMOOTHING_ALPHA = 0.2
+
+# z-score for a ~95% cycle service level
+SERVICE_LEVEL_Z = 1.65
+
+# Lead time assumed for products never received through a purchase order
+DEFAULT_LEAD_TIME_DAYS = 7.0
+LEAD_TIME_LOOKBACK = timedelta(days=365)
+
+
+# ---------------------------------------------------------------------------
+# Model (pure, vectorized)
+# ---------------------------------------------------------------------------
+
+
+def forecast_matrix(
+    sales: np.ndarray,
+    lead_times: np.ndarray,
+    alpha: float = SMOOTHING_ALPHA,
+    z: float = SERVICE_LEVEL_Z,
+) -> dict[str, np.ndarray]:
+    """Forecast every row of a products × days sales matrix in one pass.
+
+    Args:
+        sales: Units sold, shape (products, days), oldest day first.
+        lead_times: Lead time in days per product, shape (products,).
+
+    Returns:
+        Dict of per-product arrays: ``daily_demand``, ``demand_std``,
+        ``safety_stock`` and ``reorder_point``.
+    """
+    if sales.shape[1] == 0:
+        zeros = np.zeros(sales.shape[0])
+        return {"daily_demand": zeros, "demand_std": zeros, "safety_stock": zeros, "reorder_point": zeros}
+
+    # Days before a product's first sale are not history — mask them out so
+    # new products aren't smoothed towards zero or given an inflated σ
+    history = sales.astype(float)
+    history[np.cumsum(sales > 0, axis=1) == 0] = np.nan
+
+    # ewm runs down columns — transpose so each product is one column
+    frame = pd.DataFrame(history.T)
+    daily_demand = np.nan_to_num(frame.ewm(alpha=alpha, adjust=False).mean().to_numpy()[-1])
+    demand_std = np.nan_to_num(frame.std(ddof=1).to_numpy())
+    safety_stock = z * demand_std * np.sqrt(lead_times)
+    reorder_point = daily_demand * lead_times + safety_stock
+    return {
+        "daily_demand": daily_demand,
+        "demand_std": demand_std,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+
+async def _load_sales_matrix(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: list[str],
+    start: date,
+    end: date,
+) -> np.ndarray:
+    """Units sold per (product, day) in [start, end], summed across warehouses."""
+    result = await db.execute(
+        select(StockDailyRollup.product_id, StockDailyRollup.day, func.sum(StockDailyRollup.units_sold))
+        .where(
+            StockDailyRollup.workspace_id == workspace_id,
+            StockDailyRollup.day >= start,
+            StockDailyRollup.day <= end,
+        )
+        .group_by(StockDailyRollup.product_id, StockDailyRollup.day)
+    )
+    frame = pd.DataFrame(result.all(), columns=["product_id", "day", "units"])
+    days = pd.date_range(start, end, freq="D")
+    if frame.empty:
+        return np.zeros((len(product_ids), len(days)))
+
+    frame["day"] = pd.to_datetime(frame["day"])
+    frame["units"] = frame["units"].astype(float)
+    matrix = frame.pivot_table(index="product_id", columns="day", values="units", aggfunc="sum", fill_value=0.0)
+    return matrix.reindex(index=product_ids, columns=days, fill_value=0.0).to_numpy()
+
+
+async def _load_lead_times(db: AsyncSession, workspace_id: str, product_ids: list[str], now: datetime) -> np.ndarray:
+    """Average days from PO creation to first receipt per product."""
+    first_receipt = (
+        select(
+            StockMovement.product_id,
+            PurchaseOrder.created_at.label("ordered_at"),
+            func.min(StockMovement.created_at).label("received_at"),
+        )
+        .join(PurchaseOrder, PurchaseOrder.id == StockMovement.reference_id)
+        .where(
+            StockMovement.workspace_id == workspace_id,
+            StockMovement.type == "purchase",
+            StockMovement.created_at >= now - LEAD_TIME_LOOKBACK,
+        )
+        .group_by(StockMovement.product_id, PurchaseOrder.id, PurchaseOrder.created_at)
+    )
+    frame = pd.DataFrame((await db.execute(first_receipt)).all(), columns=["product_id", "ordered_at", "received_at"])
+    lead = pd.Series(DEFAULT_LEAD_TIME_DAYS, index=product_ids)
+    if not frame.empty:
+        elapsed = pd.to_datetime(frame["received_at"]) - pd.to_datetime(frame["ordered_at"])
+        frame["days"] = (elapsed.dt.total_seconds() / 86400).clip(lower=1.0)
+        observed = frame.groupby("product_id")["days"].mean()
+        lead.update(observed.reindex(lead.index).dropna())
+    return lead.to_numpy(dtype=float)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+
+async def run_forecast(db: AsyncSession, workspace_id: str, as_of: Optional[date] = None) -> int:
+    """Forecast every active tracked product in the workspace and store the results.
+
+    A fixed handful of queries however large the catalog. Nothing is committed
+    here. Returns the number of products forecast.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    end = as_of or now.date() - timedelta(days=1)  # last complete day
+    start = end - timedelta(days=HISTORY_DAYS - 1)
+
+    result = await db.execute(
+        select(Product.id).where(
+            Product.workspace_id == workspace_id,
+            Product.is_active == True,
+            Product.track_inventory == True,
+        )
+    )
+    product_ids = list(result.scalars().all())
+    if not product_ids:
+        return 0
+
+    sales = await _load_sales_matrix(db, workspace_id, product_ids, start, end)
+    lead_times = await _load_lead_times(db, workspace_id, product_ids, now)
+    stats = forecast_matrix(sales, lead_times)
+
+    # Days since the first sale in the window, so callers can ignore cold starts
+    has_sales = sales > 0
+    first_sale = np.where(has_sales.any(axis=1), has_sales.argmax(axis=1), sales.shape[1])
+    history_days = sales.shape[1] - first_sale
+
+    rows = [
+        {
+            "id": generate_uuid(),
+            "workspace_id": workspace_id,
+            "product_id": product_id,
+            "daily_demand": float(stats["daily_demand"][i]),
+            "demand_std": float(stats["demand_std"][i]),
+            "lead_time_days": float(lead_times[i]),
+            "safety_stock": float(stats["safety_stock"][i]),
+            "reorder_point": float(stats["reorder_point"][i]),
+            "history_days": int(history_days[i]),
+            "computed_at": now,
+        }
+        for i, product_id in enumerate(product_ids)
+    ]
+    upsert = dialect_insert(db)
+    for chunk_start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = upsert(DemandForecast).values(rows[chunk_start:chunk_start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["workspace_id", "product_id"],
+            set_={
+                column: stmt.excluded[column]
+                for column in (
+                    "daily_demand", "demand_std", "lead_time_days", "safety_stock",
+                    "reorder_point", "history_days", "computed_at",
+                )
+            },
+        )
+        await db.execute(stmt)
+
+    logger.info(f"Forecast {len(rows)} products for workspace {workspace_id}")
+    return len(rows)
+
+
+async def get_reorder_levels(
+    db: AsyncSession,
+    workspace_id: str,
+    static_levels: dict[str, float],
+) -> dict[str, float]:
+    """Effective reorder level per product: the forecast when it has seen demand.
+
+    ``static_levels`` maps product_id -> ``Product.reorder_level``; products
+    without a forecast, or whose forecast saw no sales, keep that value.
+    One query for the whole workspace.
+    """
+    result = await db.execute(
+        select(DemandForecast.product_id, DemandForecast.reorder_point).where(
+            DemandForecast.workspace_id == workspace_id,
+            DemandForecast.history_days > 0,
+        )
+    )
+    forecast = dict(result.all())
+    return {
+        product_id: float(forecast[product_id]) if product_id in forecast else float(level)
+        for product_id, level in static_levels.items()
+    }
+
+
+async def list_forecasts(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: Optional[Iterable[str]] = None,
+) -> list[DemandForecast]:
+    query = select(DemandForecast).where(DemandForecast.workspace_id == workspace_id)
+    if product_ids is not None:
+        query = query.where(DemandForecast.product_id.in_(list(product_ids)))
+    result = await db.execute(query.order_by(DemandForecast.reorder_point.desc()))
+    return list(result.scalars().all())
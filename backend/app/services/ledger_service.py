@@ -0,0 +1,238 @@
+"""Ledger service — browsing the stock movement ledger.
+
+Movements are read newest first with keyset pagination on ``(created_at, id)``:
+each page is an indexed range scan, however deep into a product's history the
+client has paged. Product and warehouse names come from the same joined query.
+"""
+
+import base64
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Select, and_, case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Product, StockMovement, Warehouse
+from app.models.schemas import StockMovementResponse
+from app.services.stock_service import _as_naive_utc
+
+BUCKETS = ("day", "week")
+
+
+# ---------------------------------------------------------------------------
+# Cursors
+# ---------------------------------------------------------------------------
+
+
+def keyset_created_at(db: AsyncSession):
+    """``created_at`` in the form keyset pages order and compare on.
+
+    SQLite keeps ``CURRENT_TIMESTAMP`` rows as ``YYYY-MM-DD HH:MM:SS`` but rows
+    written with a Python datetime as ``... HH:MM:SS.ffffff``, and compares them
+    as text. Both are normalized to one millisecond format there so equal
+    timestamps compare equal; ties are broken by ``id``.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", StockMovement.created_at)
+    return StockMovement.created_at
+
+
+def keyset_param(db: AsyncSession, value: str):
+    """Bind value for :func:`keyset_created_at` from a cursor's stored string."""
+    if db.get_bind().dialect.name == "sqlite":
+        return value
+    return datetime.fromisoformat(value)
+
+
+def keyset_bound(db: AsyncSession, value: datetime):
+    """Bind a datetime for comparison against :func:`keyset_created_at`."""
+    value = _as_naive_utc(value)
+    if db.get_bind().dialect.name == "sqlite":
+        return value.strftime("%Y-%m-%d %H:%M:%S.") + f"{value.microsecond // 1000:03d}"
+    return value
+
+
+def keyset_after(db: AsyncSession, value, movement_id: str, descending: bool = True):
+    """Rows strictly past ``(value, movement_id)`` in keyset order."""
+    column = keyset_created_at(db)
+    if descending:
+        return or_(column < value, and_(column == value, StockMovement.id < movement_id))
+    return or_(column > value, and_(column == value, StockMovement.id > movement_id))
+
+
+def encode_cursor(sort_key, movement_id: str) -> str:
+    """Opaque cursor pointing just past the row with this keyset value."""
+    key = sort_key.isoformat() if isinstance(sort_key, datetime) else str(sort_key)
+    raw = f"{key}|{movement_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Inverse of :func:`encode_cursor`. Raises ValueError on malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_key, movement_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        datetime.fromisoformat(sort_key)
+        return sort_key, movement_id
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+# ---------------------------------------------------------------------------
+# Movement queries
+# ---------------------------------------------------------------------------
+
+
+def filter_movements(
+    query: Select,
+    workspace_id: str,
+    *,
+    product_id: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+    movement_type: Optional[str] = None,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Select:
+    """Apply the common ledger filters. ``date_to`` is exclusive."""
+    query = query.where(StockMovement.workspace_id == workspace_id)
+    if product_id:
+        query = query.where(StockMovement.product_id == product_id)
+    if warehouse_id:
+        query = query.where(StockMovement.warehouse_id == warehouse_id)
+    if movement_type:
+        query = query.where(StockMovement.type == movement_type)
+    if reference_type:
+        query = query.where(StockMovement.reference_type == reference_type)
+    if reference_id:
+        query = query.where(StockMovement.reference_id == reference_id)
+    if date_from:
+        query = query.where(StockMovement.created_at >= _as_naive_utc(date_from))
+    if date_to:
+        query = query.where(StockMovement.created_at < _as_naive_utc(date_to))
+    return query
+
+
+def movements_with_names(db: AsyncSession) -> Select:
+    """Movements joined to their product and warehouse names, newest first."""
+    sort_key = keyset_created_at(db)
+    return (
+        select(
+            StockMovement,
+            Product.name.label("product_name"),
+            Warehouse.name.label("warehouse_name"),
+            sort_key.label("sort_key"),
+        )
+        .outerjoin(Product, Product.id == StockMovement.product_id)
+        .outerjoin(Warehouse, Warehouse.id == StockMovement.warehouse_id)
+        .order_by(sort_key.desc(), StockMovement.id.desc())
+    )
+
+
+def to_responses(rows) -> list[StockMovementResponse]:
+    """Build responses from ``movements_with_names()`` rows."""
+    items = []
+    for movement, product_name, warehouse_name, _ in rows:
+        item = StockMovementResponse.model_validate(movement)
+        item.product_name = product_name
+        item.warehouse_name = warehouse_name
+        items.append(item)
+    return items
+
+
+async def list_movements_page(
+    db: AsyncSession,
+    workspace_id: str,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    **filters,
+) -> tuple[list[StockMovementResponse], Optional[str]]:
+    """One keyset page of the ledger, newest first.
+
+    Returns:
+        Tuple of (movements, cursor for the next page — None on the last page).
+    """
+    query = filter_movements(movements_with_names(db), workspace_id, **filters)
+    if cursor:
+        sort_key, movement_id = decode_cursor(cursor)
+        query = query.where(keyset_after(db, keyset_param(db, sort_key), movement_id))
+
+    # Fetch one extra row to learn whether another page exists
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    items = to_responses(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.sort_key, last[0].id)
+    return items, next_cursor
+
+
+# ---------------------------------------------------------------------------
+# Time buckets
+# ---------------------------------------------------------------------------
+
+
+def _bucket_expr(db: AsyncSession, bucket: str):
+    """SQL expression truncating ``created_at`` to the start of its day or ISO week."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(bucket, StockMovement.created_at)
+    if bucket == "week":
+        # SQLite: step forward to Sunday, then back to that week's Monday
+        return func.date(StockMovement.created_at, "weekday 0", "-6 days")
+    return func.date(StockMovement.created_at)
+
+
+async def bucket_movements(
+    db: AsyncSession,
+    workspace_id: str,
+    bucket: str = "day",
+    *,
+    limit: int = 500,
+    **filters,
+) -> list[dict]:
+    """Aggregate movements per product into daily or weekly buckets, newest first.
+
+    Returns:
+        One dict per (product, bucket) with ``bucket_start``, ``movement_count``,
+        ``quantity_in``, ``quantity_out`` and ``net_change``.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+
+    bucket_start = _bucket_expr(db, bucket).label("bucket_start")
+    query = (
+        select(
+            StockMovement.product_id,
+            Product.name.label("product_name"),
+            bucket_start,
+            func.count(StockMovement.id).label("movement_count"),
+            func.sum(case((StockMovement.quantity_delta > 0, StockMovement.quantity_delta), else_=0)).label("quantity_in"),
+            func.sum(case((StockMovement.quantity_delta < 0, -StockMovement.quantity_delta), else_=0)).label("quantity_out"),
+            func.sum(StockMovement.quantity_delta).label("net_change"),
+        )
+        .outerjoin(Product, Product.id == StockMovement.product_id)
+        .group_by(StockMovement.product_id, Product.name, bucket_start)
+        .order_by(bucket_start.desc(), StockMovement.product_id)
+        .limit(limit)
+    )
+    query = filter_movements(query, workspace_id, **filters)
+
+    buckets = []
+    for row in (await db.execute(query)).all():
+        start = row.bucket_start
+        if isinstance(start, datetime):
+            start = start.date()
+        elif isinstance(start, str):
+            start = date.fromisoformat(start)
+        buckets.append({
+            "product_id": row.product_id,
+            "product_name": row.product_name,
+            "bucket_start": start,
+            "movement_count": row.movement_count,
+            "quantity_in": float(row.quantity_in or 0),
+            "quantity_out": float(row.quantity_out or 0),
+            "net_change": float(row.net_change or 0),
+        })
+    return buckets
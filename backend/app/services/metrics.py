@@ -0,0 +1,85 @@
+"""In-process metrics — counters and gauges rendered for Prometheus at ``/metrics``.
+
+Values live in the process that records them: each uvicorn or Celery worker
+keeps its own, and a scraper sums across instances. Gauges that describe live
+state (e.g. open connections) can be registered as callbacks and are read at
+scrape time.
+"""
+
+import threading
+from typing import Callable
+
+_lock = threading.Lock()
+
+# name -> (type, help)
+_descriptions: dict[str, tuple[str, str]] = {}
+# (name, sorted label items) -> value
+_values: dict[tuple[str, tuple], float] = {}
+# name -> callback returning {label tuple: value}
+_callbacks: dict[str, Callable[[], dict[tuple, float]]] = {}
+
+
+def describe(name: str, metric_type: str, help_text: str) -> None:
+    """Declare a metric's type (``counter`` or ``gauge``) and help line."""
+    _descriptions[name] = (metric_type, help_text)
+
+
+def inc(name: str, value: float = 1.0, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _values[key] = _values.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    with _lock:
+        _values[(name, tuple(sorted(labels.items())))] = value
+
+
+def max_gauge(name: str, value: float, **labels: str) -> None:
+    """Raise a gauge to ``value`` if it is higher (high-water marks)."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _values[key] = max(_values.get(key, value), value)
+
+
+def register_callback(name: str, callback: Callable[[], dict[tuple, float]]) -> None:
+    """Read a gauge at scrape time. ``callback`` returns {((label, value), ...): value}."""
+    _callbacks[name] = callback
+
+
+def snapshot() -> dict[tuple[str, tuple], float]:
+    """Every current value, keyed by (name, label items)."""
+    with _lock:
+        values = dict(_values)
+    for name, callback in list(_callbacks.items()):
+        for labels, value in callback().items():
+            values[(name, tuple(sorted(labels)))] = value
+    return values
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    by_name: dict[str, list[tuple[tuple, float]]] = {}
+    for (name, labels), value in snapshot().items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        metric_type, help_text = _descriptions.get(name, ("untyped", ""))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(by_name[name]):
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{name}{{{label_str}}} {value:g}" if label_str else f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """Clear recorded values (tests). Descriptions and callbacks are kept."""
+    with _lock:
+        _values.clear()
@@ -0,0 +1,202 @@
+"""Real-time push — deliver events and counters to users' open WebSockets.
+
+Writers call :func:`notify` with the session that holds the change. Messages
+wait on the session and are published only once it commits (and dropped on
+rollback), so a client never hears about a row it can't read yet.
+
+Publishing goes through a broadcast backend, chosen by ``REALTIME_BACKEND``:
+
+* ``redis`` — every process (uvicorn workers, Celery workers, CLI runs)
+  publishes to :data:`REALTIME_CHANNEL`; every API process subscribes once
+  (:meth:`listen`, started in the app lifespan) and hands each message to
+  its own sockets. Delivery works however many processes there are.
+* ``memory`` — in-process fan-out, for tests and single-process development.
+
+Publishing never waits on delivery. Inside an event loop it runs as a
+background task (:func:`drain` waits for those, e.g. before a Celery task's
+loop closes); without one it publishes synchronously.
+
+Messages are ``{"type": ..., "data": ...}`` frames, e.g. ``alerts.created``,
+``alerts.counts``, ``signals.changed``, ``signals.summary``.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.database import Membership, Workspace
+
+logger = logging.getLogger(__name__)
+
+REALTIME_CHANNEL = "lytherahub:realtime"
+
+Sink = Callable[[str, dict], Awaitable[object]]
+
+
+class MemoryBroadcast:
+    """Fan-out within this process."""
+
+    def __init__(self):
+        self._sinks: list[Sink] = []
+
+    def subscribe(self, sink: Sink) -> None:
+        self._sinks.append(sink)
+
+    def unsubscribe(self, sink: Sink) -> None:
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    async def publish(self, messages: list[tuple[str, dict]]) -> None:
+        for sink in list(self._sinks):
+            for user_id, message in messages:
+                await sink(user_id, message)
+
+    def publish_sync(self, messages: list[tuple[str, dict]]) -> None:
+        # Sinks are coroutines; with no loop running there is no one to deliver to
+        logger.debug(f"No event loop — dropped {len(messages)} in-memory real-time messages")
+
+    async def listen(self, sink: Sink) -> None:
+        """Deliver to ``sink`` until cancelled."""
+        self.subscribe(sink)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.unsubscribe(sink)
+
+
+class RedisBroadcast:
+    """Fan-out across processes over Redis pub/sub."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._sync_client = None
+        self._async_client = None
+        self._async_loop = None
+
+    @staticmethod
+    def _encode(user_id: str, message: dict) -> str:
+        return json.dumps({"user_id": user_id, "message": message}, default=str)
+
+    def _client_for_loop(self):
+        # Connections belong to the loop that opened them; Celery runs a new loop per task
+        import redis.asyncio as aioredis
+
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = aioredis.Redis.from_url(self.url, socket_connect_timeout=2)
+            self._async_loop = loop
+        return self._async_client
+
+    async def publish(self, messages: list[tuple[str, dict]]) -> None:
+        from redis.exceptions import RedisError
+
+        try:
+            pipe = self._client_for_loop().pipeline(transaction=False)
+            for user_id, message in messages:
+                pipe.publish(REALTIME_CHANNEL, self._encode(user_id, message))
+            await pipe.execute()
+        except RedisError as exc:
+            logger.warning(f"Could not publish {len(messages)} real-time messages: {exc}")
+
+    def publish_sync(self, messages: list[tuple[str, dict]]) -> None:
+        import redis
+
+        try:
+            if self._sync_client is None:
+                self._sync_client = redis.Redis.from_url(self.url, socket_connect_timeout=2)
+            pipe = self._sync_client.pipeline(transaction=False)
+            for user_id, message in messages:
+                pipe.publish(REALTIME_CHANNEL, self._encode(user_id, message))
+            pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning(f"Could not publish {len(messages)} real-time messages: {exc}")
+
+    async def listen(self, sink: Sink) -> None:
+        """Subscribe once and deliver every message to ``sink``. Reconnects until cancelled."""
+        import redis.asyncio as aioredis
+        from redis.exceptions import RedisError
+
+        delay = 1
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(REALTIME_CHANNEL)
+                    delay = 1
+                    async for item in pubsub.listen():
+                        if item["type"] != "message":
+                            continue
+                        payload = json.loads(item["data"])
+                        await sink(payload["user_id"], payload["message"])
+            except RedisError as exc:
+                logger.warning(f"Real-time subscription lost ({exc}); retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                await client.aclose()
+
+
+def _make_backend():
+    if settings.REALTIME_BACKEND == "memory":
+        return MemoryBroadcast()
+    return RedisBroadcast(settings.REDIS_URL)
+
+
+backend = _make_backend()
+
+_PENDING = "realtime_pending"
+_publishing: set[asyncio.Task] = set()
+
+
+def notify(db: AsyncSession, user_ids, message: dict) -> None:
+    """Queue ``message`` for ``user_ids`` (one id or several) until ``db`` commits."""
+    if isinstance(user_ids, str):
+        user_ids = [user_ids]
+    pending = db.sync_session.info.setdefault(_PENDING, [])
+    pending.extend((user_id, message) for user_id in user_ids)
+
+
+async def workspace_user_ids(db: AsyncSession, workspace_id: str) -> list[str]:
+    """The owner and members of a workspace — everyone who hears about its changes."""
+    result = await db.execute(
+        select(Workspace.owner_id)
+        .where(Workspace.id == workspace_id)
+        .union(select(Membership.user_id).where(Membership.workspace_id == workspace_id))
+    )
+    return list(result.scalars().all())
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        publish(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING, None)
+
+
+def publish(messages: list[tuple[str, dict]]) -> None:
+    """Hand (user_id, message) pairs to the backend without waiting on delivery."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        backend.publish_sync(messages)
+        return
+    task = loop.create_task(backend.publish(messages))
+    _publishing.add(task)
+    task.add_done_callback(_publishing.discard)
+
+
+async def drain() -> None:
+    """Wait for in-flight publishes (call before an event loop shuts down)."""
+    while _publishing:
+        await asyncio.gather(*list(_publishing), return_exceptions=True)
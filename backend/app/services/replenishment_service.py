@@ -0,0 +1,217 @@
+"""Replenishment service — net requirements and draft purchase orders in bulk.
+
+The plan is computed for the whole catalog from a fixed handful of grouped
+queries, independent of catalog size:
+
+    net position = on hand − reserved + open PO quantity
+
+where open PO quantity is ``quantity_ordered − quantity_received`` on orders
+that are not yet received or closed (drafts included, so re-running the
+planner does not order the same shortfall twice). A product whose net
+position is below its reorder level (forecast or static, see
+:func:`forecast_service.get_reorder_levels`) has a shortfall.
+
+Each product's preferred supplier is the supplier-type company on its most
+recent purchase order; shortfalls are grouped by that supplier and
+:func:`create_draft_orders` writes one draft PO per supplier with two
+executemany inserts. Products never bought from a supplier are reported as
+unassigned.
+"""
+
+import logging
+import math
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import (
+    Company,
+    Product,
+    PurchaseOrder,
+    PurchaseOrderItem,
+    generate_uuid,
+)
+from app.services import domain_events, forecast_service, stock_service
+
+logger = logging.getLogger(__name__)
+
+# Purchase order statuses whose unreceived quantity is still on its way.
+OPEN_PO_STATUSES = ("draft", "sent", "partially_received")
+
+SUPPLIER_TYPES = ("supplier", "both")
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+
+async def get_open_po_totals(db: AsyncSession, workspace_id: str) -> dict[str, float]:
+    """Map product_id -> quantity ordered but not yet received, in one grouped query."""
+    result = await db.execute(
+        select(
+            PurchaseOrderItem.product_id,
+            func.sum(PurchaseOrderItem.quantity_ordered - PurchaseOrderItem.quantity_received),
+        )
+        .join(PurchaseOrder, PurchaseOrderItem.order_id == PurchaseOrder.id)
+        .where(
+            PurchaseOrder.workspace_id == workspace_id,
+            PurchaseOrder.status.in_(OPEN_PO_STATUSES),
+        )
+        .group_by(PurchaseOrderItem.product_id)
+    )
+    return {product_id: max(0.0, float(total or 0)) for product_id, total in result.all()}
+
+
+async def get_preferred_suppliers(db: AsyncSession, workspace_id: str) -> dict[str, tuple[str, float]]:
+    """Map product_id -> (supplier_id, last unit cost) from its latest supplier PO.
+
+    One query: a window function picks the newest line per product.
+    """
+    ranked = (
+        select(
+            PurchaseOrderItem.product_id,
+            PurchaseOrder.supplier_id,
+            PurchaseOrderItem.unit_cost,
+            func.row_number()
+            .over(
+                partition_by=PurchaseOrderItem.product_id,
+                order_by=(PurchaseOrder.created_at.desc(), PurchaseOrder.id.desc()),
+            )
+            .label("rank"),
+        )
+        .join(PurchaseOrder, PurchaseOrderItem.order_id == PurchaseOrder.id)
+        .join(Company, Company.id == PurchaseOrder.supplier_id)
+        .where(
+            PurchaseOrder.workspace_id == workspace_id,
+            Company.workspace_id == workspace_id,
+            Company.company_type.in_(SUPPLIER_TYPES),
+        )
+        .subquery()
+    )
+    result = await db.execute(
+        select(ranked.c.product_id, ranked.c.supplier_id, ranked.c.unit_cost).where(ranked.c.rank == 1)
+    )
+    return {product_id: (supplier_id, float(unit_cost)) for product_id, supplier_id, unit_cost in result.all()}
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+
+async def plan_replenishment(db: AsyncSession, workspace_id: str) -> dict:
+    """Compute the shortfall of every active tracked product and group it by supplier.
+
+    Read-only. Returns ``{"suppliers": [...], "unassigned": [...]}`` where each
+    supplier entry is ``{"supplier_id", "lines": [...]}`` and each line carries
+    product_id, on_hand, reserved, on_order, net_position, reorder_level,
+    quantity (whole units to order) and unit_cost.
+    """
+    result = await db.execute(
+        select(Product.id, Product.reorder_level, Product.cost_price).where(
+            Product.workspace_id == workspace_id,
+            Product.is_active == True,
+            Product.track_inventory == True,
+        )
+    )
+    products = result.all()
+    if not products:
+        return {"suppliers": [], "unassigned": []}
+
+    totals = await stock_service.get_stock_totals(db, workspace_id)
+    on_order = await get_open_po_totals(db, workspace_id)
+    levels = await forecast_service.get_reorder_levels(
+        db, workspace_id, {product_id: level for product_id, level, _ in products}
+    )
+    suppliers = await get_preferred_suppliers(db, workspace_id)
+
+    by_supplier: dict[str, list[dict]] = defaultdict(list)
+    unassigned: list[dict] = []
+    for product_id, _, cost_price in products:
+        stock = totals.get(product_id)
+        on_hand = stock["on_hand"] if stock else 0.0
+        reserved = stock["reserved"] if stock else 0.0
+        incoming = on_order.get(product_id, 0.0)
+        net = on_hand - reserved + incoming
+        level = levels[product_id]
+        if level <= 0 or net >= level:
+            continue
+
+        supplier_id, last_cost = suppliers.get(product_id, (None, None))
+        line = {
+            "product_id": product_id,
+            "on_hand": on_hand,
+            "reserved": reserved,
+            "on_order": incoming,
+            "net_position": net,
+            "reorder_level": level,
+            "quantity": float(math.ceil(level - net)),
+            "unit_cost": last_cost if last_cost is not None else float(cost_price or 0.0),
+        }
+        if supplier_id is None:
+            unassigned.append(line)
+        else:
+            by_supplier[supplier_id].append(line)
+
+    return {
+        "suppliers": [{"supplier_id": s, "lines": lines} for s, lines in by_supplier.items()],
+        "unassigned": unassigned,
+    }
+
+
+async def create_draft_orders(
+    db: AsyncSession,
+    workspace_id: str,
+    plan: dict,
+    currency: str = "EUR",
+    notes: Optional[str] = None,
+) -> list[str]:
+    """Write one draft purchase order per supplier in ``plan`` in two bulk inserts.
+
+    Raises one ``purchase_order.changed`` event for all of them. Nothing is
+    committed here. Returns the new order ids.
+    """
+    groups = [group for group in plan["suppliers"] if group["lines"]]
+    if not groups:
+        return []
+
+    result = await db.execute(
+        select(func.count()).select_from(PurchaseOrder).where(PurchaseOrder.workspace_id == workspace_id)
+    )
+    next_number = (result.scalar() or 0) + 1
+
+    orders, items = [], []
+    for offset, group in enumerate(groups):
+        order_id = generate_uuid()
+        total = 0.0
+        for line in group["lines"]:
+            items.append({
+                "id": generate_uuid(),
+                "order_id": order_id,
+                "product_id": line["product_id"],
+                "quantity_ordered": line["quantity"],
+                "quantity_received": 0.0,
+                "unit_cost": line["unit_cost"],
+            })
+            total += line["quantity"] * line["unit_cost"]
+        orders.append({
+            "id": order_id,
+            "workspace_id": workspace_id,
+            "order_number": f"PO-{next_number + offset:04d}",
+            "supplier_id": group["supplier_id"],
+            "status": "draft",
+            "total_amount": round(total, 2),
+            "currency": currency,
+            "notes": notes,
+        })
+
+    await db.execute(insert(PurchaseOrder), orders)
+    await db.execute(insert(PurchaseOrderItem), items)
+    order_ids = [order["id"] for order in orders]
+    await domain_events.emit(db, workspace_id, "purchase_order.changed", order_ids, "created")
+
+    logger.info(f"Drafted {len(orders)} purchase orders ({len(items)} lines) for workspace {workspace_id}")
+    return order_ids
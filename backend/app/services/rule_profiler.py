@@ -0,0 +1,119 @@
+"""Rule profiler — registry and per-run cost of signal rules and alert scanners.
+
+Decorate a rule with :func:`rule` to register it and profile every call:
+
+* wall time;
+* SQL statements executed while it runs (counted from the engine's cursor
+  events, attributed through a context variable so concurrent rules and
+  requests don't mix);
+* rows examined — what the rule fetched from the database, reported by the
+  rule itself through :func:`examined`.
+
+Totals go to :mod:`metrics` (``lytherahub_rule_*`` on ``/metrics``). Runs
+inside an HTTP request are also collected for the ``Server-Timing`` debug
+header (see ``main.RuleTimingMiddleware``). Runs slower than
+:data:`SLOW_RULE_MS` are logged, which covers Celery workers that have no
+scrape endpoint.
+"""
+
+import functools
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_RULE_MS = 1000.0
+
+# rule name -> kind ("signal" / "alert")
+REGISTRY: dict[str, str] = {}
+
+metrics.describe("lytherahub_rule_runs_total", "counter", "Rule executions")
+metrics.describe("lytherahub_rule_seconds_total", "counter", "Wall time spent in the rule")
+metrics.describe("lytherahub_rule_queries_total", "counter", "SQL statements issued by the rule")
+metrics.describe("lytherahub_rule_rows_total", "counter", "Rows the rule fetched from the database")
+metrics.describe("lytherahub_rule_max_seconds", "gauge", "Slowest single run of the rule")
+
+
+@dataclass
+class RuleRun:
+    name: str
+    queries: int = 0
+    rows: int = 0
+    ms: float = 0.0
+
+
+_current_run: ContextVar[Optional[RuleRun]] = ContextVar("current_rule_run", default=None)
+_request_runs: ContextVar[Optional[list[RuleRun]]] = ContextVar("request_rule_runs", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    run = _current_run.get()
+    if run is not None:
+        run.queries += 1
+
+
+def examined(rows: int) -> None:
+    """Report rows fetched by the running rule (no-op outside a rule)."""
+    run = _current_run.get()
+    if run is not None:
+        run.rows += rows
+
+
+def rule(name: str, kind: str):
+    """Register an async rule function under ``name`` and profile each call."""
+    def decorator(fn):
+        REGISTRY[name] = kind
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            run = RuleRun(name)
+            token = _current_run.set(run)
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                run.ms = (time.perf_counter() - started) * 1000
+                _current_run.reset(token)
+                _record(run, kind)
+
+        return wrapper
+
+    return decorator
+
+
+def _record(run: RuleRun, kind: str) -> None:
+    labels = {"rule": run.name, "kind": kind}
+    metrics.inc("lytherahub_rule_runs_total", **labels)
+    metrics.inc("lytherahub_rule_seconds_total", run.ms / 1000, **labels)
+    metrics.inc("lytherahub_rule_queries_total", run.queries, **labels)
+    metrics.inc("lytherahub_rule_rows_total", run.rows, **labels)
+    metrics.max_gauge("lytherahub_rule_max_seconds", run.ms / 1000, **labels)
+
+    runs = _request_runs.get()
+    if runs is not None:
+        runs.append(run)
+    if run.ms >= SLOW_RULE_MS:
+        logger.warning(f"Slow rule {run.name}: {run.ms:.0f} ms, {run.queries} queries, {run.rows} rows")
+
+
+def start_request() -> list[RuleRun]:
+    """Collect the rule runs of the current request into the returned list."""
+    runs: list[RuleRun] = []
+    _request_runs.set(runs)
+    return runs
+
+
+def server_timing(runs: list[RuleRun]) -> str:
+    """Format runs as a ``Server-Timing`` header value."""
+    return ", ".join(
+        f'{run.name};dur={run.ms:.1f};desc="queries={run.queries} rows={run.rows}"' for run in runs
+    )
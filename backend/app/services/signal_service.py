@@ -0,0 +1,492 @@
+"""Signal service — the business rules engine behind ``/api/signals``.
+
+:func:`generate_signals` evaluates every rule for a workspace. Each rule in
+:data:`RULES` is a single join/aggregate query.
+:func:`sync_signals` stores the result as a diff. Each signal has a stable
+identity of (workspace, signal_type, entity_type, entity_id), so a refresh
+only does three things:
+
+* inserts signals that are new;
+* updates the ones whose severity, title or body changed, in one bulk UPDATE;
+* deletes resolved ones in one statement.
+
+Read and dismissed state survive refreshes. A dismissed signal stays
+dismissed while its condition holds. Once the condition clears, the row is
+removed, and a recurrence is a new signal.
+
+Write paths raise domain events (see ``domain_events``) which mark the
+affected (rule, entity) pairs dirty. The ``signal_tasks`` worker then calls
+:func:`sync_dirty` to re-run only those, so ``GET /api/signals`` serves
+stored rows.
+
+Whenever a diff changes anything, the workspace's users are sent a
+``signals.changed`` frame with the delta and a ``signals.summary`` frame
+with fresh counts once the session commits (see ``realtime``).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Collection, Iterable, Optional
+
+from sqlalchemy import and_, case, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import (
+    Company,
+    Deal,
+    DemandForecast,
+    Invoice,
+    Product,
+    PurchaseOrder,
+    Signal,
+    SignalDirtyMark,
+    StockBalance,
+    dialect_insert,
+    generate_uuid,
+)
+from app.models.schemas import SignalResponse
+from app.services import realtime, rule_profiler, stock_service
+
+logger = logging.getLogger(__name__)
+
+# Columns a rule re-renders on every run; a difference in any of them is a change
+CONTENT_FIELDS = ("severity", "title", "body")
+
+
+def signal_key(signal) -> tuple[str, str, str]:
+    """Identity of a signal within its workspace."""
+    return (signal.signal_type, signal.entity_type, signal.entity_id)
+
+
+# ---------------------------------------------------------------------------
+# Rules
+# ---------------------------------------------------------------------------
+
+
+def _plural(n: int) -> str:
+    return "s" if n != 1 else ""
+
+
+def _only(column, entity_ids: Optional[Collection[str]]) -> list:
+    """Extra WHERE clause restricting a rule to some entities (none = all)."""
+    return [] if entity_ids is None else [column.in_(list(entity_ids))]
+
+
+@rule_profiler.rule("signal.overdue_invoice", "signal")
+async def _overdue_invoices(
+    db: AsyncSession, workspace_id: str, now: datetime, entity_ids: Optional[Collection[str]] = None
+) -> list[Signal]:
+    result = await db.execute(
+        select(Invoice.id, Invoice.invoice_number, Invoice.amount, Invoice.currency, Invoice.due_date)
+        .join(Company, Invoice.company_id == Company.id)
+        .where(
+            Company.workspace_id == workspace_id,
+            Invoice.due_date < now,
+            Invoice.status.in_(["draft", "sent"]),
+            *_only(Invoice.id, entity_ids),
+        )
+    )
+    rows = result.all()
+    rule_profiler.examined(len(rows))
+    signals = []
+    for inv_id, number, amount, currency, due_date in rows:
+        days_overdue = (now - due_date).days
+        signals.append(Signal(
+            id=generate_uuid(),
+            workspace_id=workspace_id,
+            signal_type="overdue_invoice",
+            severity="critical" if days_overdue > 14 else "warning",
+            entity_type="invoice",
+            entity_id=inv_id,
+            title=f"Invoice {number} overdue by {days_overdue} day{_plural(days_overdue)}",
+            body=f"Amount: {amount} {currency}. Due: {due_date.strftime('%d %b %Y')}",
+        ))
+    return signals
+
+
+@rule_profiler.rule("signal.low_stock", "signal")
+async def _low_stock(
+    db: AsyncSession, workspace_id: str, now: datetime, entity_ids: Optional[Collection[str]] = None
+) -> list[Signal]:
+    """On hand (summed balances) at or below the forecast reorder point, else the static level."""
+    stock = (
+        select(StockBalance.product_id, func.sum(StockBalance.on_hand).label("on_hand"))
+        .where(StockBalance.workspace_id == workspace_id)
+        .group_by(StockBalance.product_id)
+        .subquery()
+    )
+    forecast = (
+        select(DemandForecast.product_id, DemandForecast.reorder_point)
+        .where(DemandForecast.workspace_id == workspace_id, DemandForecast.history_days > 0)
+        .subquery()
+    )
+    on_hand = func.coalesce(stock.c.on_hand, 0.0)
+    level = func.coalesce(forecast.c.reorder_point, Product.reorder_level)
+    result = await db.execute(
+        select(Product.id, Product.name, Product.unit, on_hand, level)
+        .outerjoin(stock, stock.c.product_id == Product.id)
+        .outerjoin(forecast, forecast.c.product_id == Product.id)
+        .where(
+            Product.workspace_id == workspace_id,
+            Product.track_inventory == True,
+            Product.is_active == True,
+            level > 0,
+            on_hand <= level,
+            *_only(Product.id, entity_ids),
+        )
+    )
+    rows = result.all()
+    rule_profiler.examined(len(rows))
+    signals = []
+    for product_id, name, unit, qty, reorder_level in rows:
+        qty = float(qty)
+        signals.append(Signal(
+            id=generate_uuid(),
+            workspace_id=workspace_id,
+            signal_type="low_stock",
+            severity="critical" if qty <= 0 else "warning",
+            entity_type="product",
+            entity_id=product_id,
+            title=f"Low stock: {name}",
+            body=f"On hand: {qty} {unit}. Reorder level: {float(reorder_level):g}.",
+        ))
+    return signals
+
+
+@rule_profiler.rule("signal.stale_deal", "signal")
+async def _stale_deals(
+    db: AsyncSession, workspace_id: str, now: datetime, entity_ids: Optional[Collection[str]] = None
+) -> list[Signal]:
+    """Open deals with no update in 14+ days."""
+    result = await db.execute(
+        select(Deal.id, Deal.title, Deal.stage, Deal.updated_at).where(
+            Deal.workspace_id == workspace_id,
+            Deal.stage.notin_(["won", "lost"]),
+            Deal.updated_at < now - timedelta(days=14),
+            *_only(Deal.id, entity_ids),
+        )
+    )
+    rows = result.all()
+    rule_profiler.examined(len(rows))
+    signals = []
+    for deal_id, title, stage, updated_at in rows:
+        days_stale = (now - updated_at).days
+        signals.append(Signal(
+            id=generate_uuid(),
+            workspace_id=workspace_id,
+            signal_type="stale_deal",
+            severity="warning",
+            entity_type="deal",
+            entity_id=deal_id,
+            title=f"Deal stale: {title}",
+            body=f"No activity in {days_stale} days. Stage: {stage}.",
+        ))
+    return signals
+
+
+@rule_profiler.rule("signal.late_delivery", "signal")
+async def _late_deliveries(
+    db: AsyncSession, workspace_id: str, now: datetime, entity_ids: Optional[Collection[str]] = None
+) -> list[Signal]:
+    result = await db.execute(
+        select(PurchaseOrder.id, PurchaseOrder.order_number, PurchaseOrder.status, PurchaseOrder.expected_date)
+        .where(
+            PurchaseOrder.workspace_id == workspace_id,
+            PurchaseOrder.expected_date < now,
+            PurchaseOrder.status.notin_(["received", "closed"]),
+            *_only(PurchaseOrder.id, entity_ids),
+        )
+    )
+    rows = result.all()
+    rule_profiler.examined(len(rows))
+    signals = []
+    for po_id, order_number, po_status, expected_date in rows:
+        days_late = (now - expected_date).days
+        signals.append(Signal(
+            id=generate_uuid(),
+            workspace_id=workspace_id,
+            signal_type="late_delivery",
+            severity="warning",
+            entity_type="purchase_order",
+            entity_id=po_id,
+            title=f"Late delivery: {order_number}",
+            body=(
+                f"Expected {expected_date.strftime('%d %b %Y')} "
+                f"({days_late} day{_plural(days_late)} overdue). Status: {po_status}."
+            ),
+        ))
+    return signals
+
+
+@rule_profiler.rule("signal.stale_company", "signal")
+async def _stale_companies(
+    db: AsyncSession, workspace_id: str, now: datetime, entity_ids: Optional[Collection[str]] = None
+) -> list[Signal]:
+    """Companies still in the lead stage after 30+ days."""
+    result = await db.execute(
+        select(Company.id, Company.company_name, Company.updated_at).where(
+            Company.workspace_id == workspace_id,
+            Company.pipeline_stage == "lead",
+            Company.updated_at < now - timedelta(days=30),
+            *_only(Company.id, entity_ids),
+        )
+    )
+    rows = result.all()
+    rule_profiler.examined(len(rows))
+    signals = []
+    for company_id, company_name, updated_at in rows:
+        days_stale = (now - updated_at).days
+        signals.append(Signal(
+            id=generate_uuid(),
+            workspace_id=workspace_id,
+            signal_type="stale_company",
+            severity="info",
+            entity_type="company",
+            entity_id=company_id,
+            title=f"No follow-up: {company_name}",
+            body=f"Still in lead stage after {days_stale} days. Consider reaching out.",
+        ))
+    return signals
+
+
+# signal_type -> rule. Each rule is one query over the workspace, or over just
+# ``entity_ids`` when given.
+RULES: dict[str, Callable[..., Awaitable[list[Signal]]]] = {
+    "overdue_invoice": _overdue_invoices,
+    "low_stock": _low_stock,
+    "stale_deal": _stale_deals,
+    "late_delivery": _late_deliveries,
+    "stale_company": _stale_companies,
+}
+
+
+async def generate_signals(db: AsyncSession, workspace_id: str) -> list[Signal]:
+    """Evaluate every rule and return the signals that currently hold (unsaved).
+
+    Rules run one after another in ``db``, so they see its uncommitted writes.
+    """
+    now = datetime.utcnow()
+    return [signal for rule in RULES.values() for signal in await rule(db, workspace_id, now)]
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+
+async def _apply_diff(db: AsyncSession, workspace_id: str, fresh: dict, stored: dict) -> dict:
+    """Write the difference between rule output and stored signals, both keyed by identity."""
+    added_ids = []
+    new_rows = []
+    for key, signal in fresh.items():
+        if key not in stored:
+            added_ids.append(signal.id)
+            new_rows.append({
+                "id": signal.id,
+                "workspace_id": workspace_id,
+                "signal_type": signal.signal_type,
+                "severity": signal.severity,
+                "entity_type": signal.entity_type,
+                "entity_id": signal.entity_id,
+                "title": signal.title,
+                "body": signal.body,
+                "is_read": False,
+                "is_dismissed": False,
+            })
+
+    changed_ids = []
+    updates = []
+    for key, current in stored.items():
+        signal = fresh.get(key)
+        if signal is None:
+            continue
+        values = {field: getattr(signal, field) for field in CONTENT_FIELDS}
+        if all(getattr(current, field) == value for field, value in values.items()):
+            continue
+        # Escalation or de-escalation needs a fresh look
+        if values["severity"] != current.severity:
+            values["is_read"] = False
+        updates.append({"id": current.id, **values})
+        if not current.is_dismissed:
+            changed_ids.append(current.id)
+
+    removed_ids = [current.id for key, current in stored.items() if key not in fresh]
+
+    if new_rows:
+        # A concurrent sync (say, the refresh endpoint) may have stored the same
+        # signal first; its row wins and this one is left out of the delta
+        upsert, chunk = dialect_insert(db), stock_service.UPSERT_CHUNK_SIZE
+        for start in range(0, len(new_rows), chunk):
+            stmt = upsert(Signal).values(new_rows[start:start + chunk])
+            await db.execute(stmt.on_conflict_do_nothing(
+                index_elements=["workspace_id", "signal_type", "entity_type", "entity_id"]
+            ))
+    if updates:
+        await db.execute(update(Signal), updates)
+    if removed_ids:
+        await db.execute(delete(Signal).where(Signal.id.in_(removed_ids)))
+
+    touched = added_ids + changed_ids
+    signals = {}
+    if touched:
+        result = await db.execute(
+            select(Signal)
+            .where(Signal.id.in_(touched))
+            .order_by(Signal.created_at.desc())
+            .execution_options(populate_existing=True)
+        )
+        signals = {s.id: s for s in result.scalars().all()}
+
+    logger.info(
+        f"Signals for workspace {workspace_id}: "
+        f"{len(added_ids)} added, {len(updates)} changed, {len(removed_ids)} removed"
+    )
+    delta = {
+        "added": [signals[i] for i in added_ids if i in signals],
+        "changed": [signals[i] for i in changed_ids if i in signals],
+        "removed": removed_ids,
+    }
+    await _push_delta(db, workspace_id, delta)
+    return delta
+
+
+async def sync_signals(db: AsyncSession, workspace_id: str) -> dict:
+    """Re-run the rules and apply the difference to the stored signals.
+
+    Nothing is committed here. Returns ``{"added": [Signal], "changed":
+    [Signal], "removed": [id]}``. Dismissed signals are kept up to date but
+    never reported as added or changed.
+    """
+    fresh = {signal_key(s): s for s in await generate_signals(db, workspace_id)}
+    result = await db.execute(select(Signal).where(Signal.workspace_id == workspace_id))
+    stored = {signal_key(s): s for s in result.scalars().all()}
+    return await _apply_diff(db, workspace_id, fresh, stored)
+
+
+async def get_summary(db: AsyncSession, workspace_id: str) -> dict:
+    """Counts of live (non-dismissed) signals by severity, plus unread — one aggregate row."""
+    result = await db.execute(
+        select(
+            func.count(),
+            func.sum(case((Signal.severity == "critical", 1), else_=0)),
+            func.sum(case((Signal.severity == "warning", 1), else_=0)),
+            func.sum(case((Signal.severity == "info", 1), else_=0)),
+            func.sum(case((Signal.is_read == False, 1), else_=0)),
+        ).where(Signal.workspace_id == workspace_id, Signal.is_dismissed == False)
+    )
+    total, critical, warning, info, unread = result.one()
+    return {
+        "total": total or 0,
+        "critical": critical or 0,
+        "warning": warning or 0,
+        "info": info or 0,
+        "unread": unread or 0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Real-time push (see realtime) — sent when the session commits
+# ---------------------------------------------------------------------------
+
+
+async def push_summary(db: AsyncSession, workspace_id: str, user_ids: Optional[list[str]] = None) -> None:
+    """Queue the workspace's current counts as a ``signals.summary`` frame."""
+    if user_ids is None:
+        user_ids = await realtime.workspace_user_ids(db, workspace_id)
+    realtime.notify(db, user_ids, {"type": "signals.summary", "data": await get_summary(db, workspace_id)})
+
+
+async def _push_delta(db: AsyncSession, workspace_id: str, delta: dict) -> None:
+    if not any(delta.values()):
+        return
+    user_ids = await realtime.workspace_user_ids(db, workspace_id)
+    realtime.notify(db, user_ids, {
+        "type": "signals.changed",
+        "data": {
+            "added": [SignalResponse.model_validate(s).model_dump(mode="json") for s in delta["added"]],
+            "changed": [SignalResponse.model_validate(s).model_dump(mode="json") for s in delta["changed"]],
+            "removed": delta["removed"],
+        },
+    })
+    await push_summary(db, workspace_id, user_ids)
+
+
+# ---------------------------------------------------------------------------
+# Invalidation (see domain_events)
+# ---------------------------------------------------------------------------
+
+
+async def mark_dirty(db: AsyncSession, workspace_id: str, signal_type: str, entity_ids: Iterable[str]) -> None:
+    """Queue (rule, entity) pairs for :func:`sync_dirty`. Nothing is committed here."""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": generate_uuid(),
+            "workspace_id": workspace_id,
+            "signal_type": signal_type,
+            "entity_id": entity_id,
+            "marked_at": now,
+        }
+        for entity_id in set(entity_ids)
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(db)(SignalDirtyMark).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["workspace_id", "signal_type", "entity_id"],
+        set_={"id": stmt.excluded.id, "marked_at": stmt.excluded.marked_at},
+    )
+    await db.execute(stmt)
+
+
+async def sync_dirty(db: AsyncSession, workspace_id: str) -> dict:
+    """Re-evaluate only the (rule, entity) pairs marked dirty, and clear those marks.
+
+    Same return value as :func:`sync_signals`. Marks re-made while this runs
+    get a new id and survive for the next pass. Time-driven changes (an
+    invoice passing its due date) raise no event; the periodic full refresh
+    covers those.
+    """
+    result = await db.execute(
+        select(SignalDirtyMark.id, SignalDirtyMark.signal_type, SignalDirtyMark.entity_id).where(
+            SignalDirtyMark.workspace_id == workspace_id
+        )
+    )
+    mark_ids = []
+    dirty: dict[str, set[str]] = defaultdict(set)
+    for mark_id, signal_type, entity_id in result.all():
+        mark_ids.append(mark_id)
+        if signal_type in RULES:
+            dirty[signal_type].add(entity_id)
+    if not mark_ids:
+        return {"added": [], "changed": [], "removed": []}
+
+    now = datetime.utcnow()
+    fresh = {}
+    for signal_type, entity_ids in dirty.items():
+        for signal in await RULES[signal_type](db, workspace_id, now, entity_ids):
+            fresh[signal_key(signal)] = signal
+
+    stored = {}
+    if dirty:
+        result = await db.execute(
+            select(Signal).where(
+                Signal.workspace_id == workspace_id,
+                or_(*(
+                    and_(Signal.signal_type == signal_type, Signal.entity_id.in_(list(entity_ids)))
+                    for signal_type, entity_ids in dirty.items()
+                )),
+            )
+        )
+        stored = {signal_key(s): s for s in result.scalars().all()}
+
+    delta = await _apply_diff(db, workspace_id, fresh, stored)
+    await db.execute(delete(SignalDirtyMark).where(SignalDirtyMark.id.in_(mark_ids)))
+    return delta
+
+
+async def dirty_workspaces(db: AsyncSession) -> list[str]:
+    """Workspaces with marks waiting for :func:`sync_dirty`."""
+    result = await db.execute(select(SignalDirtyMark.workspace_id).distinct())
+    return list(result.scalars().all())
@@ -0,0 +1,750 @@
+"""Stock service — ledger writes and materialized on-hand balances.
+
+The ``stock_movements`` table is the append-only source of truth. Alongside it,
+``stock_balances`` keeps one running on-hand row per (workspace, product,
+warehouse) so stock reads are an indexed lookup instead of a SUM over the whole
+ledger. ``stock_daily_rollups`` likewise keeps units sold and received per
+product, warehouse and day. Every ledger insert must go through
+:func:`record_movements` so both are updated in the same transaction.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import (
+    Product,
+    SalesOrder,
+    SalesOrderItem,
+    StockBalance,
+    StockCheckpoint,
+    StockCheckpointLine,
+    StockDailyRollup,
+    StockMovement,
+    Warehouse,
+    dialect_insert,
+    generate_uuid,
+)
+from app.models.schemas import StockAdjustmentRequest, StockLevelMatrixResponse, StockLevelResponse
+from app.services import domain_events
+
+logger = logging.getLogger(__name__)
+
+# Sales order statuses whose unfulfilled quantity is held against stock.
+RESERVING_STATUSES = ("confirmed", "partially_fulfilled")
+
+# Balances within this tolerance of the ledger sum are considered in sync
+# (quantities are floats, so replaying the ledger can differ in the last bits).
+BALANCE_TOLERANCE = 1e-6
+
+# Checkpoints stop this far behind "now" so transactions still in flight
+# (whose movements carry an earlier created_at) land before the cutoff is frozen.
+CHECKPOINT_LAG = timedelta(minutes=5)
+
+# Daily checkpoints are kept this long; month-start ones (month-end closings) forever.
+CHECKPOINT_RETENTION = timedelta(days=35)
+
+# Rows per multi-VALUES upsert — keeps bind parameters well under driver limits.
+UPSERT_CHUNK_SIZE = 1000
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+
+async def apply_balance_deltas(
+    db: AsyncSession,
+    workspace_id: str,
+    deltas: dict[tuple[str, str], float],
+) -> None:
+    """Add ``deltas`` keyed by (product_id, warehouse_id) to the balance rows.
+
+    Uses INSERT .. ON CONFLICT DO UPDATE so concurrent writers
+    increment the same row atomically instead of racing on read-modify-write.
+    """
+    rows = [
+        {
+            "id": generate_uuid(),
+            "workspace_id": workspace_id,
+            "product_id": product_id,
+            "warehouse_id": warehouse_id,
+            "on_hand": delta,
+        }
+        for (product_id, warehouse_id), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+
+    upsert = dialect_insert(db)
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = upsert(StockBalance).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["workspace_id", "product_id", "warehouse_id"],
+            set_={
+                "on_hand": StockBalance.on_hand + stmt.excluded.on_hand,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+
+async def record_movements(db: AsyncSession, movements: list[StockMovement]) -> list[StockMovement]:
+    """Append movements to the ledger and update their balances.
+
+    All movements are expected to belong to the same workspace. Nothing is
+    committed here — the caller's transaction covers both tables.
+    """
+    if not movements:
+        return movements
+
+    workspace_id = movements[0].workspace_id
+    # Stamp in Python (wall clock, not transaction start) so the rollup day
+    # below is known without reading server defaults back
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    deltas: dict[tuple[str, str], float] = defaultdict(float)
+    for m in movements:
+        if m.workspace_id != workspace_id:
+            raise ValueError("record_movements() expects movements from a single workspace")
+        if m.created_at is None:
+            m.created_at = now
+        deltas[(m.product_id, m.warehouse_id)] += m.quantity_delta
+
+    db.add_all(movements)
+    await db.flush()
+    await apply_balance_deltas(db, workspace_id, deltas)
+    await apply_daily_rollups(db, workspace_id, _rollup_increments(movements))
+    await domain_events.emit(db, workspace_id, "stock.moved", {m.product_id for m in movements})
+    return movements
+
+
+async def record_movement(db: AsyncSession, movement: StockMovement) -> StockMovement:
+    """Append a single movement to the ledger and update its balance."""
+    await record_movements(db, [movement])
+    return movement
+
+
+async def bulk_adjust(
+    db: AsyncSession,
+    workspace_id: str,
+    user_id: str,
+    rows: list[StockAdjustmentRequest],
+) -> tuple[list[Optional[str]], list[dict]]:
+    """Validate and record many manual adjustments with set-based queries.
+
+    Product and warehouse ids are checked with one ``IN`` query each, valid
+    rows are inserted with a single executemany and their balances upserted.
+    Rows referencing unknown ids are skipped and reported.
+
+    Returns:
+        Tuple of (movement id per input row — None if rejected, list of
+        ``{"row": index, "detail": reason}`` errors with chunk-local indexes).
+    """
+    if not rows:
+        return [], []
+
+    product_ids = {r.product_id for r in rows}
+    warehouse_ids = {r.warehouse_id for r in rows}
+    known_products = set((await db.execute(
+        select(Product.id).where(Product.workspace_id == workspace_id, Product.id.in_(product_ids))
+    )).scalars().all())
+    known_warehouses = set((await db.execute(
+        select(Warehouse.id).where(Warehouse.workspace_id == workspace_id, Warehouse.id.in_(warehouse_ids))
+    )).scalars().all())
+
+    movement_ids: list[Optional[str]] = []
+    errors: list[dict] = []
+    values: list[dict] = []
+    deltas: dict[tuple[str, str], float] = defaultdict(float)
+    for index, row in enumerate(rows):
+        if row.product_id not in known_products:
+            errors.append({"row": index, "detail": "Product not found"})
+            movement_ids.append(None)
+            continue
+        if row.warehouse_id not in known_warehouses:
+            errors.append({"row": index, "detail": "Warehouse not found"})
+            movement_ids.append(None)
+            continue
+
+        movement_id = generate_uuid()
+        movement_ids.append(movement_id)
+        values.append({
+            "id": movement_id,
+            "workspace_id": workspace_id,
+            "product_id": row.product_id,
+            "warehouse_id": row.warehouse_id,
+            "type": "adjustment",
+            "quantity_delta": row.quantity_delta,
+            "reference_type": "manual",
+            "reference_id": None,
+            "notes": row.notes,
+            "created_by": user_id,
+        })
+        deltas[(row.product_id, row.warehouse_id)] += row.quantity_delta
+
+    if values:
+        await db.execute(insert(StockMovement), values)
+        await apply_balance_deltas(db, workspace_id, deltas)
+        await domain_events.emit(db, workspace_id, "stock.moved", {product_id for product_id, _ in deltas})
+    return movement_ids, errors
+
+
+# ---------------------------------------------------------------------------
+# Daily rollups
+# ---------------------------------------------------------------------------
+
+# Movement types counted by the daily rollup, and the column each feeds
+ROLLUP_COLUMNS = {"sale": "units_sold", "purchase": "units_received"}
+
+
+def _rollup_increments(movements: Iterable[StockMovement]) -> dict[tuple[str, str, date], dict]:
+    increments: dict[tuple[str, str, date], dict] = {}
+    for m in movements:
+        column = ROLLUP_COLUMNS.get(m.type)
+        if column is None:
+            continue
+        key = (m.product_id, m.warehouse_id, m.created_at.date())
+        row = increments.setdefault(key, {"units_sold": 0.0, "units_received": 0.0})
+        row[column] += abs(m.quantity_delta)
+    return increments
+
+
+async def apply_daily_rollups(
+    db: AsyncSession,
+    workspace_id: str,
+    increments: dict[tuple[str, str, date], dict],
+) -> None:
+    """Add units sold/received keyed by (product_id, warehouse_id, day) to the rollup."""
+    rows = [
+        {
+            "id": generate_uuid(),
+            "workspace_id": workspace_id,
+            "product_id": product_id,
+            "warehouse_id": warehouse_id,
+            "day": day,
+            **units,
+        }
+        for (product_id, warehouse_id, day), units in increments.items()
+    ]
+    if not rows:
+        return
+
+    upsert = dialect_insert(db)
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = upsert(StockDailyRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["workspace_id", "product_id", "warehouse_id", "day"],
+            set_={
+                "units_sold": StockDailyRollup.units_sold + stmt.excluded.units_sold,
+                "units_received": StockDailyRollup.units_received + stmt.excluded.units_received,
+            },
+        )
+        await db.execute(stmt)
+
+
+def _day_value(value) -> date:
+    """SQLite returns date() as text, PostgreSQL as a date."""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+async def rebuild_daily_rollups(db: AsyncSession, workspace_id: str, since: Optional[date] = None) -> int:
+    """Recompute the daily rollup from the ledger, for all days or from ``since`` on.
+
+    Returns:
+        Number of rollup rows written.
+    """
+    stale = delete(StockDailyRollup).where(StockDailyRollup.workspace_id == workspace_id)
+    if since is not None:
+        stale = stale.where(StockDailyRollup.day >= since)
+    await db.execute(stale)
+
+    day = func.date(StockMovement.created_at)
+    query = (
+        select(
+            StockMovement.product_id,
+            StockMovement.warehouse_id,
+            StockMovement.type,
+            day,
+            func.sum(StockMovement.quantity_delta),
+        )
+        .where(StockMovement.workspace_id == workspace_id, StockMovement.type.in_(list(ROLLUP_COLUMNS)))
+        .group_by(StockMovement.product_id, StockMovement.warehouse_id, StockMovement.type, day)
+    )
+    if since is not None:
+        query = query.where(StockMovement.created_at >= datetime.combine(since, datetime.min.time()))
+
+    increments: dict[tuple[str, str, date], dict] = {}
+    for product_id, warehouse_id, movement_type, movement_day, total in (await db.execute(query)).all():
+        key = (product_id, warehouse_id, _day_value(movement_day))
+        row = increments.setdefault(key, {"units_sold": 0.0, "units_received": 0.0})
+        row[ROLLUP_COLUMNS[movement_type]] += abs(float(total or 0))
+
+    await db.flush()
+    await apply_daily_rollups(db, workspace_id, increments)
+    logger.info(f"Rebuilt {len(increments)} daily stock rollups for workspace {workspace_id}")
+    return len(increments)
+
+
+async def get_daily_series(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: Iterable[str],
+    start: date,
+    end: date,
+    warehouse_id: Optional[str] = None,
+) -> dict[str, dict[date, tuple[float, float]]]:
+    """Units (sold, received) per product and day in [start, end], in one query.
+
+    Rows are summed across warehouses unless ``warehouse_id`` is given. Days
+    without activity are omitted.
+    """
+    query = (
+        select(
+            StockDailyRollup.product_id,
+            StockDailyRollup.day,
+            func.sum(StockDailyRollup.units_sold),
+            func.sum(StockDailyRollup.units_received),
+        )
+        .where(
+            StockDailyRollup.workspace_id == workspace_id,
+            StockDailyRollup.product_id.in_(list(product_ids)),
+            StockDailyRollup.day >= start,
+            StockDailyRollup.day <= end,
+        )
+        .group_by(StockDailyRollup.product_id, StockDailyRollup.day)
+    )
+    if warehouse_id:
+        query = query.where(StockDailyRollup.warehouse_id == warehouse_id)
+
+    series: dict[str, dict[date, tuple[float, float]]] = defaultdict(dict)
+    for product_id, day, sold, received in (await db.execute(query)).all():
+        series[product_id][_day_value(day)] = (float(sold or 0), float(received or 0))
+    return series
+
+
+async def backfill_missing_rollups(db: AsyncSession) -> dict[str, int]:
+    """Build the daily rollup for workspaces with sales/receipts but no rollup rows yet."""
+    has_rollups = select(StockDailyRollup.id).where(StockDailyRollup.workspace_id == StockMovement.workspace_id)
+    result = await db.execute(
+        select(StockMovement.workspace_id).distinct().where(
+            StockMovement.type.in_(list(ROLLUP_COLUMNS)), ~has_rollups.exists()
+        )
+    )
+    return {ws_id: await rebuild_daily_rollups(db, ws_id) for ws_id in result.scalars().all()}
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+
+async def get_on_hand(
+    db: AsyncSession,
+    workspace_id: str,
+    product_id: str,
+    warehouse_id: Optional[str] = None,
+) -> float:
+    """Current on-hand quantity for a product, optionally for one warehouse."""
+    query = select(func.coalesce(func.sum(StockBalance.on_hand), 0)).where(
+        StockBalance.workspace_id == workspace_id,
+        StockBalance.product_id == product_id,
+    )
+    if warehouse_id:
+        query = query.where(StockBalance.warehouse_id == warehouse_id)
+    result = await db.execute(query)
+    return float(result.scalar() or 0)
+
+
+async def get_on_hand_by_warehouse(db: AsyncSession, workspace_id: str, product_id: str) -> dict[str, float]:
+    """Map warehouse_id -> on-hand for a product. Warehouses without stock are omitted."""
+    result = await db.execute(
+        select(StockBalance.warehouse_id, StockBalance.on_hand).where(
+            StockBalance.workspace_id == workspace_id,
+            StockBalance.product_id == product_id,
+        )
+    )
+    return {warehouse_id: float(on_hand) for warehouse_id, on_hand in result.all()}
+
+
+async def get_balance_matrix(
+    db: AsyncSession,
+    workspace_id: str,
+    warehouse_id: Optional[str] = None,
+) -> dict[tuple[str, str], float]:
+    """Map (product_id, warehouse_id) -> on-hand for a whole workspace in one query."""
+    query = select(StockBalance.product_id, StockBalance.warehouse_id, StockBalance.on_hand).where(
+        StockBalance.workspace_id == workspace_id
+    )
+    if warehouse_id:
+        query = query.where(StockBalance.warehouse_id == warehouse_id)
+    result = await db.execute(query)
+    return {(p, w): float(on_hand) for p, w, on_hand in result.all()}
+
+
+async def get_reserved_totals(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: Optional[Iterable[str]] = None,
+) -> dict[str, float]:
+    """Map product_id -> quantity reserved by open sales orders, in one grouped query.
+
+    ``product_ids=None`` covers the whole workspace. Products with nothing
+    reserved are omitted.
+    """
+    query = (
+        select(
+            SalesOrderItem.product_id,
+            func.sum(SalesOrderItem.quantity - SalesOrderItem.fulfilled_quantity),
+        )
+        .join(SalesOrder, SalesOrderItem.order_id == SalesOrder.id)
+        .where(
+            SalesOrder.workspace_id == workspace_id,
+            SalesOrder.status.in_(RESERVING_STATUSES),
+        )
+        .group_by(SalesOrderItem.product_id)
+    )
+    if product_ids is not None:
+        query = query.where(SalesOrderItem.product_id.in_(list(product_ids)))
+    result = await db.execute(query)
+    return {product_id: max(0.0, float(total or 0)) for product_id, total in result.all()}
+
+
+async def get_on_hand_totals(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: Optional[Iterable[str]] = None,
+) -> dict[str, float]:
+    """Map product_id -> on-hand across all warehouses, in one grouped query.
+
+    ``product_ids=None`` covers the whole workspace. Products without stock
+    rows are omitted.
+    """
+    query = (
+        select(StockBalance.product_id, func.sum(StockBalance.on_hand))
+        .where(StockBalance.workspace_id == workspace_id)
+        .group_by(StockBalance.product_id)
+    )
+    if product_ids is not None:
+        query = query.where(StockBalance.product_id.in_(list(product_ids)))
+    result = await db.execute(query)
+    return {product_id: float(total or 0) for product_id, total in result.all()}
+
+
+async def get_stock_totals(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: Optional[Iterable[str]] = None,
+) -> dict[str, dict]:
+    """Batch stock lookup — on-hand, reserved and available for many products.
+
+    Always two queries, however many products are asked for. Every requested
+    product gets an entry (zeros if it has no stock); with ``product_ids=None``
+    only products that have stock or reservations are returned.
+
+    Returns:
+        Mapping of product_id -> {"on_hand", "reserved", "available"}.
+    """
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return {}
+
+    on_hand = await get_on_hand_totals(db, workspace_id, product_ids)
+    reserved = await get_reserved_totals(db, workspace_id, product_ids)
+
+    keys = product_ids if product_ids is not None else set(on_hand) | set(reserved)
+    totals = {}
+    for product_id in keys:
+        qty = on_hand.get(product_id, 0.0)
+        held = reserved.get(product_id, 0.0)
+        totals[product_id] = {"on_hand": qty, "reserved": held, "available": max(0.0, qty - held)}
+    return totals
+
+
+async def get_stock_levels(
+    db: AsyncSession,
+    workspace_id: str,
+    warehouse_id: Optional[str] = None,
+    product_ids: Optional[Iterable[str]] = None,
+    compact: bool = False,
+) -> Union[list[StockLevelResponse], StockLevelMatrixResponse]:
+    """Stock levels for tracked products per warehouse — the ``GET /api/inventory`` body.
+
+    Runs a fixed number of queries regardless of catalog size: products,
+    warehouses, the balance matrix and one grouped reservation aggregate,
+    joined in memory. ``compact`` returns parallel arrays instead of one
+    object per row.
+    """
+    # Plain column rows — hydrating full ORM objects dominates on large catalogs
+    products_query = select(Product.id, Product.name, Product.sku, Product.reorder_level).where(
+        Product.workspace_id == workspace_id,
+        Product.is_active == True,
+        Product.track_inventory == True,
+    )
+    if product_ids is not None:
+        products_query = products_query.where(Product.id.in_(list(product_ids)))
+    products = (await db.execute(products_query)).all()
+
+    wh_query = select(Warehouse.id, Warehouse.name).where(Warehouse.workspace_id == workspace_id)
+    if warehouse_id:
+        wh_query = wh_query.where(Warehouse.id == warehouse_id)
+    warehouses = (await db.execute(wh_query)).all()
+
+    balances = await get_balance_matrix(db, workspace_id, warehouse_id)
+    reserved_by_product = await get_reserved_totals(db, workspace_id)
+
+    if compact:
+        matrix = StockLevelMatrixResponse()
+        for product in products:
+            reserved = reserved_by_product.get(product.id, 0.0)
+            for wh in warehouses:
+                on_hand = balances.get((product.id, wh.id), 0.0)
+                matrix.product_ids.append(product.id)
+                matrix.warehouse_ids.append(wh.id)
+                matrix.on_hand.append(on_hand)
+                matrix.reserved.append(reserved)
+                matrix.available.append(max(0.0, on_hand - reserved))
+        return matrix
+
+    levels = []
+    for product in products:
+        reserved = reserved_by_product.get(product.id, 0.0)
+        for wh in warehouses:
+            on_hand = balances.get((product.id, wh.id), 0.0)
+            levels.append(
+                StockLevelResponse(
+                    product_id=product.id,
+                    product_name=product.name,
+                    sku=product.sku,
+                    warehouse_id=wh.id,
+                    warehouse_name=wh.name,
+                    on_hand=on_hand,
+                    reserved=reserved,
+                    available=max(0.0, on_hand - reserved),
+                    reorder_level=product.reorder_level,
+                    is_low_stock=on_hand <= product.reorder_level,
+                )
+            )
+    return levels
+
+
+# ---------------------------------------------------------------------------
+# Rebuild / verify from the ledger
+# ---------------------------------------------------------------------------
+
+
+async def _ledger_totals(db: AsyncSession, workspace_id: str) -> dict[tuple[str, str], float]:
+    result = await db.execute(
+        select(
+            StockMovement.product_id,
+            StockMovement.warehouse_id,
+            func.sum(StockMovement.quantity_delta),
+        )
+        .where(StockMovement.workspace_id == workspace_id)
+        .group_by(StockMovement.product_id, StockMovement.warehouse_id)
+    )
+    return {(p, w): float(total or 0) for p, w, total in result.all()}
+
+
+async def verify_balances(db: AsyncSession, workspace_id: str) -> list[dict]:
+    """Replay the ledger and report balance rows that have drifted from it.
+
+    Returns:
+        One dict per mismatching (product, warehouse) with ``ledger`` and
+        ``balance`` quantities. An empty list means the table is in sync.
+    """
+    ledger = await _ledger_totals(db, workspace_id)
+    balances = await get_balance_matrix(db, workspace_id)
+
+    drift = []
+    for key in sorted(set(ledger) | set(balances)):
+        expected = ledger.get(key, 0.0)
+        actual = balances.get(key, 0.0)
+        if abs(expected - actual) > BALANCE_TOLERANCE:
+            drift.append({
+                "product_id": key[0],
+                "warehouse_id": key[1],
+                "ledger": expected,
+                "balance": actual,
+            })
+    return drift
+
+
+async def rebuild_balances(db: AsyncSession, workspace_id: str) -> int:
+    """Discard and recompute all balance rows for a workspace from the ledger.
+
+    Returns:
+        Number of balance rows written.
+    """
+    ledger = await _ledger_totals(db, workspace_id)
+    await db.execute(delete(StockBalance).where(StockBalance.workspace_id == workspace_id))
+    await db.flush()
+    await apply_balance_deltas(db, workspace_id, ledger)
+    await db.flush()
+    written = sum(1 for total in ledger.values() if total)
+    logger.info(f"Rebuilt {written} stock balances for workspace {workspace_id}")
+    return written
+
+
+async def backfill_missing_balances(db: AsyncSession) -> dict[str, int]:
+    """Rebuild balances for workspaces that have ledger rows but no balance rows.
+
+    Run at startup so a deployment upgraded onto ``stock_balances`` starts with
+    correct on-hand figures instead of zeros. A no-op once balances exist.
+
+    Returns:
+        Mapping of workspace_id -> balance rows written.
+    """
+    has_balances = select(StockBalance.id).where(StockBalance.workspace_id == StockMovement.workspace_id)
+    result = await db.execute(
+        select(StockMovement.workspace_id).distinct().where(~has_balances.exists())
+    )
+    return {ws_id: await rebuild_balances(db, ws_id) for ws_id in result.scalars().all()}
+
+
+# ---------------------------------------------------------------------------
+# Checkpoints & point-in-time stock
+# ---------------------------------------------------------------------------
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC — normalize aware datetimes to match."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def get_nearest_checkpoint(db: AsyncSession, workspace_id: str, at: datetime) -> Optional[StockCheckpoint]:
+    """Latest checkpoint taken at or before ``at``."""
+    result = await db.execute(
+        select(StockCheckpoint)
+        .where(StockCheckpoint.workspace_id == workspace_id, StockCheckpoint.taken_at <= _as_naive_utc(at))
+        .order_by(StockCheckpoint.taken_at.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_stock_as_of(
+    db: AsyncSession,
+    workspace_id: str,
+    at: datetime,
+    *,
+    product_id: Optional[str] = None,
+    warehouse_id: Optional[str] = None,
+) -> tuple[Optional[datetime], dict[tuple[str, str], float]]:
+    """On-hand per (product, warehouse) as of ``at`` (movements with created_at <= at).
+
+    Starts from the nearest earlier checkpoint and adds only the ledger tail
+    after it, so cost is bounded by checkpoint size plus recent activity.
+
+    Returns:
+        Tuple of (checkpoint taken_at used as the base or None, quantities).
+        Pairs that net to zero are omitted.
+    """
+    at = _as_naive_utc(at)
+    checkpoint = await get_nearest_checkpoint(db, workspace_id, at)
+
+    totals: dict[tuple[str, str], float] = defaultdict(float)
+    if checkpoint is not None:
+        lines_q = select(
+            StockCheckpointLine.product_id, StockCheckpointLine.warehouse_id, StockCheckpointLine.on_hand
+        ).where(StockCheckpointLine.checkpoint_id == checkpoint.id)
+        if product_id:
+            lines_q = lines_q.where(StockCheckpointLine.product_id == product_id)
+        if warehouse_id:
+            lines_q = lines_q.where(StockCheckpointLine.warehouse_id == warehouse_id)
+        for p, w, qty in (await db.execute(lines_q)).all():
+            totals[(p, w)] += float(qty)
+
+    tail_q = (
+        select(StockMovement.product_id, StockMovement.warehouse_id, func.sum(StockMovement.quantity_delta))
+        .where(StockMovement.workspace_id == workspace_id, StockMovement.created_at <= at)
+        .group_by(StockMovement.product_id, StockMovement.warehouse_id)
+    )
+    if checkpoint is not None:
+        tail_q = tail_q.where(StockMovement.created_at > checkpoint.taken_at)
+    if product_id:
+        tail_q = tail_q.where(StockMovement.product_id == product_id)
+    if warehouse_id:
+        tail_q = tail_q.where(StockMovement.warehouse_id == warehouse_id)
+    for p, w, qty in (await db.execute(tail_q)).all():
+        totals[(p, w)] += float(qty or 0)
+
+    quantities = {key: qty for key, qty in totals.items() if abs(qty) > BALANCE_TOLERANCE}
+    return (checkpoint.taken_at if checkpoint else None), quantities
+
+
+async def create_checkpoint(
+    db: AsyncSession,
+    workspace_id: str,
+    cutoff: Optional[datetime] = None,
+) -> Optional[StockCheckpoint]:
+    """Snapshot balances as of ``cutoff`` (default: now minus CHECKPOINT_LAG).
+
+    Built incrementally from the previous checkpoint plus the movements since,
+    so each run only reads new ledger rows. Returns None if a checkpoint for
+    this exact cutoff already exists.
+    """
+    if cutoff is None:
+        cutoff = datetime.now(timezone.utc) - CHECKPOINT_LAG
+    cutoff = _as_naive_utc(cutoff)
+
+    previous_at, quantities = await get_stock_as_of(db, workspace_id, cutoff)
+    if previous_at == cutoff:
+        return None
+
+    checkpoint = StockCheckpoint(workspace_id=workspace_id, taken_at=cutoff, line_count=len(quantities))
+    db.add(checkpoint)
+    await db.flush()
+
+    if quantities:
+        await db.execute(
+            insert(StockCheckpointLine),
+            [
+                {
+                    "id": generate_uuid(),
+                    "checkpoint_id": checkpoint.id,
+                    "product_id": p,
+                    "warehouse_id": w,
+                    "on_hand": qty,
+                }
+                for (p, w), qty in quantities.items()
+            ],
+        )
+    logger.info(f"Stock checkpoint for workspace {workspace_id} at {cutoff}: {len(quantities)} lines")
+    return checkpoint
+
+
+async def prune_checkpoints(db: AsyncSession, workspace_id: str, now: Optional[datetime] = None) -> int:
+    """Delete checkpoints older than CHECKPOINT_RETENTION.
+
+    Checkpoints taken at midnight on the first of a month are kept as closing
+    snapshots, and so is the latest checkpoint, which the next one builds on.
+
+    Returns:
+        Number of checkpoints deleted.
+    """
+    now = _as_naive_utc(now or datetime.now(timezone.utc))
+    result = await db.execute(
+        select(StockCheckpoint.id, StockCheckpoint.taken_at)
+        .where(StockCheckpoint.workspace_id == workspace_id)
+        .order_by(StockCheckpoint.taken_at.desc())
+    )
+    rows = result.all()
+    expired = [
+        checkpoint_id
+        for checkpoint_id, taken_at in rows[1:]
+        if taken_at < now - CHECKPOINT_RETENTION
+        and not (taken_at.day == 1 and taken_at.time() == datetime.min.time())
+    ]
+    if expired:
+        await db.execute(delete(StockCheckpointLine).where(StockCheckpointLine.checkpoint_id.in_(expired)))
+        await db.execute(delete(StockCheckpoint).where(StockCheckpoint.id.in_(expired)))
+        logger.info(f"Pruned {len(expired)} stock checkpoints for workspace {workspace_id}")
+    return len(expired)
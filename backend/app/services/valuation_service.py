@@ -0,0 +1,447 @@
+"""Valuation service — incremental FIFO and weighted-average inventory value.
+
+Cost layers are derived from the stock ledger and kept in
+``inventory_cost_layers``, one set per (workspace, product, warehouse):
+
+* ``fifo`` rows are open receipt layers in consumption order;
+* one ``average`` row holds the running quantity and weighted-average cost.
+
+A per-workspace cursor (``inventory_valuation_cursors``) records how far the
+ledger has been applied, so a refresh only reads movements created since the
+last run. The cursor trails "now" by :data:`stock_service.CHECKPOINT_LAG` for
+the same reason checkpoints do. The periodic refresh task owns the stored
+layers; reads overlay the movements past the cursor in memory and never write.
+:func:`replay_valuation` rebuilds from scratch for backdated or late-committed
+movements and corrected PO costs.
+
+Receipts are costed from the purchase order line (``unit_cost``) for
+``purchase`` movements, otherwise from the current average cost or the
+product's ``cost_price``. Issues beyond the available layers leave a negative
+layer that later receipts fill first.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import (
+    InventoryCostLayer,
+    InventoryValuationCursor,
+    Product,
+    PurchaseOrder,
+    PurchaseOrderItem,
+    StockMovement,
+    dialect_insert,
+    generate_uuid,
+)
+from app.services import ledger_service
+from app.services.stock_service import CHECKPOINT_LAG
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("fifo", "average")
+
+# Movements read per keyset page while advancing the cursor
+MOVEMENT_PAGE_SIZE = 5000
+
+# Product ids per IN (...) when loading layers and product costs
+LOAD_CHUNK_SIZE = 1000
+
+# Quantities closer to zero than this are treated as fully consumed
+QTY_EPSILON = 1e-9
+
+
+# ---------------------------------------------------------------------------
+# Cost layer arithmetic (pure, in memory)
+# ---------------------------------------------------------------------------
+
+
+def _new_position() -> dict:
+    return {"fifo": [], "average": [0.0, 0.0]}
+
+
+def _apply_movement(position: dict, delta: float, unit_cost: Optional[float], fallback_cost: float) -> None:
+    """Apply one signed quantity change to a position's FIFO and average state."""
+    avg = position["average"]
+    layers = position["fifo"]
+
+    if delta > 0:
+        if unit_cost is None:
+            unit_cost = avg[1] if avg[0] > QTY_EPSILON else fallback_cost
+
+        # Weighted average — a receipt into empty or negative stock resets the cost
+        if avg[0] <= QTY_EPSILON:
+            avg[1] = unit_cost
+        else:
+            avg[1] = (avg[0] * avg[1] + delta * unit_cost) / (avg[0] + delta)
+        avg[0] += delta
+
+        # FIFO — fill an outstanding deficit layer before opening a new one
+        remaining = delta
+        if layers and layers[0][0] < 0:
+            filled = min(remaining, -layers[0][0])
+            layers[0][0] += filled
+            remaining -= filled
+            if abs(layers[0][0]) <= QTY_EPSILON:
+                layers.pop(0)
+        if remaining > QTY_EPSILON:
+            layers.append([remaining, unit_cost])
+        return
+
+    if delta < 0:
+        issue_cost = avg[1] if avg[1] else fallback_cost
+        avg[0] += delta
+        if not avg[1]:
+            avg[1] = issue_cost
+
+        remaining = -delta
+        while remaining > QTY_EPSILON and layers and layers[0][0] > 0:
+            taken = min(remaining, layers[0][0])
+            layers[0][0] -= taken
+            remaining -= taken
+            if layers[0][0] <= QTY_EPSILON:
+                layers.pop(0)
+        if remaining > QTY_EPSILON:
+            if layers:
+                layers[0][0] -= remaining  # already a deficit layer
+            else:
+                layers.append([-remaining, issue_cost])
+
+
+def _position_totals(position: dict, method: str) -> tuple[float, float]:
+    """(quantity, value) of a position under ``method``."""
+    if method == "average":
+        qty, cost = position["average"]
+        return qty, qty * cost
+    return (
+        sum(qty for qty, _ in position["fifo"]),
+        sum(qty * cost for qty, cost in position["fifo"]),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Loading and storing
+# ---------------------------------------------------------------------------
+
+
+def _chunks(values: list, size: int = LOAD_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+async def _load_positions(
+    db: AsyncSession,
+    workspace_id: str,
+    product_ids: list[str],
+) -> dict[tuple[str, str], dict]:
+    """Stored layers for every warehouse of the given products."""
+    positions: dict[tuple[str, str], dict] = {}
+    for chunk in _chunks(product_ids):
+        result = await db.execute(
+            select(
+                InventoryCostLayer.product_id,
+                InventoryCostLayer.warehouse_id,
+                InventoryCostLayer.method,
+                InventoryCostLayer.quantity,
+                InventoryCostLayer.unit_cost,
+            )
+            .where(
+                InventoryCostLayer.workspace_id == workspace_id,
+                InventoryCostLayer.product_id.in_(chunk),
+            )
+            .order_by(InventoryCostLayer.sequence)
+        )
+        for product_id, warehouse_id, method, qty, cost in result.all():
+            position = positions.setdefault((product_id, warehouse_id), _new_position())
+            if method == "average":
+                position["average"] = [qty, cost]
+            else:
+                position["fifo"].append([qty, cost])
+    return positions
+
+
+async def _load_products(db: AsyncSession, workspace_id: str, product_ids: list[str]) -> dict[str, tuple]:
+    """Map product_id -> (fallback unit cost, category)."""
+    products = {}
+    for chunk in _chunks(product_ids):
+        result = await db.execute(
+            select(Product.id, Product.cost_price, Product.category).where(
+                Product.workspace_id == workspace_id, Product.id.in_(chunk)
+            )
+        )
+        for product_id, cost_price, category in result.all():
+            products[product_id] = (cost_price or 0.0, category)
+    return products
+
+
+async def _save_positions(db: AsyncSession, workspace_id: str, positions: dict[tuple[str, str], dict]) -> None:
+    """Replace the stored layers of the given (product, warehouse) keys."""
+    keys = list(positions)
+    for chunk in _chunks(keys):
+        await db.execute(
+            delete(InventoryCostLayer).where(
+                InventoryCostLayer.workspace_id == workspace_id,
+                tuple_(InventoryCostLayer.product_id, InventoryCostLayer.warehouse_id).in_(chunk),
+            )
+        )
+
+    rows = []
+    for (product_id, warehouse_id), position in positions.items():
+        base = {"workspace_id": workspace_id, "product_id": product_id, "warehouse_id": warehouse_id}
+        for sequence, (qty, cost) in enumerate(position["fifo"]):
+            rows.append({**base, "id": generate_uuid(), "method": "fifo", "sequence": sequence,
+                         "quantity": qty, "unit_cost": cost})
+        qty, cost = position["average"]
+        # Keep the average row while it carries a cost, so the next receipt-less
+        # inbound movement is still valued at the last known average
+        if abs(qty) > QTY_EPSILON or cost:
+            rows.append({**base, "id": generate_uuid(), "method": "average", "sequence": 0,
+                         "quantity": qty, "unit_cost": cost})
+    if rows:
+        await db.execute(insert(InventoryCostLayer), rows)
+
+
+def _movement_query(db: AsyncSession, workspace_id: str, since: Optional[datetime], until: Optional[datetime]):
+    """Ledger rows in (since, until], oldest first in keyset order."""
+    sort_key = ledger_service.keyset_created_at(db)
+    query = (
+        select(
+            StockMovement.id,
+            StockMovement.product_id,
+            StockMovement.warehouse_id,
+            StockMovement.type,
+            StockMovement.reference_id,
+            StockMovement.quantity_delta,
+            sort_key.label("sort_key"),
+        )
+        .where(StockMovement.workspace_id == workspace_id)
+        .order_by(sort_key, StockMovement.id)
+    )
+    if since is not None:
+        query = query.where(sort_key > ledger_service.keyset_bound(db, since))
+    if until is not None:
+        query = query.where(sort_key <= ledger_service.keyset_bound(db, until))
+    return query
+
+
+async def _load_po_costs(
+    db: AsyncSession,
+    workspace_id: str,
+    order_ids: set[str],
+) -> dict[tuple[str, str], float]:
+    """Map (purchase order id, product_id) -> unit cost for the given orders only."""
+    if not order_ids:
+        return {}
+    result = await db.execute(
+        select(
+            PurchaseOrderItem.order_id,
+            PurchaseOrderItem.product_id,
+            func.avg(PurchaseOrderItem.unit_cost),
+        )
+        .join(PurchaseOrder, PurchaseOrder.id == PurchaseOrderItem.order_id)
+        .where(PurchaseOrder.workspace_id == workspace_id, PurchaseOrderItem.order_id.in_(order_ids))
+        .group_by(PurchaseOrderItem.order_id, PurchaseOrderItem.product_id)
+    )
+    return {(order_id, product_id): float(cost) for order_id, product_id, cost in result.all()}
+
+
+async def _apply_window(
+    db: AsyncSession,
+    workspace_id: str,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    positions: dict[tuple[str, str], dict],
+    products: dict[str, tuple],
+) -> int:
+    """Apply ledger rows in (since, until] to ``positions``, paging by (created_at, id).
+
+    Layers and product costs are loaded on first sight of each product, and PO
+    line costs for the page's purchase receipts — one batched query each per
+    page. Returns the number of movements applied.
+    """
+    query = _movement_query(db, workspace_id, since, until)
+    loaded = {p for p, _ in positions} | set(products)
+    applied = 0
+    after = None
+
+    while True:
+        page_query = query
+        if after is not None:
+            page_query = page_query.where(ledger_service.keyset_after(db, *after, descending=False))
+        rows = (await db.execute(page_query.limit(MOVEMENT_PAGE_SIZE))).all()
+        if not rows:
+            break
+
+        new_ids = list({row.product_id for row in rows} - loaded)
+        if new_ids:
+            positions.update(await _load_positions(db, workspace_id, new_ids))
+            products.update(await _load_products(db, workspace_id, new_ids))
+            loaded.update(new_ids)
+        po_costs = await _load_po_costs(
+            db, workspace_id, {row.reference_id for row in rows if row.type == "purchase" and row.reference_id}
+        )
+
+        for row in rows:
+            fallback_cost = products.get(row.product_id, (0.0, None))[0]
+            unit_cost = po_costs.get((row.reference_id, row.product_id)) if row.type == "purchase" else None
+            position = positions.setdefault((row.product_id, row.warehouse_id), _new_position())
+            _apply_movement(position, row.quantity_delta, unit_cost, fallback_cost)
+
+        applied += len(rows)
+        after = (rows[-1].sort_key, rows[-1].id)
+        if len(rows) < MOVEMENT_PAGE_SIZE:
+            break
+    return applied
+
+
+async def _lock_cursor(db: AsyncSession, workspace_id: str) -> InventoryValuationCursor:
+    """Fetch (creating if needed) the workspace cursor, row-locked on PostgreSQL."""
+    stmt = dialect_insert(db)(InventoryValuationCursor).values(workspace_id=workspace_id)
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=["workspace_id"]))
+    result = await db.execute(
+        select(InventoryValuationCursor)
+        .where(InventoryValuationCursor.workspace_id == workspace_id)
+        .with_for_update()
+    )
+    return result.scalar_one()
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+
+async def refresh_valuation(db: AsyncSession, workspace_id: str, now: Optional[datetime] = None) -> int:
+    """Advance the workspace cursor, folding new movements into the stored layers.
+
+    Only movements created since the previous refresh are read. Returns the
+    number of movements applied. Nothing is committed here.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - CHECKPOINT_LAG
+
+    cursor = await _lock_cursor(db, workspace_id)
+    if cursor.processed_until is not None and cursor.processed_until >= cutoff:
+        return 0
+
+    positions: dict[tuple[str, str], dict] = {}
+    applied = await _apply_window(db, workspace_id, cursor.processed_until, cutoff, positions, {})
+    if positions:
+        await _save_positions(db, workspace_id, positions)
+    cursor.processed_until = cutoff
+    await db.flush()
+
+    if applied:
+        logger.info(f"Valuation for workspace {workspace_id}: applied {applied} movements")
+    return applied
+
+
+async def reset_valuation(db: AsyncSession, workspace_id: str) -> None:
+    """Drop stored layers and the cursor so the next refresh replays the ledger."""
+    await db.execute(delete(InventoryCostLayer).where(InventoryCostLayer.workspace_id == workspace_id))
+    await db.execute(
+        delete(InventoryValuationCursor).where(InventoryValuationCursor.workspace_id == workspace_id)
+    )
+
+
+async def replay_valuation(db: AsyncSession, workspace_id: str) -> int:
+    """Rebuild the stored layers from the whole ledger.
+
+    The cursor only reads forward, so this is how backdated movements, rows
+    committed after the cursor passed them, or corrected PO costs get picked up.
+    Returns the number of movements applied.
+    """
+    await reset_valuation(db, workspace_id)
+    await db.flush()
+    return await refresh_valuation(db, workspace_id)
+
+
+async def _read_cursor(db: AsyncSession, workspace_id: str) -> Optional[datetime]:
+    result = await db.execute(
+        select(InventoryValuationCursor.processed_until).where(
+            InventoryValuationCursor.workspace_id == workspace_id
+        )
+    )
+    return result.scalar()
+
+
+async def _stored_cells(db: AsyncSession, workspace_id: str, method: str) -> dict:
+    """Map (warehouse_id, category) -> [qty, value] from the stored layers, in one query."""
+    result = await db.execute(
+        select(
+            InventoryCostLayer.warehouse_id,
+            Product.category,
+            func.sum(InventoryCostLayer.quantity),
+            func.sum(InventoryCostLayer.quantity * InventoryCostLayer.unit_cost),
+        )
+        .join(Product, Product.id == InventoryCostLayer.product_id)
+        .where(InventoryCostLayer.workspace_id == workspace_id, InventoryCostLayer.method == method)
+        .group_by(InventoryCostLayer.warehouse_id, Product.category)
+    )
+    cells: dict[tuple[str, Optional[str]], list[float]] = defaultdict(lambda: [0.0, 0.0])
+    for warehouse_id, category, qty, value in result.all():
+        cells[(warehouse_id, category)] = [float(qty or 0), float(value or 0)]
+    return cells
+
+
+async def get_valuation(db: AsyncSession, workspace_id: str, method: str = "fifo") -> dict:
+    """Inventory value per warehouse and per product category.
+
+    Read-only: aggregates the stored layers in SQL, then overlays in memory the
+    movements the cursor has not reached yet, for the products they touch.
+    Advancing the cursor is left to the periodic refresh task.
+
+    Returns:
+        Dict with ``as_of``, ``by_warehouse`` {warehouse_id: (qty, value)} and
+        ``by_category`` {category: (qty, value)}.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown valuation method: {method}")
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    # The refresh task swaps layers and cursor in one commit; re-read the cursor
+    # afterwards so stored layers and overlay always come from the same state
+    for _ in range(3):
+        processed_until = await _read_cursor(db, workspace_id)
+        cells = await _stored_cells(db, workspace_id, method)
+
+        tail_query = select(StockMovement.product_id).distinct().where(StockMovement.workspace_id == workspace_id)
+        if processed_until is not None:
+            tail_query = tail_query.where(
+                ledger_service.keyset_created_at(db) > ledger_service.keyset_bound(db, processed_until)
+            )
+        tail_ids = list((await db.execute(tail_query)).scalars().all())
+        positions = await _load_positions(db, workspace_id, tail_ids) if tail_ids else {}
+        if await _read_cursor(db, workspace_id) == processed_until:
+            break
+
+    if tail_ids:
+        products = await _load_products(db, workspace_id, tail_ids)
+        before = {key: _position_totals(pos, method) for key, pos in positions.items()}
+        await _apply_window(db, workspace_id, processed_until, None, positions, products)
+        for key, position in positions.items():
+            product_id, warehouse_id = key
+            category = products.get(product_id, (0.0, None))[1]
+            old_qty, old_value = before.get(key, (0.0, 0.0))
+            qty, value = _position_totals(position, method)
+            cell = cells[(warehouse_id, category)]
+            cell[0] += qty - old_qty
+            cell[1] += value - old_value
+
+    by_warehouse: dict[str, list[float]] = defaultdict(lambda: [0.0, 0.0])
+    by_category: dict[Optional[str], list[float]] = defaultdict(lambda: [0.0, 0.0])
+    for (warehouse_id, category), (qty, value) in cells.items():
+        for bucket in (by_warehouse[warehouse_id], by_category[category]):
+            bucket[0] += qty
+            bucket[1] += value
+
+    return {
+        "as_of": now,
+        "by_warehouse": {k: tuple(v) for k, v in by_warehouse.items()},
+        "by_category": {k: tuple(v) for k, v in by_category.items()},
+    }
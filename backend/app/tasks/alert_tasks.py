@@ -1,26 +1,138 @@
-"""Alert monitoring background tasks."""
+"""Alert monitoring background tasks.
 
+Can also be run by hand:
+
+    python -m app.tasks.alert_tasks all
+    python -m app.tasks.alert_tasks user <user_id>
+    python -m app.tasks.alert_tasks archive [--days N]
+"""
+
+import argparse
+import asyncio
 import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
 
-from app.tasks.worker import celery_app
+from app.models.database import User, async_session
+from app.services import alert_service
+from app.tasks.worker import celery_app, run_async, single_flight
 
 logger = logging.getLogger(__name__)
 
+# User ids loaded per page, and how many users are scanned at a time. Each
+# scan holds one pooled connection, so keep this below the pool size.
+CHECK_CHUNK_SIZE = 200
+CHECK_CONCURRENCY = 4
+
+# A run normally finishes well inside the 30-minute schedule; the lock only
+# outlives it if the worker dies mid-run.
+CHECK_LOCK_TTL = 3600
+
+
+async def _check_user(user_id: str) -> dict:
+    async with async_session() as db:
+        summary = await alert_service.run_full_scan(db, user_id)
+        await db.commit()
+    return summary
+
+
+async def _check_user_limited(user_id: str, limit: asyncio.Semaphore) -> dict:
+    async with limit:
+        return await _check_user(user_id)
+
+
+async def _check_all() -> dict:
+    """Scan every user, paging by id with bounded concurrency."""
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(CHECK_CONCURRENCY)
+    users = failed = new_alerts = 0
+    last_id = ""
+    while True:
+        async with async_session() as db:
+            result = await db.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(CHECK_CHUNK_SIZE)
+            )
+            page = list(result.scalars().all())
+        if not page:
+            break
+        last_id = page[-1]
+
+        results = await asyncio.gather(
+            *(_check_user_limited(user_id, limit) for user_id in page), return_exceptions=True
+        )
+        for user_id, outcome in zip(page, results):
+            if isinstance(outcome, Exception):
+                failed += 1
+                logger.error(f"Alert checks failed for user {user_id}: {outcome}")
+            else:
+                users += 1
+                new_alerts += outcome["total_new_alerts"]
+
+    seconds = round(time.perf_counter() - started, 1)
+    logger.info(f"Alert checks for {users} users ({failed} failed): {new_alerts} new alerts in {seconds}s")
+    return {"users": users, "failed": failed, "new_alerts": new_alerts, "seconds": seconds}
+
+
+async def _archive(days: int) -> dict:
+    """Move read alerts older than ``days`` to the archive, one committed batch at a time."""
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived = 0
+    while True:
+        async with async_session() as db:
+            moved = await alert_service.archive_read_alerts(db, cutoff)
+            await db.commit()
+        if not moved:
+            break
+        archived += moved
+
+    seconds = round(time.perf_counter() - started, 1)
+    logger.info(f"Archived {archived} read alerts older than {days} days in {seconds}s")
+    return {"archived": archived, "seconds": seconds}
+
 
 @celery_app.task(name="app.tasks.alert_tasks.run_alert_checks")
 def run_alert_checks():
-    """Run all alert checks for all users. Runs every 30 minutes."""
-    logger.info("Running alert checks for all users")
-    # In production: iterate users, run each check, create alerts, push via WebSocket + Slack
+    """Run all alert checks for all users. Runs every 30 minutes, never overlapping."""
+    with single_flight("alert-checks", CHECK_LOCK_TTL) as acquired:
+        if not acquired:
+            logger.info("Previous alert check run still in progress — skipping")
+            return {"skipped": True}
+        return run_async(_check_all())
 
 
 @celery_app.task(name="app.tasks.alert_tasks.check_user_alerts")
 def check_user_alerts(user_id: str):
     """Run all alert checks for a specific user."""
     logger.info(f"Checking alerts for user {user_id}")
-    # In production: call alert_service methods:
-    # - check_overdue_invoices
-    # - check_stale_leads
-    # - check_upcoming_meetings (unprepared)
-    # - check_unanswered_emails (3+ days)
-    # - detect_anomalies
+    return run_async(_check_user(user_id))
+
+
+@celery_app.task(name="app.tasks.alert_tasks.archive_read_alerts")
+def archive_read_alerts(days: int = alert_service.ARCHIVE_AFTER_DAYS):
+    """Move read alerts past retention out of the live alerts table."""
+    return run_async(_archive(days))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the alert scanners.")
+    parser.add_argument("command", choices=["all", "user", "archive"])
+    parser.add_argument("user_id", nargs="?")
+    parser.add_argument("--days", type=int, default=alert_service.ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+    if args.command == "user" and not args.user_id:
+        parser.error("user requires a user_id")
+
+    if args.command == "archive":
+        summary = archive_read_alerts(args.days)
+    elif args.command == "user":
+        summary = check_user_alerts(args.user_id)
+    else:
+        summary = run_alert_checks()
+    print(", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Inventory background tasks — stock balances, checkpoints and valuation.
+
+Can also be run by hand:
+
+    python -m app.tasks.inventory_tasks verify [--workspace ID]
+    python -m app.tasks.inventory_tasks rebuild [--workspace ID]
+    python -m app.tasks.inventory_tasks revalue [--workspace ID]
+    python -m app.tasks.inventory_tasks rollup [--workspace ID]
+    python -m app.tasks.inventory_tasks forecast [--workspace ID]
+"""
+
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Workspace, async_session
+from app.services import forecast_service, stock_service, valuation_service
+from app.tasks.worker import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+
+async def _workspace_ids(db: AsyncSession, workspace_id: Optional[str]) -> list[str]:
+    if workspace_id:
+        return [workspace_id]
+    result = await db.execute(select(Workspace.id))
+    return list(result.scalars().all())
+
+
+async def _rebuild(workspace_id: Optional[str]) -> dict:
+    rebuilt = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, workspace_id):
+            rebuilt[ws_id] = await stock_service.rebuild_balances(db, ws_id)
+        await db.commit()
+    return rebuilt
+
+
+async def _rebuild_rollups(workspace_id: Optional[str]) -> dict:
+    written = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, workspace_id):
+            written[ws_id] = await stock_service.rebuild_daily_rollups(db, ws_id)
+            await db.commit()
+    return written
+
+
+async def _forecast(workspace_id: Optional[str]) -> dict:
+    forecast = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, workspace_id):
+            forecast[ws_id] = await forecast_service.run_forecast(db, ws_id)
+            await db.commit()
+    return forecast
+
+
+async def _verify(workspace_id: Optional[str]) -> dict:
+    drift = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, workspace_id):
+            mismatches = await stock_service.verify_balances(db, ws_id)
+            if mismatches:
+                drift[ws_id] = mismatches
+    return drift
+
+
+async def _checkpoint_all() -> dict:
+    # Snapshot at midnight UTC so day/month-end queries hit a checkpoint exactly
+    cutoff = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    created = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, None):
+            checkpoint = await stock_service.create_checkpoint(db, ws_id, cutoff)
+            if checkpoint is not None:
+                created[ws_id] = checkpoint.line_count
+            await stock_service.prune_checkpoints(db, ws_id)
+        await db.commit()
+    return created
+
+
+async def _refresh_valuations() -> dict:
+    applied = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, None):
+            applied[ws_id] = await valuation_service.refresh_valuation(db, ws_id)
+            await db.commit()  # release the cursor lock before the next workspace
+    return applied
+
+
+async def _replay_valuations(workspace_id: Optional[str]) -> dict:
+    applied = {}
+    async with async_session() as db:
+        for ws_id in await _workspace_ids(db, workspace_id):
+            applied[ws_id] = await valuation_service.replay_valuation(db, ws_id)
+            await db.commit()
+    return applied
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.create_stock_checkpoints")
+def create_stock_checkpoints():
+    """Snapshot per-(product, warehouse) balances for every workspace and prune old ones. Runs daily."""
+    logger.info("Creating stock checkpoints for all workspaces")
+    return run_async(_checkpoint_all())
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.refresh_inventory_valuations")
+def refresh_inventory_valuations():
+    """Fold new stock movements into the FIFO/average cost layers of every workspace."""
+    return run_async(_refresh_valuations())
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.replay_inventory_valuation")
+def replay_inventory_valuation(workspace_id: Optional[str] = None):
+    """Rebuild cost layers from the whole ledger (one workspace, or all)."""
+    logger.info(f"Replaying inventory valuation for {workspace_id or 'all workspaces'}")
+    return run_async(_replay_valuations(workspace_id))
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.rebuild_stock_balances")
+def rebuild_stock_balances(workspace_id: Optional[str] = None):
+    """Recompute stock balances from the ledger (one workspace, or all)."""
+    logger.info(f"Rebuilding stock balances for {workspace_id or 'all workspaces'}")
+    return run_async(_rebuild(workspace_id))
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.backfill_daily_rollups")
+def backfill_daily_rollups(workspace_id: Optional[str] = None):
+    """Recompute the daily units sold/received rollup from the ledger."""
+    logger.info(f"Backfilling daily stock rollups for {workspace_id or 'all workspaces'}")
+    return run_async(_rebuild_rollups(workspace_id))
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.run_demand_forecasts")
+def run_demand_forecasts(workspace_id: Optional[str] = None):
+    """Recompute demand forecasts and suggested reorder levels. Runs nightly."""
+    logger.info(f"Forecasting demand for {workspace_id or 'all workspaces'}")
+    return run_async(_forecast(workspace_id))
+
+
+@celery_app.task(name="app.tasks.inventory_tasks.verify_stock_balances")
+def verify_stock_balances(workspace_id: Optional[str] = None):
+    """Replay the ledger and report balances that have drifted from it."""
+    drift = run_async(_verify(workspace_id))
+    for ws_id, mismatches in drift.items():
+        logger.warning(f"Stock balance drift in workspace {ws_id}: {len(mismatches)} rows")
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild stock balances and derived inventory tables.")
+    parser.add_argument("command", choices=["verify", "rebuild", "revalue", "rollup", "forecast"])
+    parser.add_argument("--workspace", default=None, help="Limit to a single workspace ID")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        for ws_id, rows in rebuild_stock_balances(args.workspace).items():
+            print(f"{ws_id}: rebuilt {rows} balance rows")
+        return
+    if args.command == "rollup":
+        for ws_id, rows in backfill_daily_rollups(args.workspace).items():
+            print(f"{ws_id}: wrote {rows} daily rollup rows")
+        return
+    if args.command == "forecast":
+        for ws_id, products in run_demand_forecasts(args.workspace).items():
+            print(f"{ws_id}: forecast {products} products")
+        return
+    if args.command == "revalue":
+        for ws_id, applied in replay_inventory_valuation(args.workspace).items():
+            print(f"{ws_id}: replayed {applied} movements")
+        return
+
+    drift = verify_stock_balances(args.workspace)
+    if not drift:
+        print("All stock balances match the ledger.")
+        return
+    for ws_id, mismatches in drift.items():
+        for m in mismatches:
+            print(
+                f"{ws_id}: product={m['product_id']} warehouse={m['warehouse_id']} "
+                f"ledger={m['ledger']} balance={m['balance']}"
+            )
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
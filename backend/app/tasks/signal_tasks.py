@@ -0,0 +1,126 @@
+"""Signal background tasks — keep stored signals current so reads never compute.
+
+Can also be run by hand:
+
+    python -m app.tasks.signal_tasks dirty
+    python -m app.tasks.signal_tasks all
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from sqlalchemy import select
+
+from app.models.database import Workspace, async_session
+from app.services import signal_service
+from app.tasks.worker import celery_app, run_async, single_flight
+
+logger = logging.getLogger(__name__)
+
+# Workspace ids loaded per page, and how many are refreshed at a time. Each
+# refresh holds one pooled connection, so keep this below the pool size.
+REFRESH_CHUNK_SIZE = 200
+REFRESH_CONCURRENCY = 4
+
+# Both signal tasks take this lock, so runs never overlap each other. A run
+# normally finishes well inside its schedule; the lock only outlives it if
+# the worker dies mid-run.
+SIGNAL_LOCK = "signals"
+SIGNAL_LOCK_TTL = 3600
+
+
+async def _sync_dirty_workspace(workspace_id: str) -> dict:
+    async with async_session() as db:
+        delta = await signal_service.sync_dirty(db, workspace_id)
+        await db.commit()  # one transaction per workspace
+    return {key: len(items) for key, items in delta.items()}
+
+
+async def _process_dirty() -> dict:
+    """Sync every workspace with dirty marks; a failing one keeps its marks for the next run."""
+    async with async_session() as db:
+        workspace_ids = await signal_service.dirty_workspaces(db)
+    counts = {}
+    for ws_id in workspace_ids:
+        try:
+            counts[ws_id] = await _sync_dirty_workspace(ws_id)
+        except Exception as exc:
+            logger.error(f"Signal invalidation failed for workspace {ws_id}: {exc}")
+    return counts
+
+
+async def _refresh_workspace(workspace_id: str, limit: asyncio.Semaphore) -> dict:
+    async with limit, async_session() as db:
+        delta = await signal_service.sync_signals(db, workspace_id)
+        await db.commit()
+    return {key: len(items) for key, items in delta.items()}
+
+
+async def _refresh_all() -> dict:
+    """Full refresh of every workspace, paging by id with bounded concurrency."""
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(REFRESH_CONCURRENCY)
+    counts = {}
+    failed = 0
+    last_id = ""
+    while True:
+        async with async_session() as db:
+            result = await db.execute(
+                select(Workspace.id).where(Workspace.id > last_id).order_by(Workspace.id).limit(REFRESH_CHUNK_SIZE)
+            )
+            page = list(result.scalars().all())
+        if not page:
+            break
+        last_id = page[-1]
+
+        results = await asyncio.gather(
+            *(_refresh_workspace(ws_id, limit) for ws_id in page), return_exceptions=True
+        )
+        for ws_id, outcome in zip(page, results):
+            if isinstance(outcome, Exception):
+                failed += 1
+                logger.error(f"Signal refresh failed for workspace {ws_id}: {outcome}")
+            else:
+                counts[ws_id] = outcome
+
+    logger.info(
+        f"Refreshed signals for {len(counts)} workspaces ({failed} failed) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return counts
+
+
+@celery_app.task(name="app.tasks.signal_tasks.refresh_all_signals")
+def refresh_all_signals():
+    """Re-run every rule for every workspace. Catches time-driven changes events can't."""
+    with single_flight(SIGNAL_LOCK, SIGNAL_LOCK_TTL) as acquired:
+        if not acquired:
+            logger.info("Another signal run still in progress — skipping")
+            return {}
+        return run_async(_refresh_all())
+
+
+@celery_app.task(name="app.tasks.signal_tasks.process_signal_invalidations")
+def process_signal_invalidations():
+    """Re-evaluate the (rule, entity) pairs that domain events marked dirty, never overlapping."""
+    with single_flight(SIGNAL_LOCK, SIGNAL_LOCK_TTL) as acquired:
+        if not acquired:
+            logger.info("Another signal run still in progress — skipping")
+            return {}
+        return run_async(_process_dirty())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute stored signals.")
+    parser.add_argument("command", choices=["dirty", "all"])
+    args = parser.parse_args()
+
+    task = refresh_all_signals if args.command == "all" else process_signal_invalidations
+    for ws_id, counts in task().items():
+        print(f"{ws_id}: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
 """Celery app configuration."""
 
+import asyncio
+import logging
+from contextlib import contextmanager
+
 from celery import Celery
 from celery.schedules import crontab
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 celery_app = Celery(
     "lytherahub",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
+    include=[
+        "app.tasks.alert_tasks",
+        "app.tasks.calendar_tasks",
+        "app.tasks.email_tasks",
+        "app.tasks.inventory_tasks",
+        "app.tasks.invoice_tasks",
+        "app.tasks.report_tasks",
+        "app.tasks.signal_tasks",
+    ],
 )
 
 celery_app.conf.update(
@@ -43,11 +58,89 @@ celery_app.conf.beat_schedule = {
     "run-alert-checks": {
         "task": "app.tasks.alert_tasks.run_alert_checks",
         "schedule": 1800.0,  # 30 minutes
+        "options": {"expires": 1800},  # drop a run still queued when the next is due
+    },
+    "archive-read-alerts-daily": {
+        "task": "app.tasks.alert_tasks.archive_read_alerts",
+        "schedule": crontab(hour=3, minute=0),
     },
     "generate-meeting-preps-daily": {
         "task": "app.tasks.calendar_tasks.generate_meeting_preps",
         "schedule": crontab(hour=20, minute=0),  # 8pm daily
     },
+    "create-stock-checkpoints-daily": {
+        "task": "app.tasks.inventory_tasks.create_stock_checkpoints",
+        "schedule": crontab(hour=0, minute=10),  # just after midnight UTC
+    },
+    "run-demand-forecasts-daily": {
+        "task": "app.tasks.inventory_tasks.run_demand_forecasts",
+        "schedule": crontab(hour=1, minute=0),  # after the day's rollup is complete
+    },
+    "refresh-inventory-valuations": {
+        "task": "app.tasks.inventory_tasks.refresh_inventory_valuations",
+        "schedule": 900.0,  # 15 minutes
+    },
+    "refresh-all-signals": {
+        "task": "app.tasks.signal_tasks.refresh_all_signals",
+        "schedule": 900.0,  # 15 minutes
+    },
+    "process-signal-invalidations": {
+        "task": "app.tasks.signal_tasks.process_signal_invalidations",
+        "schedule": 30.0,  # seconds — dirty marks are cheap to check
+    },
 }
 
 celery_app.autodiscover_tasks(["app.tasks"])
+
+
+def run_async(coro):
+    """Run an async coroutine to completion from a synchronous Celery task.
+
+    Every call gets a fresh event loop, so the engine's pooled connections
+    (bound to the previous loop) are disposed once the coroutine finishes.
+    Real-time messages still being published are flushed first.
+    """
+    from app.models.database import engine
+    from app.services import realtime
+
+    async def _runner():
+        try:
+            return await coro
+        finally:
+            await realtime.drain()
+            await engine.dispose()
+
+    return asyncio.run(_runner())
+
+
+@contextmanager
+def single_flight(name: str, ttl: int):
+    """Hold a Redis lock while a periodic run is in progress.
+
+    Yields False when another worker already holds it, so the caller skips
+    this run instead of overlapping. The lock expires after ``ttl`` seconds
+    in case its holder dies. If Redis is unreachable (a hand run without
+    Redis) the run goes ahead unguarded.
+    """
+    import redis
+
+    lock = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2).lock(
+        f"lytherahub:single-flight:{name}", timeout=ttl
+    )
+    try:
+        acquired = lock.acquire(blocking=False)
+    except redis.RedisError as exc:
+        logger.warning(f"Redis unavailable, running {name} without a lock: {exc}")
+        acquired, lock = True, None
+
+    if not acquired:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        if lock is not None:
+            try:
+                lock.release()
+            except redis.RedisError:
+                logger.warning(f"Lock for {name} expired before the run finished")
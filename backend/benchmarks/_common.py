@@ -0,0 +1,80 @@
+"""Shared helpers for the backend benchmarks — throwaway SQLite DB, query counting, timing."""
+
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Point the app at a throwaway database BEFORE any app imports. Always override —
+# reset_db() drops every table, so an inherited DATABASE_URL must never be used.
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="lytherahub-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ.setdefault("DEMO_MODE", "false")
+# No Redis needed — real-time fan-out and chat state stay in-process
+os.environ.setdefault("REALTIME_BACKEND", "memory")
+os.environ.setdefault("CHAT_SESSION_BACKEND", "memory")
+
+from sqlalchemy import event  # noqa: E402
+
+from app.models.database import Base, User, Workspace, async_session, engine  # noqa: E402
+
+
+async def reset_db():
+    """Drop and recreate every table in the throwaway benchmark database."""
+    if engine.url.database != _DB_PATH:
+        raise RuntimeError(f"Refusing to reset non-benchmark database: {engine.url}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def create_owner(db, suffix: str = "1") -> tuple[User, Workspace]:
+    """Create a user and the workspace they own."""
+    user = User(id=f"bench-user-{suffix}", email=f"bench{suffix}@lytherahub.ai", name="Bench User")
+    db.add(user)
+    await db.flush()
+    workspace = Workspace(id=f"bench-ws-{suffix}", name="Bench", owner_id=user.id, slug=f"bench-{suffix}")
+    db.add(workspace)
+    await db.flush()
+    return user, workspace
+
+
+class QueryCounter:
+    """Count SQL statements executed on the shared engine."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    @contextmanager
+    def track(self):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+
+async def timed(fn, runs: int = 5) -> tuple[float, int]:
+    """Run ``await fn()`` several times; return (median ms, queries per run)."""
+    counter = QueryCounter()
+    samples = []
+    queries = 0
+    for _ in range(runs):
+        with counter.track():
+            start = time.perf_counter()
+            await fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        queries = counter.count
+    return statistics.median(samples), queries
+
+
+def print_table(headers: list[str], rows: list[tuple]):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,100 @@
+"""Benchmark unread alert counts as the alerts table accumulates history.
+
+    cd backend && python -m benchmarks.bench_alert_counts
+
+Each step adds read alerts until the table holds that many months of
+history; every user keeps the same 50 unread. With the partial index on
+unread alerts the count reads only unread rows, so it stays flat. The last
+columns drop that index to show the cost it removes, and the final row
+archives everything past 90 days.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from benchmarks._common import async_session, create_owner, print_table, reset_db, timed
+
+from app.models.database import Alert, generate_uuid
+from app.services import alert_service
+
+USERS = 10
+ALERTS_PER_USER_PER_DAY = 100
+UNREAD_PER_USER = 50
+HISTORY_MONTHS = [1, 3, 6, 12]
+SEVERITIES = ("info", "warning", "critical")
+UNREAD_INDEX = next(ix for ix in Alert.__table__.indexes if ix.name == "ix_alerts_unread_user")
+
+
+async def _add_history(db, user_ids: list[str], from_day: int, to_day: int):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": generate_uuid(), "user_id": user_id, "type": "reminder", "title": "Reminder",
+            "message": "Old reminder", "severity": random.choice(SEVERITIES), "is_read": True,
+            "created_at": now - timedelta(days=day, minutes=i),
+        }
+        for day in range(from_day, to_day)
+        for user_id in user_ids
+        for i in range(ALERTS_PER_USER_PER_DAY)
+    ]
+    for start in range(0, len(rows), 10000):
+        await db.execute(insert(Alert), rows[start:start + 10000])
+    await db.commit()
+
+
+async def _count_ms(db, user_id: str) -> float:
+    ms, _ = await timed(lambda: alert_service.get_unread_counts(db, user_id), runs=20)
+    return ms
+
+
+async def main():
+    await reset_db()
+    async with async_session() as db:
+        users = [(await create_owner(db, str(i)))[0] for i in range(USERS)]
+        user_ids = [u.id for u in users]
+        await db.execute(insert(Alert), [
+            {
+                "id": generate_uuid(), "user_id": user_id, "type": "reminder", "title": "Open",
+                "message": "Open reminder", "severity": SEVERITIES[i % 3], "is_read": False,
+            }
+            for user_id in user_ids
+            for i in range(UNREAD_PER_USER)
+        ])
+        await db.commit()
+
+    rows = []
+    days_seeded = 0
+    async with async_session() as db:
+        plan = (await db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT severity, count(*) FROM alerts "
+            "WHERE user_id = :u AND is_read = 0 GROUP BY severity"
+        ), {"u": user_ids[0]})).all()
+
+        for months in HISTORY_MONTHS:
+            await _add_history(db, user_ids, days_seeded, months * 30)
+            days_seeded = months * 30
+            total = (await db.execute(text("SELECT count(*) FROM alerts"))).scalar()
+            indexed = await _count_ms(db, user_ids[0])
+
+            await db.execute(text("DROP INDEX ix_alerts_unread_user"))
+            unindexed = await _count_ms(db, user_ids[0])
+            await db.run_sync(lambda session: UNREAD_INDEX.create(session.connection()))
+            await db.commit()
+            rows.append((f"{months} mo", total, f"{indexed:.2f}", f"{unindexed:.2f}"))
+
+        cutoff = datetime.utcnow() - timedelta(days=alert_service.ARCHIVE_AFTER_DAYS)
+        while await alert_service.archive_read_alerts(db, cutoff):
+            await db.commit()
+        total = (await db.execute(text("SELECT count(*) FROM alerts"))).scalar()
+        rows.append(("archived", total, f"{await _count_ms(db, user_ids[0]):.2f}", ""))
+
+    print(f"{USERS} users, {ALERTS_PER_USER_PER_DAY} alerts/user/day, {UNREAD_PER_USER} unread each")
+    print("plan:", "; ".join(row[-1] for row in plan))
+    print_table(["history", "alert rows", "count ms", "count ms (no partial index)"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Benchmark the alert scanners on a user with thousands of actionable items.
+
+    cd backend && python -m benchmarks.bench_alert_scans
+
+"first scan" creates an alert per item; "rescan" finds every item already
+alerted. Both cost a fixed number of queries per scanner.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from benchmarks._common import async_session, create_owner, print_table, reset_db, timed
+
+from app.models.database import Email, Invoice
+from app.services import alert_service
+
+SIZES = [500, 5000]
+
+
+async def _seed(db, user_id: str, n: int):
+    now = datetime.utcnow()
+    db.add_all([
+        Invoice(
+            user_id=user_id, invoice_number=f"INV-{i:06d}", amount=100.0, status="sent",
+            issued_date=now - timedelta(days=60), due_date=now - timedelta(days=1 + i % 30),
+        )
+        for i in range(n)
+    ])
+    db.add_all([
+        Email(
+            user_id=user_id, from_addr=f"sender{i}@example.com", to_addr="bench@lytherahub.ai",
+            subject=f"Question {i}", needs_reply=True, received_at=now - timedelta(days=3),
+        )
+        for i in range(n)
+    ])
+    await db.commit()
+
+
+async def main():
+    rows = []
+    for n in SIZES:
+        await reset_db()
+        async with async_session() as db:
+            user, _ = await create_owner(db)
+            await _seed(db, user.id, n)
+
+            first_ms, first_q = await timed(lambda: alert_service.run_full_scan(db, user.id), runs=1)
+            created = (await alert_service.get_unread_counts(db, user.id))["unread"]
+            rescan_ms, rescan_q = await timed(lambda: alert_service.run_full_scan(db, user.id))
+            await db.rollback()
+        rows.append((n, created, first_q, f"{first_ms:.1f}", rescan_q, f"{rescan_ms:.1f}"))
+
+    print("items = overdue invoices = unanswered emails")
+    print_table(["items", "alerts", "first queries", "first ms", "rescan queries", "rescan ms"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Benchmark the chat business context on a busy account.
+
+    cd backend && python -m benchmarks.bench_chat_context
+
+Seeds one user with a large inbox, invoice book, task list and client base,
+then times ``_gather_context`` on a cache miss (counters in one aggregate
+query plus today's meetings and top clients) and on a cache hit. The last
+row commits a task between calls, so every call pays for the invalidation
+and a rebuild.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks._common import async_session, create_owner, print_table, reset_db, timed
+
+from app.models.database import CalendarEvent, Company, Email, Invoice, Task, generate_uuid
+from app.services import chat_context, chat_service
+
+EMAILS = 50_000
+INVOICES = 5_000
+TASKS = 5_000
+CLIENTS = 2_000
+EVENTS = 1_000
+
+
+async def _seed(db, user_id: str, workspace_id: str):
+    now = datetime.utcnow()
+    await db.execute(insert(Email), [
+        {
+            "id": generate_uuid(), "user_id": user_id, "from_addr": f"sender{i}@example.com",
+            "to_addr": "bench@lytherahub.ai", "subject": f"Message {i}", "received_at": now - timedelta(minutes=i),
+            "is_read": random.random() < 0.8,
+            "category": random.choice(("urgent", "client", "invoice", "newsletter", "other")),
+        }
+        for i in range(EMAILS)
+    ])
+    await db.execute(insert(Invoice), [
+        {
+            "id": generate_uuid(), "user_id": user_id, "invoice_number": f"INV-{i:06d}",
+            "amount": random.uniform(100, 10_000), "status": random.choice(("draft", "sent", "paid", "overdue")),
+            "issued_date": now - timedelta(days=i % 365), "due_date": now - timedelta(days=i % 365 - 30),
+        }
+        for i in range(INVOICES)
+    ])
+    await db.execute(insert(Task), [
+        {"id": generate_uuid(), "user_id": user_id, "title": f"Task {i}", "status": random.choice(("todo", "done"))}
+        for i in range(TASKS)
+    ])
+    await db.execute(insert(Company), [
+        {
+            "id": generate_uuid(), "workspace_id": workspace_id, "company_name": f"Client {i}",
+            "pipeline_stage": random.choice(("lead", "proposal", "won", "lost")),
+            "deal_value": random.uniform(0, 100_000),
+        }
+        for i in range(CLIENTS)
+    ])
+    await db.execute(insert(CalendarEvent), [
+        {
+            "id": generate_uuid(), "user_id": user_id, "title": f"Meeting {i}",
+            "start_time": now - timedelta(hours=i), "end_time": now - timedelta(hours=i) + timedelta(minutes=30),
+        }
+        for i in range(EVENTS)
+    ])
+    await db.commit()
+
+
+async def main():
+    await reset_db()
+    async with async_session() as db:
+        user, workspace = await create_owner(db)
+        await _seed(db, user.id, workspace.id)
+
+    rows = []
+    async with async_session() as db:
+        async def miss():
+            chat_context.cache.delete_sync([user.id])
+            await chat_service._gather_context(user, db)
+
+        async def after_write():
+            db.add(Task(user_id=user.id, title="New task"))
+            await db.commit()
+            await asyncio.sleep(0)  # let the invalidation run
+            await chat_service._gather_context(user, db)
+
+        for label, fn in (
+            ("miss", miss),
+            ("hit", lambda: chat_service._gather_context(user, db)),
+            ("write + rebuild", after_write),
+        ):
+            ms, queries = await timed(fn, runs=20)
+            rows.append((label, f"{ms:.2f}", queries))
+
+    print(f"{EMAILS} emails, {INVOICES} invoices, {TASKS} tasks, {CLIENTS} clients, {EVENTS} events")
+    print_table(["context", "median ms", "queries"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Benchmark the replenishment planner as the catalog grows.
+
+    cd backend && python -m benchmarks.bench_replenishment
+
+Planning is a fixed number of queries for any catalog size; drafting adds two
+bulk inserts however many suppliers and lines there are.
+"""
+
+import asyncio
+
+from benchmarks._common import async_session, create_owner, print_table, reset_db, timed
+
+from app.models.database import Company, Product, PurchaseOrder, PurchaseOrderItem, StockMovement, Warehouse
+from app.services import replenishment_service, stock_service
+
+CATALOG_SIZES = [1000, 10000]
+SUPPLIERS = 20
+SHORT_EVERY = 3  # every third product is below its reorder level
+
+
+async def _seed(db, workspace_id: str, n_products: int):
+    warehouse = Warehouse(workspace_id=workspace_id, name="WH")
+    suppliers = [
+        Company(workspace_id=workspace_id, company_name=f"Supplier {i}", company_type="supplier")
+        for i in range(SUPPLIERS)
+    ]
+    products = [
+        Product(workspace_id=workspace_id, name=f"Product {i:05d}", sku=f"SKU-{i:05d}", reorder_level=10)
+        for i in range(n_products)
+    ]
+    db.add_all([warehouse, *suppliers, *products])
+    await db.flush()
+
+    # One received PO per supplier establishes the preferred supplier of its products
+    orders = [
+        PurchaseOrder(workspace_id=workspace_id, order_number=f"PO-{i:04d}", supplier_id=s.id, status="received")
+        for i, s in enumerate(suppliers)
+    ]
+    db.add_all(orders)
+    await db.flush()
+    db.add_all([
+        PurchaseOrderItem(
+            order_id=orders[i % SUPPLIERS].id, product_id=p.id,
+            quantity_ordered=10, quantity_received=10, unit_cost=1.5,
+        )
+        for i, p in enumerate(products)
+    ])
+
+    await stock_service.record_movements(db, [
+        StockMovement(
+            workspace_id=workspace_id, product_id=p.id, warehouse_id=warehouse.id,
+            type="adjustment", quantity_delta=4.0 if i % SHORT_EVERY == 0 else 25.0,
+        )
+        for i, p in enumerate(products)
+    ])
+    await db.commit()
+
+
+async def main():
+    rows = []
+    for n_products in CATALOG_SIZES:
+        await reset_db()
+        async with async_session() as db:
+            _, workspace = await create_owner(db)
+            await _seed(db, workspace.id, n_products)
+
+            plan_ms, plan_q = await timed(lambda: replenishment_service.plan_replenishment(db, workspace.id))
+            plan = await replenishment_service.plan_replenishment(db, workspace.id)
+            lines = sum(len(group["lines"]) for group in plan["suppliers"])
+            draft_ms, draft_q = await timed(
+                lambda: replenishment_service.create_draft_orders(db, workspace.id, plan), runs=1
+            )
+            await db.rollback()
+        rows.append((n_products, lines, plan_q, f"{plan_ms:.1f}", draft_q, f"{draft_ms:.1f}"))
+
+    print_table(["products", "short", "plan queries", "plan ms", "draft queries", "draft ms"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""Benchmark the signal rules on a large workspace.
+
+    cd backend && python -m benchmarks.bench_signals
+
+Every rule is one query whatever the data size. The last row runs all rules
+together, as a refresh does.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from benchmarks._common import async_session, create_owner, print_table, reset_db, timed
+
+from app.models.database import Company, Deal, Invoice, Product, PurchaseOrder, StockMovement, Warehouse
+from app.services import signal_service, stock_service
+
+PRODUCTS = 10000
+INVOICES = 50000
+COMPANIES = 500
+DEALS = 2000
+PURCHASE_ORDERS = 1000
+
+
+async def _seed(db, user_id: str, workspace_id: str):
+    now = datetime.utcnow()
+    warehouse = Warehouse(workspace_id=workspace_id, name="WH")
+    companies = [
+        Company(
+            workspace_id=workspace_id, company_name=f"Company {i}", pipeline_stage="lead",
+            updated_at=now - timedelta(days=i % 60),
+        )
+        for i in range(COMPANIES)
+    ]
+    products = [
+        Product(workspace_id=workspace_id, name=f"Product {i:05d}", sku=f"SKU-{i:05d}", reorder_level=10)
+        for i in range(PRODUCTS)
+    ]
+    db.add_all([warehouse, *companies, *products])
+    await db.flush()
+
+    # A third of the invoices are open and past due
+    db.add_all([
+        Invoice(
+            user_id=user_id, company_id=companies[i % COMPANIES].id, invoice_number=f"INV-{i:06d}",
+            amount=100.0, status=("sent", "paid", "draft")[i % 3],
+            issued_date=now - timedelta(days=60), due_date=now - timedelta(days=(i % 40) - 10),
+        )
+        for i in range(INVOICES)
+    ])
+    db.add_all([
+        Deal(
+            workspace_id=workspace_id, title=f"Deal {i}", stage=("lead", "proposal", "won")[i % 3],
+            updated_at=now - timedelta(days=i % 30),
+        )
+        for i in range(DEALS)
+    ])
+    db.add_all([
+        PurchaseOrder(
+            workspace_id=workspace_id, order_number=f"PO-{i:04d}", status=("sent", "received")[i % 2],
+            expected_date=now - timedelta(days=(i % 20) - 10),
+        )
+        for i in range(PURCHASE_ORDERS)
+    ])
+    await stock_service.record_movements(db, [
+        StockMovement(
+            workspace_id=workspace_id, product_id=p.id, warehouse_id=warehouse.id,
+            type="adjustment", quantity_delta=float(i % 25),
+        )
+        for i, p in enumerate(products)
+    ])
+    await db.commit()
+
+
+async def main():
+    await reset_db()
+    async with async_session() as db:
+        user, workspace = await create_owner(db)
+        await _seed(db, user.id, workspace.id)
+
+    rows = []
+    now = datetime.utcnow()
+    async with async_session() as db:
+        for name, rule in signal_service.RULES.items():
+            signals = await rule(db, workspace.id, now)
+            ms, queries = await timed(lambda: rule(db, workspace.id, now))
+            rows.append((name, len(signals), queries, f"{ms:.1f}"))
+
+        ms, queries = await timed(lambda: signal_service.generate_signals(db, workspace.id))
+        rows.append(("all", "", queries, f"{ms:.1f}"))
+
+    print(f"{PRODUCTS} products, {INVOICES} invoices")
+    print_table(["rule", "signals", "queries", "ms"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""Benchmark GET /api/inventory as the catalog grows.
+
+    cd backend && python -m benchmarks.bench_stock_levels
+
+The query count should stay constant for every catalog size; latency grows
+only with the size of the response itself.
+"""
+
+import asyncio
+
+from benchmarks._common import async_session, create_owner, print_table, reset_db, timed
+
+from app.models.database import Product, StockMovement, Warehouse
+from app.services import stock_service
+
+CATALOG_SIZES = [100, 500, 2000]
+WAREHOUSES = 5
+MOVEMENTS_PER_CELL = 3
+
+
+async def _seed(db, workspace_id: str, n_products: int):
+    warehouses = [Warehouse(workspace_id=workspace_id, name=f"WH-{i}") for i in range(WAREHOUSES)]
+    products = [
+        Product(workspace_id=workspace_id, name=f"Product {i:05d}", sku=f"SKU-{i:05d}", reorder_level=5)
+        for i in range(n_products)
+    ]
+    db.add_all(warehouses + products)
+    await db.flush()
+
+    movements = [
+        StockMovement(
+            workspace_id=workspace_id,
+            product_id=p.id,
+            warehouse_id=w.id,
+            type="adjustment",
+            quantity_delta=float(k + 1),
+        )
+        for p in products
+        for w in warehouses
+        for k in range(MOVEMENTS_PER_CELL)
+    ]
+    await stock_service.record_movements(db, movements)
+    await db.commit()
+
+
+async def main():
+    rows = []
+    for n_products in CATALOG_SIZES:
+        await reset_db()
+        async with async_session() as db:
+            _, workspace = await create_owner(db)
+            await _seed(db, workspace.id, n_products)
+
+            full_ms, full_q = await timed(
+                lambda: stock_service.get_stock_levels(db, workspace.id)
+            )
+            compact_ms, compact_q = await timed(
+                lambda: stock_service.get_stock_levels(db, workspace.id, compact=True)
+            )
+        rows.append((n_products, n_products * WAREHOUSES, full_q, f"{full_ms:.1f}", compact_q, f"{compact_ms:.1f}"))
+
+    print_table(["products", "rows", "queries", "full ms", "compact queries", "compact ms"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -14,10 +14,13 @@ os.environ["DEMO_MODE"] = "false"
 os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///./test.db"
 os.environ["JWT_SECRET_KEY"] = "test-jwt-secret-key"
 os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["REALTIME_BACKEND"] = "memory"
+os.environ["CHAT_SESSION_BACKEND"] = "memory"
 
 from app.auth.jwt_handler import create_access_token
 from app.models.database import Base, User, get_db
 from app.main import app
+from app.services import realtime
 
 # Test database engine
 TEST_DB_URL = "sqlite+aiosqlite:///./test.db"
@@ -107,3 +110,16 @@ async def authenticated_client(
     """Wrap the test client so all requests include auth headers."""
     client.headers.update(auth_headers)
     return client
+
+
+@pytest.fixture
+def pushed():
+    """Real-time frames published during the test, as (user_id, message)."""
+    frames = []
+
+    async def sink(user_id, message):
+        frames.append((user_id, message))
+
+    realtime.backend.subscribe(sink)
+    yield frames
+    realtime.backend.unsubscribe(sink)
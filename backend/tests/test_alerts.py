@@ -1,11 +1,17 @@
 """Tests for alerts router — creation, read/dismiss, WebSocket push."""
 
 import pytest
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
 from httpx import AsyncClient
+from starlette.websockets import WebSocketDisconnect
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.database import Alert
+from app.auth.jwt_handler import create_access_token, create_refresh_token
+from app.main import app
+from app.models.database import Alert, AlertArchive, Invoice
+from app.services import alert_service, realtime
 
 
 @pytest.fixture
@@ -74,3 +80,114 @@ class TestAlertActions:
     async def test_dismiss_alert(self, authenticated_client: AsyncClient, sample_alerts):
         resp = await authenticated_client.delete("/api/alerts/al-t3")
         assert resp.status_code in (200, 204)
+
+
+@pytest.mark.asyncio
+class TestAlertScan:
+    async def test_overdue_scan_dedupes_unread(self, db_session: AsyncSession, test_user):
+        now = datetime.utcnow()
+        db_session.add_all([
+            Invoice(
+                id=f"inv-scan-{i}", user_id=test_user.id, invoice_number=f"INV-S{i}", amount=100.0,
+                status="sent", issued_date=now - timedelta(days=40), due_date=now - timedelta(days=days),
+            )
+            for i, days in enumerate([3, 10, 20])
+        ])
+        await db_session.flush()
+
+        created = await alert_service.scan_overdue_invoices(db_session, test_user.id)
+        assert sorted((a.related_entity_id, a.severity) for a in created) == [
+            ("inv-scan-0", "info"), ("inv-scan-1", "warning"), ("inv-scan-2", "critical"),
+        ]
+        assert all(a.id and a.is_read is False for a in created)
+
+        # Unread alerts suppress repeats; once read, the invoice is alerted again
+        assert await alert_service.scan_overdue_invoices(db_session, test_user.id) == []
+        await db_session.execute(
+            update(Alert).where(Alert.related_entity_id == "inv-scan-0").values(is_read=True)
+        )
+        (again,) = await alert_service.scan_overdue_invoices(db_session, test_user.id)
+        assert again.related_entity_id == "inv-scan-0"
+
+        result = await db_session.execute(select(Alert).where(Alert.type == "overdue_invoice"))
+        assert len(result.scalars().all()) == 4
+
+
+@pytest.mark.asyncio
+class TestAlertRetention:
+    async def test_archive_moves_old_read_alerts(self, db_session: AsyncSession, test_user):
+        now = datetime.utcnow()
+        db_session.add_all([
+            Alert(id=f"al-old-{i}", user_id=test_user.id, type="reminder", title="Old", message="Old",
+                  severity="info", is_read=True, created_at=now - timedelta(days=200 + i))
+            for i in range(3)
+        ] + [
+            Alert(id="al-old-unread", user_id=test_user.id, type="reminder", title="Old", message="Old",
+                  severity="warning", is_read=False, created_at=now - timedelta(days=200)),
+            Alert(id="al-recent", user_id=test_user.id, type="reminder", title="New", message="New",
+                  severity="info", is_read=True, created_at=now - timedelta(days=5)),
+        ])
+        await db_session.flush()
+
+        cutoff = now - timedelta(days=90)
+        assert await alert_service.archive_read_alerts(db_session, cutoff, batch_size=2) == 2
+        assert await alert_service.archive_read_alerts(db_session, cutoff, batch_size=2) == 1
+        assert await alert_service.archive_read_alerts(db_session, cutoff, batch_size=2) == 0
+
+        live = (await db_session.execute(select(Alert.id))).scalars().all()
+        assert sorted(live) == ["al-old-unread", "al-recent"]
+        archived = (await db_session.execute(select(AlertArchive))).scalars().all()
+        assert sorted(a.id for a in archived) == ["al-old-0", "al-old-1", "al-old-2"]
+        assert all(a.title == "Old" and a.created_at < cutoff for a in archived)
+
+        counts = await alert_service.get_unread_counts(db_session, test_user.id)
+        assert counts == {"unread": 1, "critical": 0, "warning": 1, "info": 0}
+
+
+@pytest.mark.asyncio
+class TestAlertPush:
+    async def test_scan_pushes_alerts_and_counts_on_commit(self, db_session: AsyncSession, test_user, pushed):
+        now = datetime.utcnow()
+        db_session.add(Invoice(
+            id="inv-push", user_id=test_user.id, invoice_number="INV-P", amount=50.0, status="sent",
+            issued_date=now - timedelta(days=40), due_date=now - timedelta(days=20),
+        ))
+        await alert_service.scan_overdue_invoices(db_session, test_user.id)
+        await realtime.drain()
+        assert pushed == []  # nothing before commit
+
+        await db_session.commit()
+        await realtime.drain()
+        types = {message["type"]: message["data"] for _, message in pushed}
+        assert {user_id for user_id, _ in pushed} == {test_user.id}
+        (alert,) = types["alerts.created"]["alerts"]
+        assert alert["related_entity_id"] == "inv-push"
+        assert types["alerts.counts"] == {"unread": 1, "critical": 1, "warning": 0, "info": 0}
+
+    async def test_rollback_drops_pending(self, db_session: AsyncSession, test_user, pushed):
+        await alert_service.create_alert(db_session, test_user.id, alert_type="reminder", title="T", message="M")
+        await db_session.rollback()
+        await db_session.commit()
+        await realtime.drain()
+        assert pushed == []
+
+    async def test_mark_all_read_pushes_counts(self, db_session: AsyncSession, test_user, sample_alerts, pushed):
+        await alert_service.mark_all_read(db_session, test_user.id)
+        await db_session.commit()
+        await realtime.drain()
+        assert pushed == [(test_user.id, {
+            "type": "alerts.counts", "data": {"unread": 0, "critical": 0, "warning": 0, "info": 0},
+        })]
+
+
+class TestWebSocketAuth:
+    def test_requires_matching_access_token(self):
+        client = TestClient(app)
+        for token in ("", create_refresh_token("user-ws"), create_access_token("someone-else", "x@y.z")):
+            with pytest.raises(WebSocketDisconnect):
+                with client.websocket_connect(f"/ws/user-ws?token={token}") as ws:
+                    ws.receive_text()
+
+        with client.websocket_connect(f"/ws/user-ws?token={create_access_token('user-ws', 'a@b.c')}") as ws:
+            ws.send_text('{"hello": 1}')
+            assert ws.receive_json() == {"type": "pong", "data": {"hello": 1}}
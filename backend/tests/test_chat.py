@@ -0,0 +1,270 @@
+"""Tests for the chat assistant — endpoints, streaming and session store."""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.database import Company, Task, Workspace
+from app.routers.chat import ws_chat
+from app.services import chat_context, chat_service, chat_sessions, metrics
+from app.services.chat_context import MemoryContextCache
+from app.services.chat_sessions import MemorySessionStore
+from app.services.connections import ConnectionManager
+
+
+@pytest.fixture(autouse=True)
+def demo_replies(monkeypatch):
+    """Never call the model API from tests — replies come from the demo fallback."""
+    monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", None)
+
+
+def _turns(n: int, size: int = 10) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:04d}" + "x" * size}
+        for i in range(n)
+    ]
+
+
+@pytest.mark.asyncio
+class TestChatEndpoint:
+    async def test_history_is_kept_per_user_session(self, authenticated_client: AsyncClient, test_user):
+        resp = await authenticated_client.post("/api/chat", json={"message": "Show my overdue invoices"})
+        assert resp.status_code == 200
+        session_id = resp.json()["session_id"]
+        await authenticated_client.post("/api/chat", json={"message": "And my tasks?", "session_id": session_id})
+
+        history = await chat_sessions.store.load(chat_sessions.session_key(test_user.id, session_id))
+        assert [m["role"] for m in history] == ["user", "assistant", "user", "assistant"]
+        assert history[2]["content"] == "And my tasks?"
+        # The same session id under another user is a different session
+        assert await chat_sessions.store.load(chat_sessions.session_key("someone-else", session_id)) == []
+
+
+def _parse_sse(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+
+@pytest.mark.asyncio
+class TestChatStreaming:
+    async def test_sse_streams_deltas_then_done(self, authenticated_client: AsyncClient, test_user):
+        resp = await authenticated_client.post("/api/chat/stream", json={"message": "help"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+
+        events = _parse_sse(resp.text)
+        kinds = [kind for kind, _ in events]
+        assert kinds[0] == "start" and kinds[-1] == "done" and kinds.count("delta") > 1
+        session_id = events[0][1]["session_id"]
+        reply = "".join(data["text"] for kind, data in events if kind == "delta")
+        assert events[-1][1] == {"session_id": session_id, "reply": reply}
+
+        history = await chat_sessions.store.load(chat_sessions.session_key(test_user.id, session_id))
+        assert history == [{"role": "user", "content": "help"}, {"role": "assistant", "content": reply}]
+
+    async def test_websocket_chat_streams_frames(self, db_session: AsyncSession, test_user):
+        await db_session.commit()  # the handler reads the user in its own session
+        manager = ConnectionManager()
+        socket = RecordingSocket()
+        connection = await manager.connect(socket, test_user.id)
+
+        await ws_chat(connection, {"type": "chat", "id": 7, "message": "Any overdue invoices?"})
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        types = [frame["type"] for frame in socket.sent]
+        assert types[0] == "chat.start" and types[-1] == "chat.done" and "chat.delta" in types
+        done = socket.sent[-1]["data"]
+        assert done["id"] == 7
+        assert done["reply"] == "".join(f["data"]["text"] for f in socket.sent if f["type"] == "chat.delta")
+
+        await ws_chat(connection, {"type": "chat", "id": 8, "message": ""})
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert socket.sent[-1]["type"] == "error" and socket.sent[-1]["data"]["id"] == 8
+        manager.disconnect(socket, test_user.id)
+
+
+class FakeStream:
+    def __init__(self, texts, fail_after=None):
+        self.texts, self.fail_after = texts, fail_after
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for i, text in enumerate(self.texts):
+            if i == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield text
+
+
+@pytest.mark.asyncio
+class TestModelStreaming:
+    async def _stream(self, monkeypatch, db_session, user, fake, calls=None):
+        import anthropic
+
+        class FakeClient:
+            def __init__(self, api_key):
+                self.messages = self
+
+            def stream(self, **kwargs):
+                if calls is not None:
+                    calls.append({**kwargs, "messages": list(kwargs["messages"])})
+                return fake
+
+        monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", "test-key")
+        monkeypatch.setattr(anthropic, "AsyncAnthropic", FakeClient)
+        chunks = await chat_service.chat_stream(user, db_session, "hi", "s1")
+        return [text async for text in chunks]
+
+    async def test_tokens_are_forwarded_as_they_arrive(self, monkeypatch, db_session, test_user):
+        assert await self._stream(monkeypatch, db_session, test_user, FakeStream(["Hel", "lo"])) == ["Hel", "lo"]
+        history = await chat_sessions.store.load(chat_sessions.session_key(test_user.id, "s1"))
+        assert history[-1] == {"role": "assistant", "content": "Hello"}
+
+    async def test_full_history_is_sent_starting_with_user(self, monkeypatch, db_session, test_user):
+        await chat_sessions.store.save(chat_sessions.session_key(test_user.id, "s1"), _turns(20))
+        calls = []
+        texts = await self._stream(monkeypatch, db_session, test_user, FakeStream(["Hi"]), calls)
+        assert texts == ["Hi"]  # the model answered, not the demo fallback
+        (call,) = calls
+        assert len(call["messages"]) == 21
+        assert call["messages"][0]["role"] == "user"
+        assert call["messages"][-1] == {"role": "user", "content": "hi"}
+
+    async def test_failure_mid_stream_keeps_partial_reply(self, monkeypatch, db_session, test_user):
+        texts = await self._stream(monkeypatch, db_session, test_user, FakeStream(["Hel", "lo"], fail_after=1))
+        assert texts == ["Hel"]
+
+    async def test_failure_before_first_token_falls_back(self, monkeypatch, db_session, test_user):
+        texts = await self._stream(monkeypatch, db_session, test_user, FakeStream(["Hel"], fail_after=0))
+        assert "".join(texts) == chat_service._demo_reply("hi", "")
+
+
+@pytest.mark.asyncio
+class TestSessionStore:
+    async def test_history_is_capped_and_starts_with_user(self):
+        store = MemorySessionStore()
+        await store.save("k", _turns(25))
+        history = await store.load("k")
+        assert len(history) == chat_sessions.MAX_MESSAGES - 1  # a leading assistant turn is dropped
+        assert history[0]["role"] == "user"
+        assert history[-1]["content"].startswith("0024")
+
+    async def test_session_bytes_are_capped(self):
+        store = MemorySessionStore()
+        await store.save("k", _turns(10, size=chat_sessions.MAX_MESSAGE_CHARS * 2))
+        history = await store.load("k")
+        assert all(len(m["content"]) <= chat_sessions.MAX_MESSAGE_CHARS for m in history)
+        assert len(chat_sessions.encode(history)) <= chat_sessions.MAX_SESSION_BYTES
+        assert history[0]["role"] == "user"
+
+    async def test_least_recently_used_is_evicted(self):
+        metrics.reset()
+        store = MemorySessionStore(max_sessions=2)
+        await store.save("a", _turns(2))
+        await store.save("b", _turns(2))
+        await store.load("a")
+        await store.save("c", _turns(2))
+        assert await store.load("b") == []
+        assert await store.load("a") != []
+        assert store.stats()["sessions"] == 2
+        assert metrics.snapshot()[("lytherahub_chat_sessions_evicted_total", (("reason", "lru"),))] == 1
+
+    async def test_memory_cap_and_ttl(self):
+        store = MemorySessionStore(max_bytes=300)
+        await store.save("a", _turns(2, size=100))
+        await store.save("b", _turns(2, size=100))
+        assert await store.load("a") == []
+        assert store.stats() == {"sessions": 1, "bytes": len(chat_sessions.encode(_turns(2, size=100)))}
+
+        expiring = MemorySessionStore(ttl=0)
+        await expiring.save("a", _turns(2))
+        assert await expiring.load("a") == []
+        assert expiring.stats() == {"sessions": 0, "bytes": 0}
+
+
+@pytest.mark.asyncio
+class TestChatContext:
+    async def _settle(self):
+        # Invalidation runs as a task after the commit
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+    async def test_context_is_cached_until_a_write_commits(self, db_session: AsyncSession, test_user):
+        await self._settle()
+        metrics.reset()
+        context = await chat_service._gather_context(test_user, db_session)
+        assert "TASKS: 0 pending" in context
+        assert await chat_service._gather_context(test_user, db_session) == context
+        snapshot = metrics.snapshot()
+        assert snapshot[("lytherahub_chat_context_total", (("result", "miss"),))] == 1
+        assert snapshot[("lytherahub_chat_context_total", (("result", "hit"),))] == 1
+
+        db_session.add(Task(user_id=test_user.id, title="Call back"))
+        await db_session.flush()
+        assert await chat_service._gather_context(test_user, db_session) == context  # not committed yet
+        await db_session.commit()
+        await self._settle()
+        assert "TASKS: 1 pending" in await chat_service._gather_context(test_user, db_session)
+
+    async def test_rollback_keeps_the_cached_context(self, db_session: AsyncSession, test_user):
+        await self._settle()
+        user_id = test_user.id
+        context = await chat_service._gather_context(test_user, db_session)
+        db_session.add(Task(user_id=user_id, title="Never saved"))
+        await db_session.flush()
+        await db_session.rollback()
+        await self._settle()
+        assert await chat_context.cache.get(user_id) == context
+
+    async def test_client_change_invalidates_the_workspace_owner(self, db_session: AsyncSession, test_user):
+        workspace = Workspace(name="Acme", owner_id=test_user.id)
+        db_session.add(workspace)
+        await db_session.commit()
+        await self._settle()
+        assert "CLIENTS: 0 total" in await chat_service._gather_context(test_user, db_session)
+
+        db_session.add(Company(workspace_id=workspace.id, company_name="Globex", deal_value=5000))
+        await db_session.commit()
+        await self._settle()
+        context = await chat_service._gather_context(test_user, db_session)
+        assert "CLIENTS: 1 total" in context and "Globex" in context
+
+    async def test_memory_cache_expires_and_evicts(self):
+        cache = MemoryContextCache(max_entries=2)
+        await cache.set("a", "A")
+        await cache.set("b", "B")
+        await cache.get("a")
+        await cache.set("c", "C")
+        assert [await cache.get(k) for k in "abc"] == ["A", None, "C"]
+
+        expiring = MemoryContextCache(ttl=0)
+        await expiring.set("a", "A")
+        assert await expiring.get("a") is None
@@ -3,6 +3,8 @@
 import pytest
 from httpx import AsyncClient
 
+from app.config import settings
+
 
 @pytest.mark.asyncio
 class TestHealth:
@@ -19,3 +21,16 @@ class TestHealth:
         assert resp.status_code == 200
         data = resp.json()
         assert data["info"]["title"] == "LytheraHub AI"
+
+    async def test_metrics_requires_token(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-me")
+        assert (await client.get("/metrics")).status_code == 401
+
+        resp = await client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+
+    async def test_metrics_hidden_without_token(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+        monkeypatch.setattr(settings, "DEBUG", False)
+        assert (await client.get("/metrics")).status_code == 404
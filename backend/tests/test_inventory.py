@@ -0,0 +1,531 @@
+"""Tests for inventory — stock ledger, materialized balances, order movements."""
+
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import SignalDirtyMark, StockBalance, StockCheckpoint, StockDailyRollup, StockMovement
+from app.models.schemas import StockAdjustmentRequest
+from app.services import forecast_service, realtime, stock_service, valuation_service
+
+
+@pytest.fixture
+async def stock_setup(authenticated_client: AsyncClient):
+    """Create a warehouse and a tracked product through the API."""
+    wh = await authenticated_client.post("/api/warehouses", json={"name": "Main", "is_default": True})
+    assert wh.status_code == 201
+    product = await authenticated_client.post(
+        "/api/products", json={"name": "Widget", "sku": "W-1", "reorder_level": 5}
+    )
+    assert product.status_code == 201
+    return {
+        "workspace_id": product.json()["workspace_id"],
+        "warehouse_id": wh.json()["id"],
+        "product_id": product.json()["id"],
+    }
+
+
+async def _adjust(client: AsyncClient, setup: dict, qty: float):
+    resp = await client.post("/api/inventory/adjustment", json={
+        "product_id": setup["product_id"],
+        "warehouse_id": setup["warehouse_id"],
+        "quantity_delta": qty,
+    })
+    assert resp.status_code == 201
+    return resp.json()
+
+
+@pytest.mark.asyncio
+class TestStockBalances:
+    async def test_adjustment_updates_balance(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        await _adjust(authenticated_client, stock_setup, 20)
+        await _adjust(authenticated_client, stock_setup, -3)
+
+        on_hand = await stock_service.get_on_hand(
+            db_session, stock_setup["workspace_id"], stock_setup["product_id"]
+        )
+        assert on_hand == 17
+
+        resp = await authenticated_client.get(f"/api/products/{stock_setup['product_id']}/stock")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["on_hand"] == 17
+        assert data["by_warehouse"][0]["on_hand"] == 17
+
+    async def test_one_balance_row_per_key(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        for _ in range(3):
+            await _adjust(authenticated_client, stock_setup, 1)
+        rows = (await db_session.execute(select(StockBalance))).scalars().all()
+        assert len(rows) == 1
+        assert rows[0].on_hand == 3
+
+    async def test_fulfill_and_receive_update_balance(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        pid, wid = stock_setup["product_id"], stock_setup["warehouse_id"]
+
+        po = await authenticated_client.post("/api/purchase-orders", json={
+            "items": [{"product_id": pid, "quantity_ordered": 10, "unit_cost": 2.5}],
+        })
+        po_id = po.json()["id"]
+        po_item_id = po.json()["items"][0]["id"]
+        await authenticated_client.post(f"/api/purchase-orders/{po_id}/send")
+        resp = await authenticated_client.post(f"/api/purchase-orders/{po_id}/receive", json={
+            "warehouse_id": wid, "items": [{"item_id": po_item_id, "quantity_received": 10}],
+        })
+        assert resp.status_code == 200
+
+        so = await authenticated_client.post("/api/sales-orders", json={
+            "items": [{"product_id": pid, "quantity": 4, "unit_price": 9}],
+        })
+        so_id = so.json()["id"]
+        await authenticated_client.post(f"/api/sales-orders/{so_id}/confirm")
+        resp = await authenticated_client.post(f"/api/sales-orders/{so_id}/fulfill", json={"warehouse_id": wid})
+        assert resp.status_code == 200
+
+        assert await stock_service.get_on_hand(db_session, stock_setup["workspace_id"], pid, wid) == 6
+
+    async def test_verify_and_rebuild(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id = stock_setup["workspace_id"]
+        await _adjust(authenticated_client, stock_setup, 12)
+        assert await stock_service.verify_balances(db_session, ws_id) == []
+
+        await db_session.execute(update(StockBalance).values(on_hand=99))
+        drift = await stock_service.verify_balances(db_session, ws_id)
+        assert len(drift) == 1
+        assert drift[0]["ledger"] == 12
+        assert drift[0]["balance"] == 99
+
+        assert await stock_service.rebuild_balances(db_session, ws_id) == 1
+        assert await stock_service.verify_balances(db_session, ws_id) == []
+
+    async def test_backfill_missing_balances(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id = stock_setup["workspace_id"]
+        await _adjust(authenticated_client, stock_setup, 7)
+        # Simulate a deployment upgraded from before the balance table existed
+        await db_session.execute(delete(StockBalance))
+
+        assert await stock_service.backfill_missing_balances(db_session) == {ws_id: 1}
+        assert await stock_service.get_on_hand(db_session, ws_id, stock_setup["product_id"]) == 7
+        assert await stock_service.backfill_missing_balances(db_session) == {}
+
+
+@pytest.mark.asyncio
+class TestStockLevels:
+    async def test_stock_levels(self, authenticated_client: AsyncClient, stock_setup):
+        await _adjust(authenticated_client, stock_setup, 3)
+        resp = await authenticated_client.get("/api/inventory")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert len(data) == 1
+        assert data[0]["on_hand"] == 3
+        assert data[0]["is_low_stock"] is True
+
+    async def test_stock_levels_for_products(self, authenticated_client: AsyncClient, stock_setup):
+        other = await authenticated_client.post("/api/products", json={"name": "Gadget", "sku": "G-1"})
+        await _adjust(authenticated_client, stock_setup, 3)
+
+        resp = await authenticated_client.get("/api/inventory", params={"product_ids": stock_setup["product_id"]})
+        assert [row["product_id"] for row in resp.json()] == [stock_setup["product_id"]]
+        resp = await authenticated_client.get(
+            "/api/inventory", params={"product_ids": f"{stock_setup['product_id']},{other.json()['id']}"}
+        )
+        assert len(resp.json()) == 2
+
+    async def test_stock_levels_compact(self, authenticated_client: AsyncClient, stock_setup):
+        await _adjust(authenticated_client, stock_setup, 8)
+        resp = await authenticated_client.get("/api/inventory?compact=true")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["product_ids"] == [stock_setup["product_id"]]
+        assert data["warehouse_ids"] == [stock_setup["warehouse_id"]]
+        assert data["on_hand"] == [8]
+        assert data["available"] == [8]
+
+
+@pytest.mark.asyncio
+class TestStockAsOf:
+    async def test_as_of_uses_checkpoint_plus_tail(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        base = datetime(2026, 1, 1)
+        for day, qty in ((1, 10), (5, -2), (20, 7), (40, -1)):
+            await stock_service.record_movement(db_session, StockMovement(
+                workspace_id=ws_id, product_id=pid, warehouse_id=wid, type="adjustment",
+                quantity_delta=qty, created_at=base + timedelta(days=day),
+            ))
+
+        checkpoint = await stock_service.create_checkpoint(db_session, ws_id, base + timedelta(days=10))
+        assert checkpoint.line_count == 1
+        # Same cutoff twice is a no-op
+        assert await stock_service.create_checkpoint(db_session, ws_id, base + timedelta(days=10)) is None
+
+        checkpoint_at, qty = await stock_service.get_stock_as_of(db_session, ws_id, base + timedelta(days=3))
+        assert checkpoint_at is None
+        assert qty == {(pid, wid): 10}
+
+        checkpoint_at, qty = await stock_service.get_stock_as_of(db_session, ws_id, base + timedelta(days=30))
+        assert checkpoint_at == base + timedelta(days=10)
+        assert qty == {(pid, wid): 15}
+
+        resp = await authenticated_client.get("/api/inventory/as-of", params={"at": "2026-03-01T00:00:00Z"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["levels"][0]["on_hand"] == 14
+        assert data["levels"][0]["product_name"] == "Widget"
+
+    async def test_prune_keeps_month_starts_and_latest(self, stock_setup, db_session: AsyncSession):
+        ws_id = stock_setup["workspace_id"]
+        for taken_at in (datetime(2026, 1, 1), datetime(2026, 1, 2), datetime(2026, 3, 20), datetime(2026, 3, 21)):
+            await stock_service.create_checkpoint(db_session, ws_id, taken_at)
+
+        assert await stock_service.prune_checkpoints(db_session, ws_id, now=datetime(2026, 3, 22)) == 1
+        remaining = (await db_session.execute(
+            select(StockCheckpoint.taken_at).order_by(StockCheckpoint.taken_at)
+        )).scalars().all()
+        assert remaining == [datetime(2026, 1, 1), datetime(2026, 3, 20), datetime(2026, 3, 21)]
+
+
+@pytest.mark.asyncio
+class TestBulkAdjustments:
+    async def test_bulk_json(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        pid, wid = stock_setup["product_id"], stock_setup["warehouse_id"]
+        rows = [
+            {"product_id": pid, "warehouse_id": wid, "quantity_delta": 5},
+            {"product_id": "nope", "warehouse_id": wid, "quantity_delta": 1},
+            {"product_id": pid, "warehouse_id": wid, "quantity_delta": -2},
+        ]
+        resp = await authenticated_client.post("/api/inventory/adjustments/bulk", json={"rows": rows})
+        assert resp.status_code == 201
+        data = resp.json()
+        assert data["created"] == 2
+        assert data["failed"] == 1
+        assert data["movement_ids"][1] is None
+        assert data["errors"] == [{"row": 1, "detail": "Product not found"}]
+        assert await stock_service.get_on_hand(db_session, stock_setup["workspace_id"], pid) == 3
+
+    async def test_bulk_ndjson(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        pid, wid = stock_setup["product_id"], stock_setup["warehouse_id"]
+        lines = [json.dumps({"product_id": pid, "warehouse_id": wid, "quantity_delta": 1}) for _ in range(5)]
+        lines.insert(2, '{"product_id": "broken"')
+        resp = await authenticated_client.post(
+            "/api/inventory/adjustments/bulk",
+            content="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert resp.status_code == 201
+        data = resp.json()
+        assert data["created"] == 5
+        assert [e["row"] for e in data["errors"]] == [2]
+        assert await stock_service.get_on_hand(db_session, stock_setup["workspace_id"], pid) == 5
+
+    async def test_bulk_ndjson_oversized_line(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        pid, wid = stock_setup["product_id"], stock_setup["warehouse_id"]
+        row = json.dumps({"product_id": pid, "warehouse_id": wid, "quantity_delta": 1})
+        body = "\n".join([row, '{"notes": "' + "x" * (200 * 1024) + '"}', row]) + "\n"
+        resp = await authenticated_client.post(
+            "/api/inventory/adjustments/bulk", content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert resp.status_code == 201
+        data = resp.json()
+        assert data["created"] == 2
+        assert data["errors"] == [{"row": 1, "detail": "Line too long"}]
+        assert await stock_service.get_on_hand(db_session, stock_setup["workspace_id"], pid) == 2
+
+    async def test_bulk_body_documented(self, authenticated_client: AsyncClient):
+        schema = (await authenticated_client.get("/openapi.json")).json()
+        body = schema["paths"]["/api/inventory/adjustments/bulk"]["post"]["requestBody"]["content"]
+        assert "rows" in body["application/json"]["schema"]["properties"]
+        assert "application/x-ndjson" in body
+
+    async def test_bulk_json_validation_error(self, authenticated_client: AsyncClient, stock_setup):
+        resp = await authenticated_client.post("/api/inventory/adjustments/bulk", json={"rows": [{"product_id": "x"}]})
+        assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+class TestValuation:
+    async def test_fifo_and_average_incremental(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        await authenticated_client.put(f"/api/products/{pid}", json={"cost_price": 5, "category": "Parts"})
+        po = await authenticated_client.post("/api/purchase-orders", json={
+            "items": [{"product_id": pid, "quantity_ordered": 10, "unit_cost": 8}],
+        })
+
+        base = datetime(2026, 1, 1)
+        for day, qty, kind, ref in ((1, 10, "adjustment", None), (2, 10, "purchase", po.json()["id"]), (3, -15, "sale", None)):
+            await stock_service.record_movement(db_session, StockMovement(
+                workspace_id=ws_id, product_id=pid, warehouse_id=wid, type=kind,
+                quantity_delta=qty, reference_id=ref, created_at=base + timedelta(days=day),
+            ))
+
+        # 10 @ 5 (product cost) + 10 @ 8 (PO cost), issue 15
+        assert await valuation_service.refresh_valuation(db_session, ws_id) == 3
+        assert await valuation_service.refresh_valuation(db_session, ws_id) == 0
+        fifo = await valuation_service.get_valuation(db_session, ws_id, "fifo")
+        assert fifo["by_warehouse"][wid] == (5, 40)
+        average = await valuation_service.get_valuation(db_session, ws_id, "average")
+        assert average["by_category"]["Parts"] == (5, 32.5)
+
+        # A fresh movement is still inside the lag window and is overlaid in memory
+        await _adjust(authenticated_client, stock_setup, 5)
+        resp = await authenticated_client.get("/api/inventory/valuation")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total_value"] == 72.5
+        assert data["by_warehouse"][0]["warehouse_name"] == "Main"
+        assert data["by_warehouse"][0]["quantity"] == 10
+
+        resp = await authenticated_client.get("/api/inventory/valuation", params={"method": "average"})
+        assert resp.json()["by_category"] == [{"category": "Parts", "quantity": 10, "value": 65}]
+
+    async def test_paging_through_one_timestamp(self, stock_setup, db_session: AsyncSession, monkeypatch):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        # A stocktake writes many rows with the same CURRENT_TIMESTAMP; none may be skipped between pages
+        rows = [StockAdjustmentRequest(product_id=pid, warehouse_id=wid, quantity_delta=1) for _ in range(5)]
+        await stock_service.bulk_adjust(db_session, ws_id, None, rows)
+        monkeypatch.setattr(valuation_service, "MOVEMENT_PAGE_SIZE", 2)
+        later = datetime.utcnow() + timedelta(hours=1)
+        assert await valuation_service.refresh_valuation(db_session, ws_id, now=later) == 5
+
+    async def test_replay_picks_up_backdated_movements(self, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+
+        def movement(day: int, qty: float) -> StockMovement:
+            return StockMovement(workspace_id=ws_id, product_id=pid, warehouse_id=wid, type="adjustment",
+                                 quantity_delta=qty, created_at=datetime(2026, 1, day))
+
+        await stock_service.record_movement(db_session, movement(1, 4))
+        assert await valuation_service.refresh_valuation(db_session, ws_id) == 1
+
+        # Lands behind the cursor — a forward refresh never sees it
+        await stock_service.record_movement(db_session, movement(2, 6))
+        assert await valuation_service.refresh_valuation(db_session, ws_id) == 0
+        assert (await valuation_service.get_valuation(db_session, ws_id))["by_warehouse"][wid][0] == 4
+
+        assert await valuation_service.replay_valuation(db_session, ws_id) == 2
+        assert (await valuation_service.get_valuation(db_session, ws_id))["by_warehouse"][wid][0] == 10
+
+    async def test_issue_beyond_stock_leaves_deficit_layer(self):
+        position = valuation_service._new_position()
+        valuation_service._apply_movement(position, -4, None, 3.0)
+        valuation_service._apply_movement(position, 10, 5.0, 3.0)
+        assert position["fifo"] == [[6, 5.0]]
+        assert valuation_service._position_totals(position, "average") == (6, 30)
+
+
+@pytest.mark.asyncio
+class TestLedger:
+    async def test_keyset_pages_and_names(self, authenticated_client: AsyncClient, stock_setup):
+        for qty in (1, 2, 3, 4, 5):
+            await _adjust(authenticated_client, stock_setup, qty)
+
+        # All five share one CURRENT_TIMESTAMP second — the id tie-break must advance
+        seen, cursor = [], None
+        for _ in range(5):  # bounded so a stuck cursor fails instead of hanging
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            resp = await authenticated_client.get("/api/inventory/ledger", params=params)
+            assert resp.status_code == 200
+            page = resp.json()
+            seen += page["items"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        assert cursor is None
+        assert len(seen) == 5
+        assert len({m["id"] for m in seen}) == 5
+        assert seen[0]["product_name"] == "Widget"
+        assert seen[0]["warehouse_name"] == "Main"
+
+        resp = await authenticated_client.get("/api/inventory/ledger", params={"cursor": "not-a-cursor"})
+        assert resp.status_code == 400
+
+    async def test_filters_and_product_history(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        for day, ref in ((1, "A"), (2, "B"), (9, "A")):
+            await stock_service.record_movement(db_session, StockMovement(
+                workspace_id=ws_id, product_id=pid, warehouse_id=wid, type="adjustment",
+                quantity_delta=1, reference_type="manual", reference_id=ref,
+                created_at=datetime(2026, 1, day),
+            ))
+
+        resp = await authenticated_client.get("/api/inventory/movements", params={
+            "reference_id": "A", "date_from": "2026-01-01T00:00:00", "date_to": "2026-01-05T00:00:00",
+        })
+        assert resp.json()["total"] == 1
+        assert resp.json()["items"][0]["product_name"] == "Widget"
+
+        resp = await authenticated_client.get(f"/api/inventory/movements/{pid}", params={"limit": 2})
+        assert [m["reference_id"] for m in resp.json()] == ["A", "B"]
+
+        resp = await authenticated_client.get("/api/inventory/ledger", params={"product_id": pid, "limit": 2})
+        assert resp.json()["next_cursor"]
+
+    async def test_buckets(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        # Mon 5th and Wed 7th share an ISO week; Mon 12th starts the next one
+        for day, qty in ((5, 10), (5, -3), (7, -2), (12, 4)):
+            await stock_service.record_movement(db_session, StockMovement(
+                workspace_id=ws_id, product_id=pid, warehouse_id=wid, type="adjustment",
+                quantity_delta=qty, created_at=datetime(2026, 1, day, 15, 30),
+            ))
+
+        resp = await authenticated_client.get("/api/inventory/ledger/buckets", params={"product_id": pid})
+        days = {b["bucket_start"]: b for b in resp.json()}
+        assert days["2026-01-05"]["quantity_in"] == 10
+        assert days["2026-01-05"]["quantity_out"] == 3
+        assert days["2026-01-05"]["movement_count"] == 2
+
+        resp = await authenticated_client.get("/api/inventory/ledger/buckets", params={"bucket": "week"})
+        weeks = [(b["bucket_start"], b["net_change"]) for b in resp.json()]
+        assert weeks == [("2026-01-12", 4), ("2026-01-05", 5)]
+
+
+@pytest.mark.asyncio
+class TestDailyRollup:
+    async def test_orders_feed_rollup_and_series(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        po = (await authenticated_client.post("/api/purchase-orders", json={
+            "items": [{"product_id": pid, "quantity_ordered": 10, "unit_cost": 2}],
+        })).json()
+        await authenticated_client.post(f"/api/purchase-orders/{po['id']}/send")
+        await authenticated_client.post(f"/api/purchase-orders/{po['id']}/receive", json={
+            "warehouse_id": wid, "items": [{"item_id": po["items"][0]["id"], "quantity_received": 10}],
+        })
+        so = (await authenticated_client.post("/api/sales-orders", json={
+            "items": [{"product_id": pid, "quantity": 4, "unit_price": 9}],
+        })).json()
+        await authenticated_client.post(f"/api/sales-orders/{so['id']}/confirm")
+        await authenticated_client.post(f"/api/sales-orders/{so['id']}/fulfill", json={"warehouse_id": wid})
+        await _adjust(authenticated_client, stock_setup, 3)  # adjustments are not sales or receipts
+
+        resp = await authenticated_client.get("/api/inventory/daily", params={"product_ids": f"{pid},missing"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert len(data["days"]) == 30
+        assert [s["product_id"] for s in data["series"]] == [pid]
+        assert data["series"][0]["units_sold"][-1] == 4
+        assert data["series"][0]["units_received"][-1] == 10
+        assert sum(data["series"][0]["units_sold"]) == 4
+
+        # The backfill reproduces the incrementally maintained rows
+        before = (await db_session.execute(
+            select(StockDailyRollup.units_sold, StockDailyRollup.units_received)
+        )).all()
+        assert await stock_service.rebuild_daily_rollups(db_session, ws_id) == 1
+        after = (await db_session.execute(
+            select(StockDailyRollup.units_sold, StockDailyRollup.units_received)
+        )).all()
+        assert before == after == [(4, 10)]
+
+    async def test_range_limits(self, authenticated_client: AsyncClient, stock_setup):
+        resp = await authenticated_client.get("/api/inventory/daily", params={
+            "date_from": "2024-01-01", "date_to": "2026-01-01",
+        })
+        assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+class TestDemandForecast:
+    async def test_forecast_matrix(self):
+        sales = np.array([[4.0] * 10, [0.0] * 10, [10, 0] * 5, [0.0] * 6 + [3.0] * 4])
+        stats = forecast_service.forecast_matrix(sales, np.array([5.0, 5.0, 4.0, 5.0]), z=2.0)
+        assert stats["daily_demand"][0] == pytest.approx(4.0)
+        assert stats["reorder_point"][0] == pytest.approx(20.0)  # steady demand: no safety stock
+        assert stats["reorder_point"][1] == 0
+        expected_safety = 2.0 * sales[2].std(ddof=1) * 2.0
+        assert stats["safety_stock"][2] == pytest.approx(expected_safety)
+        assert stats["reorder_point"][2] == pytest.approx(stats["daily_demand"][2] * 4 + expected_safety)
+        assert stats["reorder_point"][3] == pytest.approx(15.0)  # days before the first sale are ignored
+
+    async def test_forecast_drives_low_stock(self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession):
+        ws_id, pid, wid = stock_setup["workspace_id"], stock_setup["product_id"], stock_setup["warehouse_id"]
+        await _adjust(authenticated_client, stock_setup, 20)  # above the static level of 5
+
+        resp = await authenticated_client.get("/api/products/low-stock")
+        assert resp.json() == []
+
+        as_of = date(2026, 3, 31)
+        for offset in range(30):
+            db_session.add(StockDailyRollup(
+                workspace_id=ws_id, product_id=pid, warehouse_id=wid,
+                day=as_of - timedelta(days=offset), units_sold=4, units_received=0,
+            ))
+        await db_session.flush()
+        assert await forecast_service.run_forecast(db_session, ws_id, as_of=as_of) == 1
+        await db_session.commit()
+
+        resp = await authenticated_client.get("/api/inventory/forecasts")
+        assert resp.status_code == 200
+        (forecast,) = resp.json()
+        assert forecast["history_days"] == 30
+        assert forecast["lead_time_days"] == forecast_service.DEFAULT_LEAD_TIME_DAYS
+        assert forecast["reorder_point"] == pytest.approx(28.0)
+
+        resp = await authenticated_client.get("/api/products/low-stock")
+        assert [p["id"] for p in resp.json()] == [pid]
+
+
+@pytest.mark.asyncio
+class TestReplenishment:
+    async def test_plan_and_draft_orders(
+        self, authenticated_client: AsyncClient, stock_setup, db_session: AsyncSession, pushed
+    ):
+        pid = stock_setup["product_id"]
+        supplier = await authenticated_client.post(
+            "/api/companies", json={"company_name": "Acme Parts", "company_type": "supplier"}
+        )
+        supplier_id = supplier.json()["id"]
+        orphan = await authenticated_client.post("/api/products", json={"name": "Gadget", "reorder_level": 3})
+
+        # A received PO makes Acme the preferred supplier at 2.5/unit
+        po = await authenticated_client.post("/api/purchase-orders", json={
+            "supplier_id": supplier_id,
+            "items": [{"product_id": pid, "quantity_ordered": 2, "unit_cost": 2.5}],
+        })
+        await authenticated_client.post(f"/api/purchase-orders/{po.json()['id']}/send")
+        await authenticated_client.post(f"/api/purchase-orders/{po.json()['id']}/receive", json={
+            "warehouse_id": stock_setup["warehouse_id"],
+            "items": [{"item_id": po.json()["items"][0]["id"], "quantity_received": 2}],
+        })
+
+        resp = await authenticated_client.get("/api/purchase-orders/replenishment")
+        assert resp.status_code == 200
+        plan = resp.json()
+        (group,) = plan["suppliers"]
+        assert group["supplier_name"] == "Acme Parts"
+        (line,) = group["lines"]
+        assert line["product_id"] == pid
+        assert line["net_position"] == 2
+        assert line["quantity"] == 3
+        assert line["unit_cost"] == 2.5
+        assert [l["product_id"] for l in plan["unassigned"]] == [orphan.json()["id"]]
+
+        resp = await authenticated_client.post("/api/purchase-orders/replenishment")
+        assert resp.status_code == 201
+        (order_id,) = resp.json()["order_ids"]
+        order = (await authenticated_client.get(f"/api/purchase-orders/{order_id}")).json()
+        assert order["status"] == "draft"
+        assert order["supplier_id"] == supplier_id
+        assert order["total_amount"] == 7.5
+
+        # Drafts raise the same event as a hand-made PO: late-delivery check and change feed
+        marks = (await db_session.execute(
+            select(SignalDirtyMark.entity_id).where(SignalDirtyMark.signal_type == "late_delivery")
+        )).scalars().all()
+        assert order_id in marks
+        await db_session.commit()
+        await realtime.drain()
+        created = [
+            e["id"] for _, m in pushed if m["type"] == "changes" and m["topic"] == "purchase_orders"
+            for e in m["data"] if e["op"] == "created"
+        ]
+        assert order_id in created
+
+        # The draft counts as on order, so nothing is left to plan for Acme
+        resp = await authenticated_client.get("/api/purchase-orders/replenishment")
+        assert resp.json()["suppliers"] == []
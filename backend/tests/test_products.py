@@ -0,0 +1,58 @@
+"""Tests for products router — catalog CRUD with batched stock figures."""
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import stock_service
+
+
+@pytest.fixture
+async def catalog(authenticated_client: AsyncClient):
+    """Two products in one warehouse: one well stocked, one below reorder level."""
+    wh = (await authenticated_client.post("/api/warehouses", json={"name": "Main"})).json()
+    stocked = (await authenticated_client.post("/api/products", json={"name": "Alpha", "reorder_level": 5})).json()
+    low = (await authenticated_client.post("/api/products", json={"name": "Beta", "reorder_level": 5})).json()
+
+    for product, qty in ((stocked, 50), (low, 2)):
+        resp = await authenticated_client.post("/api/inventory/adjustment", json={
+            "product_id": product["id"], "warehouse_id": wh["id"], "quantity_delta": qty,
+        })
+        assert resp.status_code == 201
+
+    # Reserve 10 units of Alpha with a confirmed sales order
+    so = await authenticated_client.post("/api/sales-orders", json={
+        "items": [{"product_id": stocked["id"], "quantity": 10, "unit_price": 1}],
+    })
+    await authenticated_client.post(f"/api/sales-orders/{so.json()['id']}/confirm")
+    return {"workspace_id": stocked["workspace_id"], "stocked": stocked["id"], "low": low["id"]}
+
+
+@pytest.mark.asyncio
+class TestProductStock:
+    async def test_list_products_includes_stock(self, authenticated_client: AsyncClient, catalog):
+        resp = await authenticated_client.get("/api/products")
+        assert resp.status_code == 200
+        items = {p["name"]: p for p in resp.json()["items"]}
+        assert items["Alpha"]["stock_on_hand"] == 50
+        assert items["Alpha"]["stock_available"] == 40
+        assert items["Beta"]["stock_on_hand"] == 2
+
+    async def test_low_stock(self, authenticated_client: AsyncClient, catalog):
+        resp = await authenticated_client.get("/api/products/low-stock")
+        assert resp.status_code == 200
+        assert [p["id"] for p in resp.json()] == [catalog["low"]]
+
+    async def test_update_product_returns_stock(self, authenticated_client: AsyncClient, catalog):
+        resp = await authenticated_client.put(f"/api/products/{catalog['stocked']}", json={"name": "Alpha 2"})
+        assert resp.status_code == 200
+        assert resp.json()["name"] == "Alpha 2"
+        assert resp.json()["stock_available"] == 40
+
+    async def test_batch_totals(self, catalog, db_session: AsyncSession):
+        totals = await stock_service.get_stock_totals(
+            db_session, catalog["workspace_id"], [catalog["stocked"], catalog["low"], "missing"]
+        )
+        assert totals[catalog["stocked"]] == {"on_hand": 50, "reserved": 10, "available": 40}
+        assert totals[catalog["low"]]["reserved"] == 0
+        assert totals["missing"] == {"on_hand": 0.0, "reserved": 0.0, "available": 0.0}
@@ -0,0 +1,250 @@
+"""Tests for real-time delivery — broadcast backends, send queues and connection liveness."""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import connections, metrics, realtime
+from app.services.connections import ConnectionManager
+
+
+class FakeSocket:
+    """Records frames; ``stalled`` sockets never finish a send. Feed client frames with :meth:`say`."""
+
+    def __init__(self, stalled: bool = False):
+        self.stalled = stalled
+        self.sent = []
+        self.closed_with = None
+        self.inbox: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(text if text in ("ping", "pong") else json.loads(text))
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    def say(self, text):
+        self.inbox.put_nowait({"type": "websocket.receive", "text": text})
+
+    def leave(self):
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+class TestSendQueues:
+    async def test_stalled_socket_does_not_block_others(self):
+        manager = ConnectionManager()
+        slow, fast = FakeSocket(stalled=True), FakeSocket()
+        await manager.connect(slow, "u1")
+        await manager.connect(fast, "u1")
+
+        assert await asyncio.wait_for(manager.broadcast_to_user("u1", {"type": "ping"}), 0.1) == 2
+        await _settle()
+        assert fast.sent == [{"type": "ping"}]
+        assert slow.sent == []
+        manager.disconnect(slow, "u1")
+        manager.disconnect(fast, "u1")
+        assert manager.connection_count() == 0
+
+    async def test_overflow_closes_slow_consumer(self, monkeypatch):
+        monkeypatch.setattr(connections, "SEND_QUEUE_SIZE", 2)
+        metrics.reset()
+        manager = ConnectionManager()
+        slow = FakeSocket(stalled=True)
+        await manager.connect(slow, "u1")
+
+        for i in range(3):  # one in flight, two queued
+            await manager.broadcast_to_user("u1", {"n": i})
+            await _settle()
+        assert await manager.broadcast_to_user("u1", {"n": 3}) == 0
+        await _settle()
+
+        assert slow.closed_with == connections.SLOW_CONSUMER_CLOSE
+        assert manager.connection_count() == 0
+        values = metrics.snapshot()
+        assert values[("lytherahub_ws_messages_dropped_total", (("reason", "overflow"),))] == 1
+        assert values[("lytherahub_ws_slow_consumers_closed_total", (("reason", "overflow"),))] == 1
+
+    async def test_send_timeout_closes_socket(self, monkeypatch):
+        monkeypatch.setattr(connections, "SEND_TIMEOUT", 0.01)
+        manager = ConnectionManager()
+        slow = FakeSocket(stalled=True)
+        await manager.connect(slow, "u1")
+        await manager.broadcast_to_user("u1", {"type": "ping"})
+        await asyncio.sleep(0.05)
+        assert slow.closed_with == connections.SLOW_CONSUMER_CLOSE
+
+
+@pytest.mark.asyncio
+class TestLiveness:
+    async def test_ping_is_answered_without_json(self):
+        manager = ConnectionManager()
+        socket = FakeSocket()
+        connection = await manager.connect(socket, "u1")
+        serving = asyncio.create_task(connection.serve())
+
+        socket.say("ping")
+        socket.say("not json")  # ignored rather than killing the socket
+        socket.say('{"hello": 1}')
+        socket.leave()
+        await asyncio.wait_for(serving, 1)
+        await _settle()
+
+        assert socket.sent == ["pong", {"type": "pong", "data": {"hello": 1}}]
+        assert socket.closed_with is None
+
+    async def test_quiet_socket_is_pinged_then_reaped(self, monkeypatch):
+        monkeypatch.setattr(connections, "HEARTBEAT_INTERVAL", 0.01)
+        monkeypatch.setattr(connections, "IDLE_TIMEOUT", 0.05)
+        metrics.reset()
+        manager = ConnectionManager()
+        socket = FakeSocket()
+        connection = await manager.connect(socket, "u1")
+
+        await asyncio.wait_for(connection.serve(), 1)
+        await _settle()
+
+        assert {"type": "ping"} in socket.sent
+        assert socket.closed_with == connections.IDLE_CLOSE
+        values = metrics.snapshot()
+        assert values[("lytherahub_ws_connections_closed_total", (("reason", "idle"),))] == 1
+
+    async def test_pong_keeps_socket_alive(self, monkeypatch):
+        monkeypatch.setattr(connections, "HEARTBEAT_INTERVAL", 0.01)
+        monkeypatch.setattr(connections, "IDLE_TIMEOUT", 0.05)
+        manager = ConnectionManager()
+        socket = FakeSocket()
+        connection = await manager.connect(socket, "u1")
+        serving = asyncio.create_task(connection.serve())
+
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            socket.say("pong")
+        assert not serving.done()
+        socket.leave()
+        await asyncio.wait_for(serving, 1)
+        assert socket.closed_with is None
+
+    async def test_connection_limit_closes_oldest(self, monkeypatch):
+        monkeypatch.setattr(connections, "MAX_CONNECTIONS_PER_USER", 2)
+        manager = ConnectionManager()
+        sockets = [FakeSocket() for _ in range(3)]
+        for socket in sockets:
+            await manager.connect(socket, "u1")
+        await manager.connect(FakeSocket(), "u2")
+        await _settle()
+
+        assert sockets[0].closed_with == connections.LIMIT_CLOSE
+        assert list(manager.active_connections["u1"]) == sockets[1:]
+        assert manager.connection_count() == 3
+        assert manager.user_count() == 2
+
+
+def _change(entity_id, op, version, entity="deal"):
+    return {"entity": entity, "id": entity_id, "op": op, "version": version}
+
+
+@pytest.mark.asyncio
+class TestChangeTopics:
+    async def test_only_subscribed_sockets_get_changes(self, monkeypatch):
+        monkeypatch.setattr(connections, "COALESCE_WINDOW", 0.01)
+        manager = ConnectionManager()
+        deals, other = FakeSocket(), FakeSocket()
+        connection = await manager.connect(deals, "u1")
+        await manager.connect(other, "u1")
+        serving = asyncio.create_task(connection.serve())
+        deals.say('{"type": "subscribe", "topics": ["deals"]}')
+        await _settle()
+
+        message = {"type": "changes", "topic": "deals", "data": [_change("d1", "updated", 1)]}
+        assert await manager.broadcast_to_user("u1", message) == 1
+        await asyncio.sleep(0.03)
+
+        assert deals.sent == [
+            {"type": "subscribed", "data": {"topics": ["deals"]}},
+            {"type": "changes", "data": {"deals": [_change("d1", "updated", 1)]}},
+        ]
+        assert other.sent == []
+        deals.leave()
+        await serving
+
+    async def test_events_in_window_coalesce_to_one_frame(self, monkeypatch):
+        monkeypatch.setattr(connections, "COALESCE_WINDOW", 0.02)
+        manager = ConnectionManager()
+        socket = FakeSocket()
+        connection = await manager.connect(socket, "u1")
+        connection.topics = {"deals", "inventory"}
+
+        for message in (
+            {"type": "changes", "topic": "deals", "data": [_change("d1", "created", 1)]},
+            {"type": "changes", "topic": "deals", "data": [_change("d1", "updated", 2), _change("d2", "updated", 2)]},
+            {"type": "changes", "topic": "deals", "data": [_change("d2", "deleted", 3)]},
+            {"type": "changes", "topic": "inventory", "data": [_change("p1", "updated", 3, "stock")]},
+        ):
+            await manager.broadcast_to_user("u1", message)
+        await asyncio.sleep(0.05)
+
+        assert socket.sent == [{"type": "changes", "data": {
+            "deals": [_change("d1", "created", 2), _change("d2", "deleted", 3)],
+            "inventory": [_change("p1", "updated", 3, "stock")],
+        }}]
+
+
+@pytest.mark.asyncio
+class TestChangeFeed:
+    async def test_writes_publish_change_events(
+        self, authenticated_client: AsyncClient, db_session: AsyncSession, test_user, pushed
+    ):
+        deal = (await authenticated_client.post("/api/deals", json={"title": "Big one", "stage": "lead"})).json()
+        await db_session.commit()
+        await authenticated_client.delete(f"/api/deals/{deal['id']}")
+        await db_session.commit()
+        await realtime.drain()
+
+        changes = [(user_id, m) for user_id, m in pushed if m["type"] == "changes"]
+        assert {user_id for user_id, _ in changes} == {test_user.id}
+        assert [m["topic"] for _, m in changes] == ["deals", "deals"]
+        assert [(e["entity"], e["id"], e["op"]) for _, m in changes for e in m["data"]] == [
+            ("deal", deal["id"], "created"), ("deal", deal["id"], "deleted"),
+        ]
+
+    async def test_rollback_publishes_nothing(self, authenticated_client: AsyncClient, db_session: AsyncSession, pushed):
+        await authenticated_client.post("/api/deals", json={"title": "Never mind"})
+        await db_session.rollback()
+        await realtime.drain()
+        assert not [m for _, m in pushed if m["type"] == "changes"]
+
+
+@pytest.mark.asyncio
+class TestMemoryBroadcast:
+    async def test_listener_receives_published_messages(self):
+        broadcast = realtime.MemoryBroadcast()
+        received = []
+
+        async def sink(user_id, message):
+            received.append((user_id, message))
+
+        listener = asyncio.create_task(broadcast.listen(sink))
+        await _settle()
+        await broadcast.publish([("u1", {"type": "a"}), ("u2", {"type": "b"})])
+        listener.cancel()
+        await _settle()
+        await broadcast.publish([("u1", {"type": "c"})])
+
+        assert received == [("u1", {"type": "a"}), ("u2", {"type": "b"})]
@@ -0,0 +1,210 @@
+"""Tests for signals — diff-based refresh, event-driven invalidation, rule profiling."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Deal, SignalDirtyMark
+from app.services import alert_service, metrics, realtime, rule_profiler, signal_service
+
+
+@pytest.fixture
+async def low_stock_product(authenticated_client: AsyncClient):
+    """A tracked product with no stock against a reorder level of 5, plus a warehouse."""
+    wh = await authenticated_client.post("/api/warehouses", json={"name": "Main", "is_default": True})
+    product = await authenticated_client.post(
+        "/api/products", json={"name": "Widget", "sku": "W-1", "reorder_level": 5}
+    )
+    return {"product_id": product.json()["id"], "warehouse_id": wh.json()["id"]}
+
+
+async def _set_stock(client: AsyncClient, setup: dict, qty: float):
+    resp = await client.post("/api/inventory/adjustment", json={
+        "product_id": setup["product_id"], "warehouse_id": setup["warehouse_id"], "quantity_delta": qty,
+    })
+    assert resp.status_code == 201
+
+
+@pytest.mark.asyncio
+class TestSignalRefresh:
+    async def test_refresh_returns_delta(self, authenticated_client: AsyncClient, low_stock_product):
+        resp = await authenticated_client.post("/api/signals/refresh")
+        assert resp.status_code == 200
+        delta = resp.json()
+        (signal,) = delta["added"]
+        assert signal["entity_id"] == low_stock_product["product_id"]
+        assert signal["severity"] == "critical"
+        assert delta["changed"] == [] and delta["removed"] == []
+
+        # Nothing changed — nothing to send, and the read state survives
+        await authenticated_client.post(f"/api/signals/{signal['id']}/read")
+        resp = await authenticated_client.post("/api/signals/refresh")
+        assert resp.json() == {"added": [], "changed": [], "removed": []}
+        (listed,) = (await authenticated_client.get("/api/signals")).json()
+        assert listed["id"] == signal["id"]
+        assert listed["is_read"] is True
+
+        # Severity drops to warning — same row, updated in place and unread again
+        await _set_stock(authenticated_client, low_stock_product, 3)
+        delta = (await authenticated_client.post("/api/signals/refresh")).json()
+        (changed,) = delta["changed"]
+        assert changed["id"] == signal["id"]
+        assert changed["severity"] == "warning"
+        assert changed["is_read"] is False
+        assert delta["added"] == []
+
+        # Restocked — the signal is resolved
+        await _set_stock(authenticated_client, low_stock_product, 10)
+        delta = (await authenticated_client.post("/api/signals/refresh")).json()
+        assert delta["removed"] == [signal["id"]]
+        assert (await authenticated_client.get("/api/signals")).json() == []
+
+    async def test_dismissed_signal_stays_dismissed(self, authenticated_client: AsyncClient, low_stock_product):
+        (signal,) = (await authenticated_client.post("/api/signals/refresh")).json()["added"]
+        await authenticated_client.post(f"/api/signals/{signal['id']}/dismiss")
+
+        await _set_stock(authenticated_client, low_stock_product, 3)
+        delta = (await authenticated_client.post("/api/signals/refresh")).json()
+        assert delta == {"added": [], "changed": [], "removed": []}
+        assert (await authenticated_client.get("/api/signals")).json() == []
+
+    async def test_dismiss_all_survives_the_next_sync(self, authenticated_client: AsyncClient, low_stock_product):
+        (signal,) = (await authenticated_client.post("/api/signals/refresh")).json()["added"]
+        assert (await authenticated_client.post("/api/signals/dismiss-all")).status_code == 204
+
+        delta = (await authenticated_client.post("/api/signals/refresh")).json()
+        assert delta == {"added": [], "changed": [], "removed": []}
+        assert (await authenticated_client.get("/api/signals")).json() == []
+        (dismissed,) = (await authenticated_client.get("/api/signals", params={"include_dismissed": True})).json()
+        assert dismissed["id"] == signal["id"] and dismissed["is_read"] is True
+
+    async def test_concurrent_sync_does_not_duplicate(
+        self, authenticated_client: AsyncClient, low_stock_product, db_session: AsyncSession
+    ):
+        (signal,) = (await authenticated_client.post("/api/signals/refresh")).json()["added"]
+        workspace_id = (await authenticated_client.get(f"/api/products/{low_stock_product['product_id']}")).json()[
+            "workspace_id"
+        ]
+
+        # A sync that loaded the stored signals before the refresh above committed
+        fresh = {signal_service.signal_key(s): s for s in await signal_service.generate_signals(db_session, workspace_id)}
+        delta = await signal_service._apply_diff(db_session, workspace_id, fresh, {})
+        assert delta["added"] == []
+        (listed,) = (await authenticated_client.get("/api/signals")).json()
+        assert listed["id"] == signal["id"]
+
+
+@pytest.mark.asyncio
+class TestSignalInvalidation:
+    async def test_stock_movement_marks_only_its_product(
+        self, authenticated_client: AsyncClient, low_stock_product, db_session: AsyncSession
+    ):
+        other = await authenticated_client.post("/api/products", json={"name": "Gadget", "reorder_level": 2})
+        (await authenticated_client.post("/api/signals/refresh")).json()
+        workspace_id = other.json()["workspace_id"]
+        await db_session.execute(delete(SignalDirtyMark))
+
+        await _set_stock(authenticated_client, low_stock_product, 3)
+        marks = (await db_session.execute(select(SignalDirtyMark))).scalars().all()
+        assert [(m.signal_type, m.entity_id) for m in marks] == [("low_stock", low_stock_product["product_id"])]
+        assert await signal_service.dirty_workspaces(db_session) == [workspace_id]
+
+        delta = await signal_service.sync_dirty(db_session, workspace_id)
+        (changed,) = delta["changed"]
+        assert changed.entity_id == low_stock_product["product_id"]
+        assert changed.severity == "warning"
+        assert delta["added"] == [] and delta["removed"] == []
+        assert await signal_service.dirty_workspaces(db_session) == []
+
+    async def test_deal_stage_move_resolves_stale_deal(
+        self, authenticated_client: AsyncClient, db_session: AsyncSession
+    ):
+        deal = (await authenticated_client.post("/api/deals", json={"title": "Big one", "stage": "proposal"})).json()
+        await db_session.execute(
+            update(Deal).where(Deal.id == deal["id"]).values(updated_at=datetime.utcnow() - timedelta(days=20))
+        )
+        (signal,) = (await authenticated_client.post("/api/signals/refresh")).json()["added"]
+        assert signal["signal_type"] == "stale_deal"
+
+        resp = await authenticated_client.put(f"/api/deals/{deal['id']}/stage", json={"stage": "won"})
+        assert resp.status_code == 200
+        delta = await signal_service.sync_dirty(db_session, deal["workspace_id"])
+        assert delta["removed"] == [signal["id"]]
+
+
+@pytest.mark.asyncio
+class TestSignalSummary:
+    async def test_summary_counts(self, authenticated_client: AsyncClient, low_stock_product):
+        await authenticated_client.post("/api/products", json={"name": "Gadget", "reorder_level": 2})
+        await _set_stock(authenticated_client, low_stock_product, 3)
+        added = (await authenticated_client.post("/api/signals/refresh")).json()["added"]
+        assert sorted(s["severity"] for s in added) == ["critical", "warning"]
+        await authenticated_client.post(f"/api/signals/{added[0]['id']}/read")
+
+        resp = await authenticated_client.get("/api/signals/summary")
+        assert resp.status_code == 200
+        assert resp.json() == {"total": 2, "critical": 1, "warning": 1, "info": 0, "unread": 1}
+
+    async def test_summary_empty(self, authenticated_client: AsyncClient):
+        resp = await authenticated_client.get("/api/signals/summary")
+        assert resp.json() == {"total": 0, "critical": 0, "warning": 0, "info": 0, "unread": 0}
+
+
+@pytest.mark.asyncio
+class TestRuleProfiler:
+    async def test_signal_rules_are_profiled(
+        self, authenticated_client: AsyncClient, low_stock_product, db_session: AsyncSession
+    ):
+        other = await authenticated_client.post("/api/products", json={"name": "Gadget", "reorder_level": 2})
+        workspace_id = other.json()["workspace_id"]
+        metrics.reset()
+
+        runs = rule_profiler.start_request()
+        await signal_service.generate_signals(db_session, workspace_id)
+
+        by_name = {run.name: run for run in runs}
+        assert set(by_name) == {f"signal.{t}" for t in signal_service.RULES}
+        assert by_name["signal.low_stock"].rows == 2
+        assert all(run.queries == 1 for run in runs)
+        assert "signal.low_stock;dur=" in rule_profiler.server_timing(runs)
+
+        values = metrics.snapshot()
+        labels = (("kind", "signal"), ("rule", "signal.low_stock"))
+        assert values[("lytherahub_rule_runs_total", labels)] == 1
+        assert values[("lytherahub_rule_rows_total", labels)] == 2
+
+    async def test_alert_scanners_are_registered(self, db_session: AsyncSession, test_user):
+        metrics.reset()
+        summary = await alert_service.run_full_scan(db_session, test_user.id)
+        assert summary["total_new_alerts"] == 0
+
+        assert {name for name, kind in rule_profiler.REGISTRY.items() if kind == "alert"} == {
+            f"alert.{key}" for key in alert_service.SCANNERS
+        }
+        text = metrics.render_prometheus()
+        assert 'lytherahub_rule_runs_total{kind="alert",rule="alert.stale_leads"} 1' in text
+
+
+@pytest.mark.asyncio
+class TestSignalPush:
+    async def test_diff_pushes_delta_and_summary(
+        self, authenticated_client: AsyncClient, low_stock_product, db_session: AsyncSession, test_user, pushed
+    ):
+        (signal,) = (await authenticated_client.post("/api/signals/refresh")).json()["added"]
+        await db_session.commit()
+        await realtime.drain()
+
+        assert {user_id for user_id, _ in pushed} == {test_user.id}
+        by_type = {message["type"]: message["data"] for _, message in pushed}
+        assert [s["id"] for s in by_type["signals.changed"]["added"]] == [signal["id"]]
+        assert by_type["signals.summary"]["critical"] == 1
+
+        # A refresh that changes nothing sends nothing
+        pushed.clear()
+        await authenticated_client.post("/api/signals/refresh")
+        await db_session.commit()
+        await realtime.drain()
+        assert pushed == []
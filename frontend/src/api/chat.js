@@ -0,0 +1,36 @@
+// Streams a chat reply over Server-Sent Events. axios can't read a response
+// body as it arrives, so this uses fetch. Calls onStart({ session_id }), then
+// onDelta(text) per chunk; resolves with { session_id, reply }.
+export async function streamChat(body, { onStart, onDelta } = {}) {
+  const token = sessionStorage.getItem('lytherahub_token')
+  const res = await fetch('/api/chat/stream', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+  })
+  if (!res.ok || !res.body) throw new Error(`Chat stream failed: ${res.status}`)
+
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += value
+    let end
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, end)
+      buffer = buffer.slice(end + 2)
+      const fields = Object.fromEntries(
+        block.split('\n').map((line) => [line.slice(0, line.indexOf(': ')), line.slice(line.indexOf(': ') + 2)])
+      )
+      const data = JSON.parse(fields.data)
+      if (fields.event === 'start') onStart?.(data)
+      else if (fields.event === 'delta') onDelta?.(data.text)
+      else if (fields.event === 'done') return data
+    }
+  }
+  throw new Error('Chat stream ended early')
+}
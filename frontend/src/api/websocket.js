@@ -2,30 +2,72 @@ class WebSocketManager {
   constructor() {
     this.ws = null
     this.listeners = new Map()
+    this.topics = new Map()  // change feed topic -> number of subscribers
     this.reconnectAttempts = 0
     this.maxReconnectAttempts = 5
+    this.reconnectTimer = null
+    this.closedByUser = false
   }
 
   connect(userId) {
+    this.closedByUser = false
+    this.reconnectAttempts = 0
+    this._open(userId)
+  }
+
+  _open(userId) {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
-    const url = `${protocol}//${window.location.host}/ws/${userId}`
+    const token = sessionStorage.getItem('lytherahub_token') || ''
+    const url = `${protocol}//${window.location.host}/ws/${userId}?token=${encodeURIComponent(token)}`
 
-    this.ws = new WebSocket(url)
+    const ws = new WebSocket(url)
+    this.ws = ws
 
-    this.ws.onopen = () => {
+    ws.onopen = () => {
       this.reconnectAttempts = 0
+      if (this.topics.size) this.send({ type: 'subscribe', topics: [...this.topics.keys()] })
     }
 
-    this.ws.onmessage = (event) => {
+    ws.onmessage = (event) => {
+      if (event.data === 'pong') return
       const data = JSON.parse(event.data)
+      if (data.type === 'ping') {
+        // Server heartbeat — a quiet socket that stops answering is closed
+        ws.send('pong')
+        return
+      }
       const handlers = this.listeners.get(data.type) || []
       handlers.forEach((handler) => handler(data))
     }
 
-    this.ws.onclose = () => {
+    ws.onclose = (event) => {
+      // A socket already replaced, or closed on purpose, is not retried
+      if (this.ws !== ws || this.closedByUser) return
+      // 1008: bad token, or this tab was the oldest over the per-user limit
+      if (event.code === 1008) return
       if (this.reconnectAttempts < this.maxReconnectAttempts) {
         this.reconnectAttempts++
-        setTimeout(() => this.connect(userId), 2000 * this.reconnectAttempts)
+        this.reconnectTimer = setTimeout(() => this._open(userId), 2000 * this.reconnectAttempts)
+      }
+    }
+  }
+
+  send(message) {
+    if (this.ws?.readyState === WebSocket.OPEN) this.ws.send(JSON.stringify(message))
+  }
+
+  // Receive `changes` frames for a topic; returns the unsubscribe function
+  subscribe(topic) {
+    const count = this.topics.get(topic) || 0
+    this.topics.set(topic, count + 1)
+    if (!count) this.send({ type: 'subscribe', topics: [topic] })
+    return () => {
+      const remaining = (this.topics.get(topic) || 1) - 1
+      if (remaining) {
+        this.topics.set(topic, remaining)
+      } else {
+        this.topics.delete(topic)
+        this.send({ type: 'unsubscribe', topics: [topic] })
       }
     }
   }
@@ -43,6 +85,8 @@ class WebSocketManager {
   }
 
   disconnect() {
+    this.closedByUser = true
+    clearTimeout(this.reconnectTimer)
     if (this.ws) {
       this.ws.close()
       this.ws = null
@@ -1,7 +1,8 @@
-import { useState } from 'react'
+import { useState, useEffect } from 'react'
 import { useLocation } from 'react-router-dom'
 import { X } from 'lucide-react'
 import { useAuth } from '../../context/AuthContext'
+import { wsManager } from '../../api/websocket'
 import Sidebar from './Sidebar'
 import Header from './Header'
 import AIChatSidebar from '../shared/AIChatSidebar'
@@ -25,6 +26,13 @@ export default function Layout({ children, onOpenPalette }) {
   const isDemoUser = user?.email === 'demo@lytherahub.ai'
   const location = useLocation()
 
+  // Live alerts, signals and counters are pushed over the socket
+  useEffect(() => {
+    if (!user?.id) return
+    wsManager.connect(user.id)
+    return () => wsManager.disconnect()
+  }, [user?.id])
+
   return (
     <div className="min-h-screen bg-slate-50 dark:bg-slate-950">
       {isDemoUser && showDemoBanner && <DemoBanner onDismiss={() => setShowDemoBanner(false)} />}
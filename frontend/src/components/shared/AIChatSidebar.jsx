@@ -12,7 +12,7 @@ import {
   Bot,
 } from 'lucide-react'
 import { useLocation } from 'react-router-dom'
-import api from '../../api/client'
+import { streamChat } from '../../api/chat'
 
 const QUICK_ACTIONS = [
   { label: 'Inbox summary', icon: Mail, prompt: 'Summarize my inbox' },
@@ -246,18 +246,28 @@ export default function AIChatSidebar() {
     setInput('')
     setLoading(true)
 
+    // Show the reply as it streams in; the typing indicator only covers the wait for the first token
+    let started = false
+    const appendToReply = (delta) => {
+      if (!started) {
+        started = true
+        setLoading(false)
+        setMessages((prev) => [...prev, { role: 'assistant', content: delta }])
+        return
+      }
+      setMessages((prev) => [...prev.slice(0, -1), { role: 'assistant', content: prev[prev.length - 1].content + delta }])
+    }
+
     try {
-      const { data } = await api.post('/chat', {
-        message: text.trim(),
-        session_id: sessionId,
-        page_context: getPageContext(),
-        messages: currentMessages,
-      })
-      setSessionId(data.session_id)
-      setMessages((prev) => [...prev, { role: 'assistant', content: data.reply }])
+      await streamChat(
+        { message: text.trim(), session_id: sessionId, page_context: getPageContext() },
+        { onStart: (data) => setSessionId(data.session_id), onDelta: appendToReply },
+      )
     } catch {
-      const reply = getChatDemoReply(text.trim(), currentMessages)
-      setMessages((prev) => [...prev, { role: 'assistant', content: reply }])
+      if (!started) {
+        const reply = getChatDemoReply(text.trim(), currentMessages)
+        setMessages((prev) => [...prev, { role: 'assistant', content: reply }])
+      }
     } finally {
       setLoading(false)
     }
@@ -0,0 +1,36 @@
+import { useEffect, useRef } from 'react'
+import { wsManager } from '../api/websocket'
+
+/**
+ * Calls `onEvents` with the change feed events for a topic, e.g. `deals`.
+ *
+ * Events are `{ entity, id, op, version }` with op `created`, `updated` or
+ * `deleted`. Events older than one already seen for the same row are dropped,
+ * so handlers can re-fetch or remove just the rows named.
+ *
+ * Usage:
+ *   useChangeFeed('deals', (events) => { ... })
+ */
+export function useChangeFeed(topic, onEvents) {
+  const handlerRef = useRef(onEvents)
+  handlerRef.current = onEvents
+
+  useEffect(() => {
+    const versions = new Map()
+    const onChanges = (message) => {
+      const events = (message.data?.[topic] || []).filter((e) => {
+        const key = `${e.entity}:${e.id}`
+        if ((versions.get(key) || 0) > e.version) return false
+        versions.set(key, e.version)
+        return true
+      })
+      if (events.length) handlerRef.current(events)
+    }
+    wsManager.on('changes', onChanges)
+    const unsubscribe = wsManager.subscribe(topic)
+    return () => {
+      wsManager.off('changes', onChanges)
+      unsubscribe()
+    }
+  }, [topic])
+}
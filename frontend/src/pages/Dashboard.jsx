@@ -13,6 +13,7 @@ import {
 import { Link } from 'react-router-dom'
 import api from '../api/client'
 import { signalsApi } from '../api/signals'
+import { wsManager } from '../api/websocket'
 import { useAuth } from '../context/AuthContext'
 import { formatRelativeTime } from '../utils/formatters'
 import toast from 'react-hot-toast'
@@ -112,7 +113,12 @@ function AlertsPanel() {
       }
     }
     load()
-    return () => { cancelled = true }
+    const onCreated = (msg) => setAlerts((prev) => [...msg.data.alerts, ...prev].slice(0, 5))
+    wsManager.on('alerts.created', onCreated)
+    return () => {
+      cancelled = true
+      wsManager.off('alerts.created', onCreated)
+    }
   }, [])
 
   const handleRead = async (alertId) => {
@@ -239,6 +245,9 @@ function SignalsWidget() {
 
   useEffect(() => {
     signalsApi.summary().then((r) => setSummary(r.data)).catch(() => {})
+    const onSummary = (msg) => setSummary(msg.data)
+    wsManager.on('signals.summary', onSummary)
+    return () => wsManager.off('signals.summary', onSummary)
   }, [])
 
   if (!summary) return null
@@ -7,6 +7,7 @@ import {
 import { dealsApi, activitiesApi } from '../api/deals'
 import api from '../api/client'
 import toast from 'react-hot-toast'
+import { useChangeFeed } from '../hooks/useChangeFeed'
 
 // ---------------------------------------------------------------------------
 // Constants
@@ -635,16 +636,35 @@ export default function Deals() {
     if (detailDeal?.id === saved.id) setDetailDeal(saved)
   }
 
+  function removeDeal(dealId) {
+    setPipeline((prev) =>
+      prev.map((col) => {
+        const deals = col.deals.filter((d) => d.id !== dealId)
+        return { ...col, deals, count: deals.length, total_value: deals.reduce((s, d) => s + (d.value || 0), 0) }
+      })
+    )
+  }
+
+  // Changes made elsewhere (other users, other tabs) — patch just those deals
+  useChangeFeed('deals', async (events) => {
+    for (const event of events) {
+      if (event.op === 'deleted') {
+        removeDeal(event.id)
+        if (detailDeal?.id === event.id) setDetailDeal(null)
+        continue
+      }
+      try {
+        const res = await dealsApi.get(event.id)
+        handleSaved(res.data)
+      } catch {}
+    }
+  })
+
   async function handleDelete(dealId) {
     if (!confirm('Delete this deal?')) return
     try {
       await dealsApi.delete(dealId)
-      setPipeline((prev) =>
-        prev.map((col) => {
-          const deals = col.deals.filter((d) => d.id !== dealId)
-          return { ...col, deals, count: deals.length, total_value: deals.reduce((s, d) => s + (d.value || 0), 0) }
-        })
-      )
+      removeDeal(dealId)
       setDetailDeal(null)
       toast.success('Deal deleted')
     } catch {
@@ -6,6 +6,7 @@ import {
 import { inventoryApi } from '../api/inventory'
 import { productsApi, warehousesApi } from '../api/products'
 import toast from 'react-hot-toast'
+import { useChangeFeed } from '../hooks/useChangeFeed'
 
 const TYPE_META = {
   purchase:   { label: 'Purchase',   color: 'text-emerald-600 bg-emerald-50 dark:bg-emerald-900/20 dark:text-emerald-400', sign: '+' },
@@ -147,6 +148,20 @@ export default function Inventory() {
 
   useEffect(() => { loadAll() }, [loadAll])
 
+  // Stock moved elsewhere — refresh only the levels of the products named
+  useChangeFeed('inventory', async (events) => {
+    const productIds = [...new Set(events.map(e => e.id))]
+    try {
+      const res = await inventoryApi.levels({ product_ids: productIds.join(',') })
+      const fresh = new Map((res.data || []).map(l => [`${l.product_id}:${l.warehouse_id}`, l]))
+      setLevels(prev => {
+        const patched = prev.map(l => fresh.get(`${l.product_id}:${l.warehouse_id}`) || l)
+        const known = new Set(prev.map(l => `${l.product_id}:${l.warehouse_id}`))
+        return [...patched, ...[...fresh.entries()].filter(([key]) => !known.has(key)).map(([, l]) => l)]
+      })
+    } catch {}
+  })
+
   const lowStockLevels = levels.filter(l => l.is_low_stock)
 
   const tabs = [
@@ -7,6 +7,7 @@ import { salesOrdersApi } from '../api/salesOrders'
 import { productsApi } from '../api/products'
 import api from '../api/client'
 import toast from 'react-hot-toast'
+import { useChangeFeed } from '../hooks/useChangeFeed'
 
 const STATUS_META = {
   draft:               { label: 'Draft',                color: 'bg-slate-100 text-slate-600 dark:bg-slate-700 dark:text-slate-300' },
@@ -384,6 +385,27 @@ export default function SalesOrders() {
 
   useEffect(() => { load() }, [load])
 
+  // Changes made elsewhere — patch the orders on this page instead of reloading it
+  useChangeFeed('sales_orders', async (events) => {
+    for (const event of events) {
+      const shown = orders.some(o => o.id === event.id)
+      if (event.op === 'updated' && !shown) continue
+      if (event.op === 'created' && page !== 1) continue
+      let order = null
+      try {
+        order = event.op === 'deleted' ? null : (await salesOrdersApi.get(event.id)).data
+      } catch {}
+      const matches = order && (!statusFilter || order.status === statusFilter)
+      setOrders(prev => {
+        const rest = prev.filter(o => o.id !== event.id)
+        if (!matches) return rest
+        return shown ? prev.map(o => (o.id === order.id ? order : o)) : [order, ...rest]
+      })
+      if (event.op === 'created' && matches) setTotal(t => t + 1)
+      if (selectedOrder?.id === event.id && order) setSelectedOrder(order)
+    }
+  })
+
   const handleAction = async (action, order) => {
     setOpenMenu(null)
     try {
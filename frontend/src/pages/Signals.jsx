@@ -4,6 +4,7 @@ import {
   Package, Handshake, Building2, Truck, Receipt, Loader2, CheckCheck,
 } from 'lucide-react'
 import { signalsApi } from '../api/signals'
+import { wsManager } from '../api/websocket'
 import toast from 'react-hot-toast'
 
 // ---------------------------------------------------------------------------
@@ -119,8 +120,20 @@ export default function Signals() {
 
   useEffect(() => {
     loadSignals()
+    const onChanged = (msg) => applyDelta(msg.data)
+    wsManager.on('signals.changed', onChanged)
+    return () => wsManager.off('signals.changed', onChanged)
   }, [])
 
+  // Patch the list in place: add new, replace changed by id, drop resolved
+  function applyDelta({ added, changed, removed }) {
+    const replaced = new Map([...added, ...changed].map((s) => [s.id, s]))
+    setSignals((prev) => [
+      ...added.filter((s) => !prev.some((p) => p.id === s.id)),
+      ...prev.filter((s) => !removed.includes(s.id)).map((s) => replaced.get(s.id) || s),
+    ])
+  }
+
   async function loadSignals() {
     setLoading(true)
     setError(null)
@@ -137,9 +150,9 @@ export default function Signals() {
   async function handleRefresh() {
     setRefreshing(true)
     try {
-      const res = await signalsApi.refresh()
-      setSignals(res.data)
-      toast.success(`Refreshed — ${res.data.length} signal${res.data.length !== 1 ? 's' : ''} found`)
+      const { added, changed, removed } = (await signalsApi.refresh()).data
+      applyDelta({ added, changed, removed })
+      toast.success(`Refreshed — ${added.length} new, ${changed.length} updated, ${removed.length} resolved`)
     } catch {
       toast.error('Refresh failed')
     } finally {